@@ -0,0 +1,119 @@
+# analysis_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_MAX_MB = 512
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """SHA-256 do conteúdo de um arquivo, lido em blocos."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(image_bytes, text, prompt, model, params):
+    """Hash do conteúdo que determina a resposta da análise de uma página."""
+    digest = hashlib.sha256()
+    parts = (
+        image_bytes,
+        text.encode("utf-8"),
+        prompt.encode("utf-8"),
+        model.encode("utf-8"),
+        json.dumps(params, sort_keys=True).encode("utf-8"),
+    )
+    for part in parts:
+        # prefixa o tamanho para que ("ab", "c") e ("a", "bc") não colidam
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Cache persistente (SQLite) das descrições de página geradas pelo modelo de visão.
+
+    As entradas são endereçadas por conteúdo (ver `cache_key`) e removidas por
+    LRU quando o tamanho total passa de `max_mb`.
+    """
+
+    def __init__(self, path, max_mb=None):
+        if max_mb is None:
+            max_mb = float(os.getenv("ANALYSIS_CACHE_MAX_MB", DEFAULT_MAX_MB))
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_last_access ON analysis(last_access)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM analysis").fetchone()[0]
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM analysis WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE analysis SET last_access = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key, value):
+        if value is None:
+            return
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM analysis WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Remove as entradas menos usadas até voltar ao limite de tamanho."""
+        rows = self._conn.execute("SELECT key, size FROM analysis ORDER BY last_access").fetchall()
+        removed = []
+        for key, size in rows:
+            if self._total_bytes <= self.max_bytes:
+                break
+            removed.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM analysis WHERE key = ?", removed)
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_mb": self._total_bytes / (1024 * 1024),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
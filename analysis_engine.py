@@ -0,0 +1,79 @@
+# analysis_engine.py
+import asyncio
+import threading
+
+
+class AnalysisEngine:
+    """
+    Executa corrotinas (chamadas à API) em um loop asyncio dedicado.
+
+    O limite de requisições em voo é global: vale para todas as páginas e
+    todos os documentos submetidos ao mesmo motor, sem barreiras entre blocos.
+    Com um `limiter` (ver rate_limiter.py) o limite passa a ser a concorrência
+    adaptativa dele, nunca acima de `concurrency`, e cada chamada aguarda o
+    orçamento de requests/tokens antes de sair.
+
+    O código síncrono da pipeline usa `submit`, que devolve um
+    `concurrent.futures.Future`.
+    """
+
+    def __init__(self, concurrency, client=None, limiter=None):
+        if concurrency < 1:
+            raise ValueError("concurrency deve ser >= 1")
+
+        self.concurrency = concurrency
+        self.client = client  # cliente assíncrono compartilhado pelas corrotinas
+        self.limiter = limiter
+
+        self._loop = asyncio.new_event_loop()
+        self._slots = None
+        self._in_flight = 0
+        self._thread = threading.Thread(target=self._loop.run_forever, name="analysis-engine", daemon=True)
+        self._thread.start()
+
+    def _current_limit(self):
+        if self.limiter is None:
+            return self.concurrency
+        return max(1, min(self.concurrency, self.limiter.concurrency))
+
+    async def _limited(self, coro_fn, args, kwargs, cost, budget):
+        if self._slots is None:
+            self._slots = asyncio.Condition()
+
+        async with self._slots:
+            await self._slots.wait_for(lambda: self._in_flight < self._current_limit())
+            self._in_flight += 1
+        try:
+            if budget is not None:
+                await budget.wait_async(cost)
+            return await coro_fn(*args, **kwargs)
+        finally:
+            async with self._slots:
+                self._in_flight -= 1
+                self._slots.notify_all()
+
+    def submit(self, coro_fn, *args, cost=0, budget=None, **kwargs):
+        """
+        Agenda `coro_fn(*args, **kwargs)` respeitando o limite global de concorrência.
+
+        :param cost: tokens estimados da chamada, cobrados do limitador
+        :param budget: limitador que cobra a chamada, quando for de outro modelo (padrão: `self.limiter`)
+        """
+        if budget is None:
+            budget = self.limiter
+        return asyncio.run_coroutine_threadsafe(self._limited(coro_fn, args, kwargs, cost, budget), self._loop)
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        if self.client is not None and hasattr(self.client, "close"):
+            asyncio.run_coroutine_threadsafe(self.client.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
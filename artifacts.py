@@ -0,0 +1,107 @@
+# artifacts.py
+import json
+import os
+import queue
+import threading
+from pathlib import Path
+
+from structured_output import write_json_atomic
+from tracing import span, traced
+
+# Formato compacto dos artefatos em disco (sem indentação nem espaços)
+COMPACT = {"ensure_ascii": False, "separators": (",", ":")}
+
+IMAGE_KEYS = ("image", "images")
+
+
+@traced("compact_json", "json")
+def compact_json(obj):
+    return json.dumps(obj, **COMPACT)
+
+
+def count_image_tags(obj):
+    """Conta as chaves "image"/"images" no objeto já em memória (mesma regra de contar_tags_imagem)."""
+    count = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            count += sum(1 for key in item if key in IMAGE_KEYS)
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return count
+
+
+class ArtifactWriter:
+    """
+    Persistência dos artefatos intermediários (raw, pproc) em segundo plano.
+
+    Os estágios passam os dados adiante em memória e só enfileiram a gravação;
+    uma thread grava na ordem em que os pedidos chegaram. `append` anexa uma
+    linha JSON compacta (o arquivo é recriado no primeiro uso da execução), então
+    cada documento é serializado uma única vez. `close` espera a fila esvaziar.
+
+    `on_written` roda na thread de gravação só depois que o artefato foi gravado
+    (ex.: registrar o estágio no manifesto). Falhas ficam em `errors`, como
+    (caminho, exceção), e o callback não roda.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._files = {}
+        self.errors = []
+        self._thread = threading.Thread(target=self._run, name="artifact-writer", daemon=True)
+        self._thread.start()
+
+    def append(self, path, obj, on_written=None):
+        self._queue.put((path, self._append, (Path(path), obj), on_written))
+
+    def write(self, path, obj, on_written=None):
+        """Grava `obj` inteiro em `path` (arquivo temporário + rename atômico)."""
+        self._queue.put((path, write_json_atomic, (obj, path), on_written))
+
+    def rename(self, src, dst):
+        """Renomeia depois das gravações já enfileiradas (ex.: artefato consumido vira .tmp)."""
+        self._queue.put((src, self._rename, (src, dst), None))
+
+    def _append(self, path, obj):
+        f = self._files.get(path)
+        if f is None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            f = self._files[path] = open(path, "w", encoding="utf-8")
+        line = compact_json(obj) + "\n"
+        with span("artifact_append", "json"):
+            f.write(line)
+        f.flush()
+
+    @staticmethod
+    def _rename(src, dst):
+        if os.path.exists(src):
+            os.replace(src, dst)
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            path, fn, args, on_written = task
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"❌ Falha ao gravar artefato {path}: {e}")
+                self.errors.append((path, e))
+                continue
+            if on_written is not None:
+                try:
+                    on_written()
+                except Exception as e:
+                    print(f"❌ Falha ao registrar artefato {path}: {e}")
+                    self.errors.append((path, e))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
@@ -0,0 +1,81 @@
+# bench_image_encoder.py
+#
+# Renderiza as páginas de um PDF e as codifica com cada preset de image_encoder.py,
+# mostrando bytes por página (e em base64, como vão na requisição), tempo de
+# codificação e tokens de imagem cobrados pela API.
+#
+# Uso:
+#   python benchmarks/bench_image_encoder.py --pdf "PDFs parcionados/secao.pdf" [--pages 20] [--dpi 200]
+#   python benchmarks/bench_image_encoder.py              # PDF sintético (texto, tabela e figura)
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fitz  # PyMuPDF
+
+from image_encoder import PRESETS, encode_image, image_size, vision_tokens
+from render_pdf import iter_pages
+
+
+def synthetic_pdf(path, pages):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 90), f"{i + 1}. MAINTENANCE PROCEDURE", fontsize=16)
+        for line in range(25):
+            page.insert_text((72, 130 + line * 14), f"Step {line + 1}: remove the screws, check the belt tension "
+                                                    f"and record the value in the log.", fontsize=10)
+        if i % 2:
+            for row in range(10):  # tabela desenhada
+                page.draw_line((72, 500 + row * 18), (520, 500 + row * 18))
+        else:
+            page.draw_circle((300, 600), 80, color=(0.2, 0.3, 0.8), fill=(0.8, 0.9, 1.0))
+    doc.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos presets de codificação de imagem")
+    parser.add_argument("--pdf")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--presets", default=",".join(PRESETS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = args.pdf
+        if pdf is None:
+            pdf = str(Path(tmp) / "synthetic.pdf")
+            synthetic_pdf(pdf, args.pages)
+
+        with fitz.open(pdf) as doc:
+            pages = list(range(min(args.pages, doc.page_count)))
+        rendered = [img for _, img in iter_pages(pdf, pages=pages, backend="fitz", dpi=args.dpi)]
+
+    print(f"{len(rendered)} páginas renderizadas a {args.dpi} DPI")
+    print(f"\n{'preset':<10}{'KB/pág':>9}{'KB b64':>9}{'ms/pág':>9}{'tokens/pág':>12}{'tamanho médio':>16}")
+    for preset in args.presets.split(","):
+        sizes, times, tokens, dims = [], [], [], []
+        for img in rendered:
+            start = time.perf_counter()
+            data, _ = encode_image(img, preset)
+            times.append(time.perf_counter() - start)
+            width, height = image_size(data)
+            sizes.append(len(data))
+            tokens.append(vision_tokens(width, height))
+            dims.append((width, height))
+
+        kb = statistics.mean(sizes) / 1024
+        width = statistics.mean(w for w, _ in dims)
+        height = statistics.mean(h for _, h in dims)
+        print(f"{preset:<10}{kb:>9.0f}{kb * 4 / 3:>9.0f}{statistics.mean(times) * 1000:>9.0f}"
+              f"{statistics.mean(tokens):>12.0f}{f'{width:.0f}x{height:.0f}':>16}")
+
+
+if __name__ == "__main__":
+    main()
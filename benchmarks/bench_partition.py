@@ -0,0 +1,85 @@
+# bench_partition.py
+#
+# Compara o particionamento seção a seção (a versão original de parcionar, página a página,
+# chamada uma vez por seção como a interface fazia) com o particionamento em lote (parcionar_lote) com 1 e N processos.
+# As seções vêm do sumário do PDF ou de um manifesto JSON.
+#
+# Uso:
+#   python benchmarks/bench_partition.py caminho/para/manual.pdf [--manifest secoes.json] [--level 1] [--workers 4]
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fitz  # PyMuPDF
+
+from parcionar_pdf import parcionar_lote, sections_from_manifest, sections_from_toc
+
+
+def baseline_parcionar(pages, section_name, pdf_path, output_dir):
+    """Cópia do parcionar original: reabre o PDF e insere uma página por vez, sem garbage/deflate."""
+    first_page, last_page = pages
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    doc = fitz.open(pdf_path)
+    last_page = min(last_page, doc.page_count)
+
+    new_doc = fitz.open()
+    for i in range(first_page - 1, last_page):
+        new_doc.insert_pdf(doc, from_page=i, to_page=i)
+
+    output_file = output_dir / f"{section_name}.pdf"
+    new_doc.save(output_file)
+    new_doc.close()
+    doc.close()
+    return output_file
+
+
+def size_mb(paths):
+    return sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do particionamento de seções")
+    parser.add_argument("pdf")
+    parser.add_argument("--manifest", help="manifesto JSON de seções (padrão: sumário do PDF)")
+    parser.add_argument("--level", type=int, default=1, help="nível do sumário usado para as seções")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if args.manifest:
+        sections = sections_from_manifest(args.manifest)
+    else:
+        sections = sections_from_toc(args.pdf, args.level)
+    pages = sum(last - first + 1 for _, (first, last) in sections)
+    print(f"{len(sections)} seções, {pages} páginas")
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp) / "secao_a_secao"
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            outputs = [baseline_parcionar(pages, name, args.pdf, output_dir) for name, pages in sections]
+        runs.append(("seção a seção", 1, time.perf_counter() - start, size_mb(outputs)))
+
+        for workers in sorted({1, args.workers}):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                outputs = parcionar_lote(sections, args.pdf, Path(tmp) / f"lote_{workers}", workers=workers)
+            runs.append(("lote", workers, time.perf_counter() - start, size_mb(outputs)))
+
+    print(f"\n{'modo':<16}{'procs':>6}{'segundos':>10}{'seções/s':>10}{'MB':>8}")
+    for mode, workers, seconds, mb in runs:
+        print(f"{mode:<16}{workers:>6}{seconds:>10.2f}{len(sections) / seconds:>10.1f}{mb:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# bench_pipeline.py
+#
+# Roda pipeline() de ponta a ponta (render → analyze → raw → pproc → silver) sobre um manual
+# sintético (synthetic_manual.py), com o client do módulo e o AsyncOpenAI apontados para o
+# servidor falso (fake_openai.py): sem custo e com latência, limites de taxa e taxa de erro
+# controlados. Mede páginas/minuto, latência por página (p50/p95, do envio da página à
+# descrição pronta), pico de RSS e chamadas de API por página.
+#
+# Cada execução é salva em benchmarks/results/ e pode ser comparada com a anterior (--compare latest)
+# ou com um arquivo específico, para achar regressões entre mudanças.
+#
+# Uso:
+#   python benchmarks/bench_pipeline.py [--pages 60] [--mix text=0.6,diagram=0.3,scanned=0.1]
+#       [--latency 0.3 --latency-dist lognormal --jitter 0.5] [--error-rate 0.02] [--compare latest]
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_render import peak_rss_mb
+from fake_openai import LATENCY_DISTRIBUTIONS, FakeOpenAIServer
+from synthetic_manual import DEFAULT_MIX, make_manual
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# métricas comparadas entre execuções e se "maior é melhor"
+COMPARED = {
+    "pages_per_minute": True,
+    "page_latency_p50": False,
+    "page_latency_p95": False,
+    "seconds": False,
+    "peak_rss_mb": False,
+    "calls_per_page": False,
+}
+
+
+class PageTimer:
+    """Envolve as funções de envio de páginas do módulo para medir envio → descrição pronta."""
+
+    def __init__(self, module):
+        self.latencies = []
+        self._lock = threading.Lock()
+        for name, pages_of in (("submit_doc_image", lambda args: 1),
+                               ("submit_doc_images", lambda args: len(args[1])),
+                               ("submit_text_pages", lambda args: len(args[1]))):
+            setattr(module, name, self._wrap(getattr(module, name), pages_of))
+
+    def _wrap(self, fn, pages_of):
+        def submit(*args, **kwargs):
+            start = time.perf_counter()
+            future = fn(*args, **kwargs)
+            pages = pages_of(args)
+            future.add_done_callback(lambda _: self._done(start, pages))
+            return future
+        return submit
+
+    def _done(self, start, pages):
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies.extend([elapsed] * pages)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def run(args):
+    server = FakeOpenAIServer(args.rpm, args.tpm, args.latency, latency_dist=args.latency_dist, jitter=args.jitter,
+                              error_rate=args.error_rate, response_chars=args.response_chars, seed=args.seed).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        # variáveis lidas na importação e no pipeline(): tudo aponta para o servidor falso
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "fake"
+        os.environ["FILE_REGISTRY_PATH"] = str(Path(tmp) / "openai_files.json")
+
+        from openai import OpenAI
+        import pipeline_extracao as pe
+
+        # como em openai_client(): sem retries do SDK, os 429 e erros passam pelo limitador
+        pe.client = OpenAI(base_url=server.base_url, api_key="fake", max_retries=0)
+        pe.file_registry.cache_clear()
+        timer = PageTimer(pe)
+
+        base = Path(tmp) / "base"
+        (base / "PDFs parcionados").mkdir(parents=True)
+        counts = make_manual(base / "PDFs parcionados" / "secao.pdf", args.pages, args.mix, args.seed)
+
+        error = None
+        start = time.perf_counter()
+        output = sys.stdout if args.verbose else open(os.devnull, "w")
+        try:
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                pe.pipeline(base, "BENCH", {}, None, use_cache=False, concurrency=args.concurrency)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        seconds = time.perf_counter() - start
+    server.stop()
+
+    stats = server.stats()
+    calls = sum(stats["calls"].values())
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "label": args.label,
+        "config": {key: getattr(args, key) for key in ("pages", "mix", "latency", "latency_dist", "jitter",
+                                                          "error_rate", "rpm", "tpm", "concurrency",
+                                                          "response_chars", "seed")},
+        "page_kinds": counts,
+        "error": error,
+        "seconds": seconds,
+        "pages_per_minute": args.pages / seconds * 60,
+        "page_latency_p50": percentile(timer.latencies, 50),
+        "page_latency_p95": percentile(timer.latencies, 95),
+        "pages_timed": len(timer.latencies),
+        "peak_rss_mb": peak_rss_mb(),
+        "api_calls": stats["calls"],
+        "calls_per_page": calls / args.pages,
+        "rate_limited": stats["rate_limited"],
+        "injected_errors": stats["errors"],
+        "max_in_flight": stats["max_in_flight"],
+    }
+
+
+def latest_result(exclude=None):
+    files = sorted(RESULTS_DIR.glob("bench_pipeline_*.json"))
+    files = [f for f in files if f != exclude]
+    return files[-1] if files else None
+
+
+def print_result(result):
+    fmt = lambda v, spec: format(v, spec) if v is not None else "n/a"
+    print(f"{result['config']['pages']} páginas {result['page_kinds']}")
+    if result["error"]:
+        print(f"⚠️ A pipeline falhou: {result['error']}")
+    print(f"Tempo: {result['seconds']:.1f}s — {result['pages_per_minute']:.0f} páginas/min")
+    print(f"Latência por página: p50 {fmt(result['page_latency_p50'], '.2f')}s, "
+          f"p95 {fmt(result['page_latency_p95'], '.2f')}s ({result['pages_timed']} páginas enviadas)")
+    print(f"Pico de RSS: {fmt(result['peak_rss_mb'], '.0f')} MB")
+    print(f"Chamadas de API: {result['api_calls']} — {result['calls_per_page']:.2f} por página, "
+          f"{result['rate_limited']} respostas 429, {result['injected_errors']} erros injetados")
+
+
+def print_comparison(previous, current, previous_path):
+    print(f"\nComparação com {previous_path.name} ({previous.get('label') or previous['timestamp']}):")
+    if previous["config"] != current["config"]:
+        print("⚠️ Configurações diferentes — a comparação pode não fazer sentido.")
+    print(f"{'métrica':<20}{'antes':>10}{'agora':>10}{'variação':>10}")
+    for metric, higher_is_better in COMPARED.items():
+        before, after = previous.get(metric), current.get(metric)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        worse = change < -0.05 if higher_is_better else change > 0.05
+        print(f"{metric:<20}{before:>10.2f}{after:>10.2f}{change:>+10.0%}{'  ⚠️' if worse else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da pipeline completa contra o servidor falso")
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="pesos dos tipos de página (text, diagram, scanned)")
+    parser.add_argument("--latency", type=float, default=0.3, help="latência mediana das chamadas (s)")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração das chamadas que devolvem 500")
+    parser.add_argument("--rpm", type=int, default=3000)
+    parser.add_argument("--tpm", type=int, default=5_000_000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--response-chars", type=int, default=4000, help="tamanho do JSON do pproc/silver")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="", help="nome da execução (ex.: branch ou commit)")
+    parser.add_argument("--compare", help="arquivo de resultado anterior, ou 'latest'")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="mostra a saída da pipeline")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_result(result)
+
+    path = None
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f"bench_pipeline_{datetime.now().strftime('%Y%m%dT%H%M%S')}.json"
+        path.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Resultado salvo em {path}")
+
+    if args.compare:
+        previous_path = latest_result(exclude=path) if args.compare == "latest" else Path(args.compare)
+        if previous_path is None:
+            print("Nenhum resultado anterior para comparar.")
+        else:
+            previous = json.loads(previous_path.read_text(encoding="utf-8"))
+            print_comparison(previous, result, previous_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# bench_rate_limiter.py
+#
+# Roda a análise de páginas contra o servidor falso (fake_openai.py), que aplica
+# limites de RPM/TPM, e compara:
+#   - "sdk":      concorrência fixa, retries/backoff padrão do SDK da OpenAI
+#   - "adaptive": AdaptiveRateLimiter (baldes RPM/TPM + cabeçalhos + AIMD)
+#
+# Uso:
+#   python benchmarks/bench_rate_limiter.py [--pages 200] [--rpm 600] [--tpm 400000] [--concurrency 16]
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_openai import FakeOpenAIServer
+
+PAGE_TEXT = "Remove the four screws and lift the cover. Check the belt tension. " * 20
+PAGE_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010802000000907753de"
+    "0000000c4944415408d763f8ffff3f0005fe02fea7d5a0b30000000049454e44ae426082"
+)
+
+
+def run(mode, pages, concurrency, server):
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    import concurrent.futures
+    from openai import AsyncOpenAI
+    import pipeline_extracao as pe
+    from analysis_engine import AnalysisEngine
+    from rate_limiter import AdaptiveRateLimiter
+
+    rpm, tpm = pe.RATE_LIMITS[pe.ANALYSIS_MODEL]
+    if mode == "adaptive":
+        aclient = AsyncOpenAI(base_url=server.base_url, api_key="fake", max_retries=0)
+        limiter = AdaptiveRateLimiter(rpm, tpm, max_concurrency=concurrency)
+    else:
+        aclient = AsyncOpenAI(base_url=server.base_url, api_key="fake", max_retries=8)
+        limiter = None
+
+    start = time.perf_counter()
+    failed = 0
+    with AnalysisEngine(concurrency, client=aclient, limiter=limiter) as engine:
+        futures = [pe.submit_doc_image(engine, PAGE_PNG, f"{i} {PAGE_TEXT}") for i in range(pages)]
+        for future in concurrent.futures.as_completed(futures):
+            if future.exception() is not None:
+                failed += 1
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "mode": mode,
+        "pages": pages,
+        "failed": failed,
+        "seconds": elapsed,
+        "pages_per_minute": pages / elapsed * 60,
+        **server.stats(),
+    }
+    if limiter is not None:
+        result["final_concurrency"] = limiter.concurrency
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do limitador de taxa contra um servidor falso")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--tpm", type=int, default=400000)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--modes", default="sdk,adaptive")
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes.split(","):
+        # servidor novo por modo para que as janelas de limite não se misturem
+        with FakeOpenAIServer(args.rpm, args.tpm, args.latency) as server:
+            results.append(run(mode, args.pages, args.concurrency, server))
+
+    print(f"\n{'modo':<10}{'páginas':>9}{'falhas':>8}{'pág/min':>10}{'reqs':>7}{'429':>6}{'pico':>6}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['pages']:>9}{r['failed']:>8}{r['pages_per_minute']:>10.0f}"
+              f"{r['requests']:>7}{r['rate_limited']:>6}{r['max_in_flight']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# bench_render.py
+#
+# Compara os backends de renderização (fitz x poppler) em páginas/segundo e pico de RSS.
+# Cada backend roda em um subprocesso separado para que o pico de memória de um não
+# contamine o outro.
+#
+# Uso:
+#   python benchmarks/bench_render.py caminho/para/secao.pdf [--dpi 200] [--pages 50] [--processes 4]
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def peak_rss_mb():
+    """Pico de RSS do processo atual e dos filhos (pool de renderização), em MB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except ImportError:
+            return None
+
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # macOS reporta bytes, Linux KB
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return (own + children) / scale
+
+
+def run_worker(pdf_path, backend, dpi, max_pages, processes):
+    import fitz
+    from render_pdf import iter_pages
+
+    with fitz.open(pdf_path) as doc:
+        total = doc.page_count if not max_pages else min(max_pages, doc.page_count)
+
+    encoded_bytes = 0
+    start = time.perf_counter()
+    for _, img in iter_pages(pdf_path, pages=range(total), backend=backend, dpi=dpi, processes=processes):
+        if not isinstance(img, bytes):
+            # poppler devolve PIL: inclui o re-encode PNG feito em get_img_uri
+            buffer = io.BytesIO()
+            img.save(buffer, format="PNG")
+            img = buffer.getvalue()
+        encoded_bytes += len(img)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "backend": backend,
+        "processes": processes,
+        "pages": total,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(total / elapsed, 2) if elapsed else None,
+        "kb_per_page": round(encoded_bytes / total / 1024, 1) if total else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de renderização")
+    parser.add_argument("pdf")
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=0, help="limita o número de páginas (0 = todas)")
+    parser.add_argument("--processes", type=int, default=0, help="pool de processos para o backend fitz")
+    parser.add_argument("--backends", default="poppler,fitz")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.pdf, args.worker, args.dpi, args.pages, args.processes)
+        return
+
+    runs = []
+    for backend in args.backends.split(","):
+        configs = [0]
+        if backend == "fitz" and args.processes:
+            configs.append(args.processes)
+        for processes in configs:
+            cmd = [sys.executable, __file__, args.pdf, "--worker", backend, "--dpi", str(args.dpi),
+                   "--pages", str(args.pages), "--processes", str(processes)]
+            proc = subprocess.run(cmd, capture_output=True, text=True, env=os.environ.copy())
+            if proc.returncode != 0:
+                print(f"⚠️ Backend {backend} falhou:\n{proc.stderr.strip()}")
+                continue
+            runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'backend':<10}{'procs':>6}{'páginas':>9}{'pág/s':>9}{'KB/pág':>9}{'RSS MB':>9}")
+    for r in runs:
+        rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "n/a"
+        print(f"{r['backend']:<10}{r['processes']:>6}{r['pages']:>9}{r['pages_per_second']:>9}"
+              f"{r['kb_per_page']:>9}{rss:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# bench_s3_sync.py
+#
+# Compara o envio arquivo a arquivo (cliente novo por arquivo, sempre reenviando, como a
+# interface fazia) com sincronizar_pasta: cliente único, envios concorrentes, objetos
+# iguais pulados e, opcionalmente, gzip. Gera uma pasta de JSONs sintéticos parecidos
+# com os silver.
+#
+# Sem AWS_ENDPOINT_URL o S3 é simulado em processo pelo moto (mede o custo do lado do
+# cliente: hashing, gzip, requisições puladas). Com AWS_ENDPOINT_URL apontando para um
+# S3 compatível (MinIO, moto_server) os tempos incluem a rede de verdade.
+#
+# Uso:
+#   python benchmarks/bench_s3_sync.py [--files 40] [--kb 400] [--concurrency 8]
+#   AWS_ENDPOINT_URL=http://127.0.0.1:9000 python benchmarks/bench_s3_sync.py
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import boto3
+
+BUCKET = "bench-pipeline-extracao"
+
+
+def make_files(folder, count, kb):
+    """JSONs com a cara de um silver: seções, passos e tags de imagem repetitivas."""
+    rng = random.Random(0)
+    words = ["check", "belt", "tension", "torque", "bolt", "replace", "filter", "oil", "pump", "valve"]
+    for i in range(count):
+        steps = []
+        size = 0
+        while size < kb * 1024:
+            step = {"step": len(steps) + 1, "text": " ".join(rng.choice(words) for _ in range(30)),
+                    "image": f"page_{rng.randint(1, 400)}_img_{rng.randint(1, 9)}"}
+            steps.append(step)
+            size += len(json.dumps(step))
+        data = {"general_information": {"machine_serial_number": "SN123"}, "maintenance": {"steps": steps}}
+        (Path(folder) / f"silver_{i:03d}.json").write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+
+def legacy_upload(folder, prefix):
+    """Envio como antes: um cliente novo por arquivo e upload sempre."""
+    for path in sorted(Path(folder).glob("*.json")):
+        client = boto3.client("s3", region_name=os.getenv("AWS_REGION", "us-east-1"),
+                              endpoint_url=os.getenv("AWS_ENDPOINT_URL") or None)
+        client.upload_file(str(path), BUCKET, f"{prefix}/{path.name}")
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do envio de pastas para o S3")
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--kb", type=int, default=400, help="tamanho aproximado de cada JSON")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    os.environ["AWS_S3_BUCKET"] = BUCKET
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+
+    mock = contextlib.nullcontext()
+    if not os.getenv("AWS_ENDPOINT_URL"):
+        from moto import mock_aws
+        mock = mock_aws()
+
+    with mock, tempfile.TemporaryDirectory() as tmp:
+        from s3_upload import s3_client, sincronizar_pasta
+
+        s3_client().create_bucket(Bucket=BUCKET)
+        make_files(tmp, args.files, args.kb)
+        total_mb = sum(path.stat().st_size for path in Path(tmp).glob("*.json")) / (1024 * 1024)
+
+        runs = [("arquivo a arquivo", timed(lambda: legacy_upload(tmp, "legacy"))[0], None)]
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for name, prefix, use_gzip in [("sync (1ª vez)", "sync", False), ("sync (sem mudanças)", "sync", False),
+                                           ("sync gzip", "gzip", True)]:
+                seconds, result = timed(lambda: sincronizar_pasta(tmp, prefix, use_gzip=use_gzip,
+                                                                  concurrency=args.concurrency))
+                runs.append((name, seconds, result))
+
+    print(f"{args.files} arquivos, {total_mb:.1f} MB")
+    print(f"\n{'modo':<22}{'segundos':>10}{'enviados':>10}{'pulados':>9}{'MB enviados':>13}")
+    for name, seconds, result in runs:
+        if result is None:
+            print(f"{name:<22}{seconds:>10.2f}{args.files:>10}{0:>9}{total_mb:>13.1f}")
+            continue
+        print(f"{name:<22}{seconds:>10.2f}{len(result['uploaded']):>10}{len(result['skipped']):>9}"
+              f"{result['bytes'] / (1024 * 1024):>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
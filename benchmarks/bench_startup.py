@@ -0,0 +1,146 @@
+# bench_startup.py
+#
+# Tempo de partida da linha de comando (cli.py) e da interface (screen.py), cada medida em um
+# interpretador novo (mediana de --runs execuções), contra um orçamento em segundos. Também
+# confere que nenhuma dependência pesada (SDK da OpenAI, PyMuPDF, boto3...) é carregada antes
+# de ser usada, nem mesmo ao importar pipeline_extracao, e compara com os imports eager que a
+# interface fazia antes.
+#
+# A janela só é aberta de verdade com display e ttkbootstrap instalados; sem eles a medida da
+# interface cobre os imports de screen.py que rodam antes da janela.
+#
+# Sai com código 1 se algum orçamento estourar (dá para usar no CI).
+#
+# Uso:
+#   python benchmarks/bench_startup.py [--runs 5] [--cli-budget 0.3] [--gui-budget 0.6] [--importtime]
+
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ("openai", "fitz", "pymupdf", "boto3", "tiktoken", "tqdm", "numpy", "PIL")
+
+# abre a janela e fecha assim que o loop de eventos começa
+GUI_SNIPPET = """
+import runpy, tkinter
+tkinter.Misc.mainloop = lambda self, n=0: self.destroy()
+runpy.run_path("screen.py", run_name="__main__")
+"""
+
+
+def screen_imports():
+    """Imports de nível de módulo de screen.py: o que roda antes de a janela aparecer."""
+    tree = ast.parse((ROOT / "screen.py").read_text(encoding="utf-8"))
+    lines = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            lines.append(ast.unparse(node))
+        elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Call) \
+                and getattr(node.value.func, "id", None) == "load_dotenv":
+            lines.append(ast.unparse(node))
+    return "\n".join(lines)
+
+
+def module_available(name):
+    return subprocess.run([sys.executable, "-c", f"import {name}"], cwd=ROOT,
+                          capture_output=True).returncode == 0
+
+
+def run_python(args, env, cwd=ROOT):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *args], cwd=cwd, env=env, capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} falhou:\n{result.stderr}")
+    return seconds, result.stdout
+
+
+def measure(args, env, runs):
+    return statistics.median(run_python(args, env)[0] for _ in range(runs))
+
+
+def loaded_heavy_modules(code, env):
+    check = f"{code}\nimport sys\nprint(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    return [m for m in run_python(["-c", check], env)[1].strip().split(",") if m]
+
+
+def import_profile(module, env, top=10):
+    """Módulos mais caros (tempo acumulado) ao importar `module`, via -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        rows.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de partida da CLI e da interface")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--cli-budget", type=float, default=0.3, help="orçamento de `cli.py --help` (s)")
+    parser.add_argument("--gui-budget", type=float, default=0.6, help="orçamento da interface até a janela (s)")
+    parser.add_argument("--importtime", action="store_true", help="mostra os imports mais caros da pipeline")
+    args = parser.parse_args()
+
+    # sem chave nem .env: importar os módulos não pode exigir nenhum dos dois
+    env = {key: value for key, value in os.environ.items() if key != "OPENAI_API_KEY"}
+    env["PYTHONPATH"] = str(ROOT)
+
+    rows = []  # (medida, segundos, orçamento, módulos pesados carregados)
+    rows.append(("python (sem imports)", measure(["-c", "pass"], env, args.runs), None, None))
+    rows.append(("cli.py --help", measure(["cli.py", "--help"], env, args.runs), args.cli_budget,
+                 loaded_heavy_modules("import cli", env)))
+    rows.append(("cli.py upload --help", measure(["cli.py", "upload", "--help"], env, args.runs), args.cli_budget,
+                 None))
+
+    if module_available("ttkbootstrap") and (os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin")):
+        rows.append(("screen.py (janela aberta)", measure(["-c", GUI_SNIPPET], env, args.runs), args.gui_budget,
+                     None))
+    else:
+        # sem display/ttkbootstrap: só os imports de screen.py que estão instalados
+        code = "\n".join(line for line in screen_imports().splitlines()
+                         if "ttkbootstrap" not in line and "tkinter" not in line)
+        with tempfile.TemporaryDirectory() as tmp:
+            # load_dotenv em uma pasta vazia, para não depender do .env local
+            snippet = f"import sys; sys.path.insert(0, {str(ROOT)!r})\n{code}"
+            seconds = statistics.median(run_python(["-c", snippet], env, cwd=tmp)[0] for _ in range(args.runs))
+        rows.append(("screen.py (imports, sem Tk)", seconds, args.gui_budget, loaded_heavy_modules(code, env)))
+
+    rows.append(("import pipeline_extracao", measure(["-c", "import pipeline_extracao"], env, args.runs), None,
+                 loaded_heavy_modules("import pipeline_extracao", env)))
+    rows.append(("antes: imports eager da GUI",
+                 measure(["-c", "import pipeline_extracao, parcionar_pdf, s3_upload"], env, args.runs), None, None))
+
+    over_budget = False
+    print(f"{'medida':<32}{'segundos':>10}{'orçamento':>11}  pesados carregados")
+    for name, seconds, budget, heavy in rows:
+        over = budget is not None and seconds > budget
+        over_budget |= over or bool(heavy)
+        budget_text = f"{budget:.2f}" if budget is not None else "-"
+        heavy_text = ", ".join(heavy) if heavy else ("nenhum" if heavy is not None else "")
+        print(f"{name:<32}{seconds:>10.3f}{budget_text:>11}  {heavy_text}{'  ⚠️' if over or heavy else ''}")
+
+    if args.importtime:
+        print("\nImports mais caros de pipeline_extracao (acumulado):")
+        for seconds, name in import_profile("pipeline_extracao", env):
+            print(f"  {seconds:>7.3f}s  {name}")
+
+    if over_budget:
+        print("\n❌ Partida acima do orçamento ou com dependências pesadas carregadas cedo demais")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# bench_vision_batch.py
+#
+# Compara, contra o servidor falso (fake_openai.py), a análise de visão com
+#   - "single": uma página por chamada (submit_doc_image)
+#   - "batch":  até K páginas por chamada, K escolhido por plan_vision_batches (submit_doc_images)
+# e mostra páginas/minuto, requisições e tokens por página.
+#
+# Uso:
+#   python benchmarks/bench_vision_batch.py [--pages 120] [--max-pages 6] [--batch-tokens 6000]
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_openai import FakeOpenAIServer
+
+SHORT_TEXT = "WARNING: Disconnect power before opening the cover. "
+LONG_TEXT = "Remove the four screws and lift the cover. Check the belt tension. " * 60
+PAGE_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010802000000907753de"
+    "0000000c4944415408d763f8ffff3f0005fe02fea7d5a0b30000000049454e44ae426082"
+)
+
+
+def page_texts(pages):
+    # maioria de páginas curtas, uma longa a cada 5
+    return [f"{i} " + (LONG_TEXT if i % 5 == 4 else SHORT_TEXT) for i in range(pages)]
+
+
+def run(mode, texts, concurrency, max_pages, batch_tokens, server):
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    import concurrent.futures
+    from openai import AsyncOpenAI
+    import pipeline_extracao as pe
+    from analysis_engine import AnalysisEngine
+    from page_classifier import RouteStats
+    from rate_limiter import AdaptiveRateLimiter
+
+    aclient = AsyncOpenAI(base_url=server.base_url, api_key="fake", max_retries=0)
+    limiter = AdaptiveRateLimiter(server.rpm, server.tpm, max_concurrency=concurrency)
+    stats = RouteStats()
+    indices = list(range(len(texts)))
+
+    start = time.perf_counter()
+    failed = 0
+    with AnalysisEngine(concurrency, client=aclient, limiter=limiter) as engine:
+        if mode == "single":
+            futures = [pe.submit_doc_image(engine, PAGE_PNG, texts[i], stats=stats) for i in indices]
+        else:
+            futures = [
+                pe.submit_doc_images(engine, [(i, img, texts[i]) for i, img in batch], stats=stats)
+                for batch in pe.plan_vision_batches([(i, PAGE_PNG) for i in indices], texts, max_pages=max_pages,
+                                                    max_tokens=batch_tokens)
+            ]
+        for future in concurrent.futures.as_completed(futures):
+            if future.exception() is not None:
+                failed += 1
+    elapsed = time.perf_counter() - start
+
+    vision = stats.summary()["routes"].get("vision", {"pages": 0, "tokens": 0})
+    return {
+        "mode": mode,
+        "pages": len(texts),
+        "failed": failed,
+        "seconds": elapsed,
+        "pages_per_minute": len(texts) / elapsed * 60,
+        "tokens_per_page": vision["tokens"] / max(vision["pages"], 1),
+        **server.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de várias páginas por chamada de visão")
+    parser.add_argument("--pages", type=int, default=120)
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--tpm", type=int, default=2000000)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.05, help="segundos extras por 1000 tokens")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-pages", type=int, default=6)
+    parser.add_argument("--batch-tokens", type=int, default=6000)
+    args = parser.parse_args()
+
+    texts = page_texts(args.pages)
+    results = []
+    for mode in ("single", "batch"):
+        with FakeOpenAIServer(args.rpm, args.tpm, args.latency, token_latency=args.token_latency) as server:
+            results.append(run(mode, texts, args.concurrency, args.max_pages, args.batch_tokens, server))
+
+    print(f"\n{'modo':<8}{'páginas':>9}{'falhas':>8}{'pág/min':>10}{'reqs':>7}{'429':>6}{'tokens/pág':>12}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['pages']:>9}{r['failed']:>8}{r['pages_per_minute']:>10.0f}"
+              f"{r['requests']:>7}{r['rate_limited']:>6}{r['tokens_per_page']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+# fake_openai.py
+#
+# Servidor HTTP local que imita os endpoints da OpenAI usados pela pipeline (chat
+# completions, responses com e sem streaming, files) e aplica limites de RPM/TPM em
+# janela deslizante, devolvendo 429 e os cabeçalhos x-ratelimit-* como a API real.
+# Assim como a API, o limite por minuto é aplicado em frações menores (`window`
+# segundos), então rajadas curtas também recebem 429. A latência pode seguir uma
+# distribuição (fixa, uniforme, lognormal) e uma fração das chamadas pode falhar
+# com 500 (`error_rate`).
+# Usado pelos benchmarks para testar a pipeline sem custo e sem depender da
+# latência da API.
+#
+# Uso direto:
+#   python benchmarks/fake_openai.py --rpm 600 --tpm 400000 --latency 0.3 --latency-dist lognormal
+#   OPENAI_BASE_URL=http://127.0.0.1:<porta>/v1 OPENAI_API_KEY=fake python ...
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+IMAGE_TOKENS = 765  # página de 200 DPI em detalhe alto: 4 tiles de 512px
+FILE_TOKENS = 2000  # PDF anexado à chamada do pproc/silver
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+PAGE_DELIMITER = re.compile(r"^<<<PAGE \d+>>>$", re.MULTILINE)
+
+
+def estimate_request_tokens(body):
+    """Estimativa do lado do servidor: ~4 caracteres por token, custo fixo por imagem e max_tokens."""
+    tokens = 0
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            tokens += len(content) // 4
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                tokens += len(part.get("text", "")) // 4
+            elif part.get("type") == "image_url":
+                tokens += IMAGE_TOKENS
+    # Responses API: itens de `input` com partes input_text/input_file
+    for item in body.get("input") or []:
+        content = item.get("content") if isinstance(item, dict) else None
+        if isinstance(content, str):
+            tokens += len(content) // 4
+            continue
+        for part in content or []:
+            if part.get("type") == "input_text":
+                tokens += len(part.get("text", "")) // 4
+            elif part.get("type") == "input_file":
+                tokens += FILE_TOKENS
+    return tokens + int(body.get("max_tokens") or body.get("max_completion_tokens") or 0)
+
+
+def fake_document(chars, seed=0):
+    """JSON no formato do pproc/silver com ~`chars` caracteres (seções, passos e tags de imagem)."""
+    rng = random.Random(seed)
+    document = {"general_information": {
+        "customer": "ACME", "machine_serial_number": "SN-FAKE", "machine_manufacturer": "Fake Machines",
+        "machine_type": "conveyor", "document_type": "maintenance manual",
+    }}
+    size = 0
+    section = 0
+    while size < chars:
+        section += 1
+        steps = [{"step": i + 1, "text": f"Check item {rng.randint(1, 999)} and record the value.",
+                  "image": f"page_{rng.randint(1, 400)}_img_1"} for i in range(5)]
+        document[f"section_{section}"] = {"title": f"Section {section}", "steps": steps}
+        size += len(json.dumps(steps))
+    return json.dumps(document, ensure_ascii=False)
+
+
+class FakeOpenAIServer:
+    def __init__(self, rpm=600, tpm=400000, latency=0.3, host="127.0.0.1", port=0, window=10.0, token_latency=0.0,
+                 latency_dist="fixed", jitter=0.5, error_rate=0.0, response_chars=4000, stream_chunk=64,
+                 stream_delay=0.0, seed=0):
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Distribuição inválida: {latency_dist} (use {', '.join(LATENCY_DISTRIBUTIONS)})")
+        self.rpm = rpm
+        self.tpm = tpm
+        self.latency = latency
+        self.token_latency = token_latency  # segundos extras por 1000 tokens da requisição
+        self.latency_dist = latency_dist
+        self.jitter = jitter                # uniforme: ±jitter·latency; lognormal: sigma
+        self.error_rate = error_rate        # fração das chamadas de modelo que devolvem 500
+        self.response_chars = response_chars
+        self.stream_chunk = stream_chunk    # caracteres por evento de delta no streaming
+        self.stream_delay = stream_delay    # segundos entre eventos de delta
+        self.window = window
+
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = Counter()  # requisições aceitas por rota
+        self.files = {}         # file_id -> metadados dos arquivos enviados
+        self.log = []           # (instante, tokens, aceita, retry-after em s) de cada chamada de modelo
+
+        self._history = deque()  # (timestamp, tokens) das requisições aceitas
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------------------------------------------------------------
+    # Janela deslizante de RPM/TPM
+    # ---------------------------------------------------------------
+    def admit(self, tokens):
+        """Devolve (aceita, cabeçalhos) para uma requisição de `tokens` tokens."""
+        with self._lock:
+            now = time.monotonic()
+            while self._history and now - self._history[0][0] >= self.window:
+                self._history.popleft()
+
+            used_requests = len(self._history)
+            used_tokens = sum(t for _, t in self._history)
+            reset = self.window - (now - self._history[0][0]) if self._history else 0.0
+
+            # limites da janela, proporcionais ao limite por minuto
+            scale = self.window / 60.0
+            self.requests += 1
+            accepted = used_requests + 1 <= self.rpm * scale and used_tokens + tokens <= self.tpm * scale
+            if accepted:
+                self._history.append((now, tokens))
+                used_requests += 1
+                used_tokens += tokens
+            else:
+                self.rate_limited += 1
+
+            headers = {
+                "x-ratelimit-limit-requests": str(self.rpm),
+                "x-ratelimit-limit-tokens": str(self.tpm),
+                "x-ratelimit-remaining-requests": str(max(int(self.rpm - used_requests / scale), 0)),
+                "x-ratelimit-remaining-tokens": str(max(int(self.tpm - used_tokens / scale), 0)),
+                "x-ratelimit-reset-requests": f"{reset:.3f}s",
+                "x-ratelimit-reset-tokens": f"{reset:.3f}s",
+            }
+            retry_after = None
+            if not accepted:
+                retry_after = max(reset, 0.05)
+                headers["retry-after-ms"] = str(int(retry_after * 1000))
+            self.log.append((now, tokens, accepted, retry_after))
+            return accepted, headers
+
+    def sample_latency(self, tokens):
+        """Latência de uma chamada: `latency` segundo a distribuição escolhida + custo por token."""
+        with self._lock:
+            if self.latency_dist == "uniform":
+                latency = self.latency * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+            elif self.latency_dist == "lognormal":
+                # mediana = latency; cauda longa como a da API real
+                latency = self.latency * self._rng.lognormvariate(0, self.jitter)
+            else:
+                latency = self.latency
+        return max(latency, 0.0) + self.token_latency * tokens / 1000
+
+    def inject_error(self):
+        with self._lock:
+            failed = self._rng.random() < self.error_rate
+            self.errors += failed
+            return failed
+
+    def chat_completion(self, body, tokens):
+        prompt_tokens = tokens - int(body.get("max_tokens") or 0)
+        content = "Fake page description.\n{\"image\": true}"
+        # lotes de páginas de texto: repete os delimitadores recebidos, uma descrição por página
+        user_text = ""
+        for message in body.get("messages", []):
+            if message.get("role") != "user":
+                continue
+            parts = message.get("content")
+            if isinstance(parts, str):
+                user_text += parts + "\n"
+            else:
+                user_text += "".join(part.get("text", "") + "\n" for part in parts or [] if part.get("type") == "text")
+        delimiters = PAGE_DELIMITER.findall(user_text)
+        if delimiters:
+            content = "\n".join(f"{d}\nFake page description." for d in delimiters)
+        return {
+            "id": f"chatcmpl-fake-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": prompt_tokens + len(content) // 4,
+            },
+        }
+
+    def response_object(self, body, tokens, text, status="completed"):
+        with self._lock:
+            number = self.requests
+        output = [{
+            "type": "message", "id": f"msg_fake_{number}", "status": "completed", "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }] if text is not None else []
+        return {
+            "id": f"resp_fake_{number}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": status,
+            "model": body.get("model", "fake"),
+            "output": output,
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": tokens,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": len(text or "") // 4,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": tokens + len(text or "") // 4,
+            },
+        }
+
+    def stream_events(self, body, tokens, text):
+        """Eventos SSE de uma resposta em streaming: created, deltas de texto e completed."""
+        yield {"type": "response.created", "response": self.response_object(body, tokens, None, "in_progress")}
+        item_id = self.response_object(body, tokens, "")["output"][0]["id"]
+        for i in range(0, len(text), self.stream_chunk):
+            yield {"type": "response.output_text.delta", "item_id": item_id, "output_index": 0,
+                   "content_index": 0, "delta": text[i:i + self.stream_chunk], "logprobs": []}
+        yield {"type": "response.completed", "response": self.response_object(body, tokens, text)}
+
+    def create_file(self, filename, size):
+        with self._lock:
+            file_id = f"file-fake-{len(self.files) + 1}"
+            self.files[file_id] = {
+                "id": file_id, "object": "file", "bytes": size, "created_at": int(time.time()),
+                "filename": filename, "purpose": "user_data", "status": "processed",
+            }
+            return self.files[file_id]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, headers):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, events, headers):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                # HTTP/1.0: o fim do corpo é o fechamento da conexão
+                for sequence, event in enumerate(events):
+                    event["sequence_number"] = sequence
+                    self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    if event["type"] == "response.output_text.delta" and server.stream_delay:
+                        time.sleep(server.stream_delay)
+
+            def _file_id(self):
+                return self.path.rstrip("/").split("/")[-1]
+
+            def do_GET(self):
+                file_id = self._file_id()
+                if "/files/" in self.path and file_id in server.files:
+                    server.calls["files.retrieve"] += 1
+                    self._send(200, server.files[file_id], {})
+                    return
+                self._send(404, {"error": {"message": f"Arquivo não encontrado: {file_id}", "code": "not_found"}}, {})
+
+            def do_DELETE(self):
+                file_id = self._file_id()
+                with server._lock:
+                    found = server.files.pop(file_id, None) is not None
+                if not found:
+                    self._send(404, {"error": {"message": f"Arquivo não encontrado: {file_id}", "code": "not_found"}}, {})
+                    return
+                server.calls["files.delete"] += 1
+                self._send(200, {"id": file_id, "object": "file", "deleted": True}, {})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                data = self.rfile.read(length)
+
+                if self.path.endswith("/files"):
+                    # multipart/form-data: só o nome e o tamanho interessam
+                    match = re.search(rb'filename="([^"]*)"', data)
+                    filename = match.group(1).decode("utf-8", "replace") if match else "upload.pdf"
+                    server.calls["files.create"] += 1
+                    self._send(200, server.create_file(filename, length), {})
+                    return
+
+                if self.path.endswith("/chat/completions"):
+                    route = "chat.completions"
+                elif self.path.endswith("/responses"):
+                    route = "responses"
+                else:
+                    self._send(404, {"error": {"message": f"Rota não simulada: {self.path}"}}, {})
+                    return
+
+                body = json.loads(data or b"{}")
+                tokens = estimate_request_tokens(body)
+                accepted, headers = server.admit(tokens)
+                if not accepted:
+                    self._send(429, {"error": {
+                        "message": "Rate limit reached (fake server)",
+                        "type": "requests",
+                        "code": "rate_limit_exceeded",
+                    }}, headers)
+                    return
+
+                with server._lock:
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                    server.calls[route] += 1
+                try:
+                    time.sleep(server.sample_latency(tokens))
+                    if server.inject_error():
+                        self._send(500, {"error": {"message": "Internal error (fake server)", "type": "server_error"}},
+                                   headers)
+                    elif route == "chat.completions":
+                        self._send(200, server.chat_completion(body, tokens), headers)
+                    else:
+                        text = fake_document(server.response_chars, seed=server.requests)
+                        if body.get("stream"):
+                            self._stream(server.stream_events(body, tokens, text), headers)
+                        else:
+                            self._send(200, server.response_object(body, tokens, text), headers)
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+        return Handler
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "errors": self.errors,
+            "max_in_flight": self.max_in_flight,
+            "calls": dict(self.calls),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor OpenAI falso com limites de taxa")
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--tpm", type=int, default=400000)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.0, help="segundos extras por 1000 tokens")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--jitter", type=float, default=0.5, help="uniforme: ±fração da latência; lognormal: sigma")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração das chamadas que devolvem 500")
+    parser.add_argument("--response-chars", type=int, default=4000, help="tamanho do JSON devolvido em /responses")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.rpm, args.tpm, args.latency, port=args.port,
+                              token_latency=args.token_latency, latency_dist=args.latency_dist, jitter=args.jitter,
+                              error_rate=args.error_rate, response_chars=args.response_chars).start()
+    print(f"Servidor falso em {server.base_url} (Ctrl+C para sair)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# synthetic_manual.py
+#
+# Gera manuais sintéticos para os benchmarks, com a mistura de páginas de um manual real:
+#   - "text":    páginas de texto corrido (procedimentos, avisos)
+#   - "diagram": desenhos vetoriais com poucas legendas (esquemas, vistas explodidas)
+#   - "scanned": página inteira como imagem, sem camada de texto (manual escaneado)
+#
+# Uso direto:
+#   python benchmarks/synthetic_manual.py saida.pdf --pages 200 --mix text=0.6,diagram=0.3,scanned=0.1
+
+import argparse
+import random
+
+import fitz  # PyMuPDF
+
+PAGE_KINDS = ("text", "diagram", "scanned")
+DEFAULT_MIX = "text=0.6,diagram=0.3,scanned=0.1"
+
+WORDS = ("check", "belt", "tension", "torque", "bolt", "replace", "filter", "oil", "pump", "valve", "motor",
+         "bearing", "cover", "sensor", "pressure", "clean", "inspect", "tighten", "remove", "install")
+SENTENCES = (
+    "Disconnect the main power supply before opening the cover.",
+    "Check the {0} and record the value in the maintenance log.",
+    "Remove the four screws and lift the {0} carefully.",
+    "Apply the specified torque to each {0} in a cross pattern.",
+    "Inspect the {0} for wear, cracks or leaks and replace it if necessary.",
+)
+
+
+def parse_mix(mix):
+    """"text=0.6,diagram=0.3,scanned=0.1" -> {"text": 0.6, ...} (pesos relativos)."""
+    weights = {}
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in PAGE_KINDS:
+            raise ValueError(f"Tipo de página inválido: {kind} (use {', '.join(PAGE_KINDS)})")
+        weights[kind] = float(weight or 1)
+    if sum(weights.values()) <= 0:
+        raise ValueError("A mistura de páginas precisa de algum peso positivo.")
+    return weights
+
+
+def _paragraphs(rng, count):
+    return "\n\n".join(
+        " ".join(rng.choice(SENTENCES).format(rng.choice(WORDS)) for _ in range(rng.randint(3, 6)))
+        for _ in range(count)
+    )
+
+
+def _text_page(page, rng, number):
+    page.insert_text((72, 60), f"{number}. {rng.choice(WORDS).title()} maintenance", fontsize=14)
+    page.insert_textbox(fitz.Rect(72, 80, page.rect.width - 72, page.rect.height - 60),
+                        _paragraphs(rng, rng.randint(4, 7)), fontsize=10)
+
+
+def _diagram_page(page, rng, number):
+    width, height = page.rect.width, page.rect.height
+    for _ in range(rng.randint(20, 60)):
+        x, y = rng.uniform(60, width - 120), rng.uniform(80, height - 120)
+        shape = rng.random()
+        if shape < 0.4:
+            page.draw_rect(fitz.Rect(x, y, x + rng.uniform(20, 100), y + rng.uniform(20, 80)), width=0.8)
+        elif shape < 0.7:
+            page.draw_circle((x, y), rng.uniform(5, 40), width=0.8)
+        else:
+            page.draw_line((x, y), (x + rng.uniform(-80, 80), y + rng.uniform(-80, 80)), width=0.6)
+    for i in range(rng.randint(3, 8)):
+        page.insert_text((rng.uniform(60, width - 120), rng.uniform(80, height - 60)),
+                         f"{i + 1} {rng.choice(WORDS)}", fontsize=8)
+    page.insert_text((72, 60), f"Figure {number}: {rng.choice(WORDS)} assembly", fontsize=12)
+
+
+def _scanned_page(page, rng, number):
+    # renderiza uma página de texto e a cola como imagem: fica sem camada de texto, como um scan
+    source = fitz.open()
+    _text_page(source.new_page(width=page.rect.width, height=page.rect.height), rng, number)
+    pix = source[0].get_pixmap(dpi=110, colorspace=fitz.csGRAY)
+    source.close()
+    page.insert_image(page.rect, pixmap=pix)
+
+
+PAGE_BUILDERS = {"text": _text_page, "diagram": _diagram_page, "scanned": _scanned_page}
+
+
+def make_manual(path, pages, mix=DEFAULT_MIX, seed=0):
+    """
+    Gera um PDF de `pages` páginas com a mistura `mix` e devolve a contagem por tipo.
+    Páginas e conteúdo são determinísticos para o mesmo `seed`.
+    """
+    weights = parse_mix(mix) if isinstance(mix, str) else mix
+    rng = random.Random(seed)
+    kinds = list(weights)
+    counts = dict.fromkeys(kinds, 0)
+    doc = fitz.open()
+    for number in range(1, pages + 1):
+        kind = rng.choices(kinds, weights=[weights[k] for k in kinds])[0]
+        PAGE_BUILDERS[kind](doc.new_page(), rng, number)
+        counts[kind] += 1
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um manual sintético")
+    parser.add_argument("output")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(make_manual(args.output, args.pages, args.mix, args.seed))
+
+
+if __name__ == "__main__":
+    main()
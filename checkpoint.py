@@ -0,0 +1,79 @@
+# checkpoint.py
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+def page_input_hash(pdf_hash, page, text, prompt, model, params):
+    """Hash dos insumos de uma página, calculado sem renderizar a imagem."""
+    payload = json.dumps(
+        {"pdf": pdf_hash, "page": page, "text": text, "prompt": prompt, "model": model, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PageJournal:
+    """
+    Journal JSONL por documento com o resultado de cada página analisada.
+
+    Cada linha é gravada com flush + fsync assim que a página termina, então
+    uma execução interrompida perde no máximo as páginas que estavam em voo.
+    Na leitura vale a última linha de cada página; uma última linha truncada
+    (queda no meio da escrita) é ignorada.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        needs_newline = False
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    needs_newline = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry["page"]] = entry
+
+        self._file = open(self.path, "a", encoding="utf-8")
+        if needs_newline:
+            self._file.write("\n")
+
+    def completed(self, page, input_hash):
+        """Descrição já concluída da página, se os insumos não mudaram; senão None."""
+        entry = self.entries.get(page)
+        if entry and entry["status"] == "ok" and entry["hash"] == input_hash:
+            return entry["content"]
+        return None
+
+    def record(self, page, input_hash, content=None, error=None):
+        entry = {
+            "page": page,
+            "hash": input_hash,
+            "status": "error" if error is not None else "ok",
+            "content": content,
+            "error": None if error is None else f"{type(error).__name__}: {error}",
+            "ts": time.time(),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.entries[page] = entry
+
+    def failed_pages(self):
+        return sorted(page for page, entry in self.entries.items() if entry["status"] == "error")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
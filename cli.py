@@ -0,0 +1,126 @@
+# cli.py
+#
+# Linha de comando da pipeline, sem Tk: particionar o manual, processar as seções e enviar
+# os resultados para o S3 (cron, containers, CI). Cada subcomando importa só o que usa:
+# `--help` e `upload` não carregam o SDK da OpenAI, e o PyMuPDF só entra em `partition`
+# e `process`.
+#
+# Uso:
+#   python cli.py partition MANUAL.pdf --pages 12 30 --section freios
+#   python cli.py partition MANUAL.pdf --toc [--level 1]        (uma seção por capítulo do sumário)
+#   python cli.py partition MANUAL.pdf --manifest secoes.json
+#   python cli.py process BASE_PATH SN123_MANUAL_freios [--file freios.pdf] [--from-stage pproc]
+#       [--serial-number SN123] [--manual MANUAL]
+#   python cli.py upload BASE_PATH/results/silver --prefix SN123/MANUAL [--pattern "*.json"] [--gzip]
+
+import argparse
+import sys
+from pathlib import Path
+
+# Estágios aceitos por --from-stage; iguais a stage_manifest.START_STAGES, repetidos aqui
+# para o --help não importar a pipeline
+START_STAGES = ("pproc", "silver")
+
+
+def cmd_partition(args):
+    from parcionar_pdf import parcionar, parcionar_lote, sections_from_manifest, sections_from_toc
+
+    output_dir = Path(args.output) if args.output else Path(args.pdf).parent / "PDFs parcionados"
+    if args.pages:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        parcionar(args.pages, args.section, args.pdf, str(output_dir))
+        return 0
+
+    sections = sections_from_toc(args.pdf, args.level) if args.toc else sections_from_manifest(args.manifest)
+    if not sections:
+        print(f"❌ Nenhuma seção encontrada em {args.manifest or args.pdf}")
+        return 1
+    parcionar_lote(sections, args.pdf, output_dir, workers=args.workers)
+    return 0
+
+
+def cmd_process(args):
+    from pipeline_extracao import pipeline
+
+    general_information = {"machine_serial_number": args.serial_number, "document_type": args.manual}
+    pipeline(args.base_path, args.filename, general_information, args.selected_file, start_stage=args.start_stage)
+    return 0
+
+
+def cmd_upload(args):
+    from s3_upload import enviar_para_s3, sincronizar_pasta
+
+    use_gzip = True if args.gzip else None
+    if Path(args.path).is_dir():
+        result = sincronizar_pasta(args.path, args.prefix, args.pattern, use_gzip=use_gzip,
+                                   concurrency=args.concurrency)
+        print(f"{len(result['uploaded'])} enviados, {len(result['skipped'])} já atualizados, "
+              f"{len(result['failed'])} falhas")
+        for key, error in result["failed"].items():
+            print(f"❌ {key}: {error}")
+        return 1 if result["failed"] else 0
+
+    name = args.name or Path(args.path).name
+    prefix = args.prefix.strip().strip("/")
+    destino = enviar_para_s3(args.path, f"{prefix}/{name}" if prefix else name, use_gzip=use_gzip)
+    print(f"Arquivo enviado para {destino}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Pipeline de extração de manuais (sem interface gráfica)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    partition = commands.add_parser("partition", help="particiona o PDF bruto em seções")
+    partition.add_argument("pdf", help="PDF bruto do manual")
+    mode = partition.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--pages", type=int, nargs=2, metavar=("PRIMEIRA", "ULTIMA"),
+                      help="uma seção com estas páginas (base 1)")
+    mode.add_argument("--toc", action="store_true", help="uma seção por entrada do sumário do PDF")
+    mode.add_argument("--manifest", help='JSON com [{"name": ..., "pages": [primeira, ultima]}, ...]')
+    partition.add_argument("--section", help="nome da seção (com --pages)")
+    partition.add_argument("--level", type=int, default=1, help="nível do sumário usado com --toc")
+    partition.add_argument("--workers", type=int, help="processos do particionamento em lote (PARTITION_WORKERS)")
+    partition.add_argument("--output", help="pasta de saída (padrão: 'PDFs parcionados' ao lado do PDF)")
+    partition.set_defaults(handler=cmd_partition)
+
+    process = commands.add_parser("process", help="executa a pipeline para os PDFs de uma seção")
+    process.add_argument("base_path", help="pasta que contém 'PDFs parcionados' e 'results'")
+    process.add_argument("filename", help="nome base dos arquivos de saída (ex.: SERIAL_MANUAL_SECAO)")
+    process.add_argument("--file", dest="selected_file", help="PDF da pasta a processar (padrão: todos)")
+    process.add_argument("--from-stage", dest="start_stage", choices=START_STAGES,
+                         help="começa neste estágio usando os artefatos de results/raw ou results/silver")
+    process.add_argument("--serial-number", default="", help="machine_serial_number do general_information")
+    process.add_argument("--manual", default="", help="document_type do general_information")
+    process.set_defaults(handler=cmd_process)
+
+    upload = commands.add_parser("upload", help="envia um arquivo ou sincroniza uma pasta com o S3")
+    upload.add_argument("path", help="arquivo ou pasta local (ex.: results/silver)")
+    upload.add_argument("--prefix", default="", help="pasta no bucket")
+    upload.add_argument("--name", help="nome do objeto no S3 (arquivo único; padrão: o nome local)")
+    upload.add_argument("--pattern", default="*.json", help="arquivos da pasta que são enviados")
+    upload.add_argument("--gzip", action="store_true", help="envia JSON com Content-Encoding gzip (S3_GZIP)")
+    upload.add_argument("--concurrency", type=int, help="arquivos enviados ao mesmo tempo (S3_CONCURRENCY)")
+    upload.set_defaults(handler=cmd_upload)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "partition" and args.pages and not args.section:
+        parser.error("--pages precisa de --section")
+
+    # antes de importar a pipeline: as configurações por variável de ambiente são lidas na importação
+    from dotenv import load_dotenv
+    load_dotenv()
+    try:
+        return args.handler(args)
+    except (ValueError, FileNotFoundError) as e:
+        # configuração faltando (chave, credenciais, pastas): mensagem curta em vez do traceback
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
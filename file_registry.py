@@ -0,0 +1,196 @@
+# file_registry.py
+import concurrent.futures
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+from openai import NotFoundError
+
+from analysis_cache import file_sha256
+from tracing import span
+
+DEFAULT_TTL_HOURS = 24 * 7
+DEFAULT_REGISTRY_PATH = Path.home() / ".cache" / "pipeline_extracao" / "openai_files.json"
+
+
+class FileRegistry:
+    """
+    Registro local sha256 -> file_id dos PDFs enviados à API de arquivos.
+
+    O mesmo PDF é enviado uma única vez e o `file_id` é reaproveitado entre
+    estágios (pproc, silver) e entre execuções. Arquivos remotos mais antigos
+    que o TTL são apagados e reenviados na próxima vez que forem usados.
+
+    :param files_api: `client.files` da OpenAI ou um `LocalFileStore`
+    """
+
+    def __init__(self, files_api, path=None, ttl_hours=None):
+        if path is None:
+            path = os.getenv("FILE_REGISTRY_PATH") or DEFAULT_REGISTRY_PATH
+        if ttl_hours is None:
+            ttl_hours = float(os.getenv("FILE_REGISTRY_TTL_HOURS", DEFAULT_TTL_HOURS))
+
+        self.files_api = files_api
+        self.path = Path(path)
+        self.ttl_seconds = ttl_hours * 3600
+        self.uploads = 0
+        self.reuses = 0
+
+        self._verified = set()  # file_ids confirmados no servidor nesta execução
+        self._inflight = {}     # sha -> Future do envio/verificação em andamento
+        # protege só o dicionário do registro e os contadores; as chamadas à API ficam fora dele
+        self._lock = threading.Lock()
+        self.entries = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _expired(self, entry, now):
+        return now - entry["uploaded_at"] > self.ttl_seconds
+
+    def _exists_remotely(self, file_id):
+        with self._lock:
+            if file_id in self._verified:
+                return True
+        try:
+            self.files_api.retrieve(file_id)
+        except (NotFoundError, FileNotFoundError):
+            return False
+        with self._lock:
+            self._verified.add(file_id)
+        return True
+
+    def _delete_remote(self, file_id):
+        try:
+            self.files_api.delete(file_id)
+        except (NotFoundError, FileNotFoundError):
+            pass
+        with self._lock:
+            self._verified.discard(file_id)
+
+    def get_or_upload(self, pdf_path, purpose="user_data"):
+        """
+        Devolve o `file_id` do PDF, enviando-o só se ainda não houver um válido.
+
+        Envios de PDFs diferentes acontecem em paralelo; chamadas simultâneas para o
+        mesmo PDF esperam o envio da primeira em vez de repeti-lo.
+        """
+        sha = file_sha256(pdf_path)
+
+        with self._lock:
+            pending = self._inflight.get(sha)
+            owner = pending is None
+            if owner:
+                pending = self._inflight[sha] = concurrent.futures.Future()
+                entry = self.entries.get(sha)
+
+        if not owner:
+            file_id = pending.result()
+            with self._lock:
+                self.reuses += 1
+            return file_id
+
+        try:
+            file_id = self._resolve(sha, entry, pdf_path, purpose)
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        else:
+            pending.set_result(file_id)
+        finally:
+            with self._lock:
+                del self._inflight[sha]
+        return file_id
+
+    def _resolve(self, sha, entry, pdf_path, purpose):
+        """Reaproveita `entry` se ainda vale no servidor; senão apaga o remoto antigo e envia de novo."""
+        if entry is not None:
+            if not self._expired(entry, time.time()) and self._exists_remotely(entry["file_id"]):
+                with self._lock:
+                    self.reuses += 1
+                return entry["file_id"]
+            self._delete_remote(entry["file_id"])
+            with self._lock:
+                if self.entries.get(sha) is entry:
+                    del self.entries[sha]
+
+        with open(pdf_path, "rb") as f, span("files.create", "api", file=os.path.basename(pdf_path)):
+            uploaded = self.files_api.create(file=f, purpose=purpose)
+
+        with self._lock:
+            self.uploads += 1
+            self._verified.add(uploaded.id)
+            self.entries[sha] = {
+                "file_id": uploaded.id,
+                "filename": os.path.basename(pdf_path),
+                "uploaded_at": time.time(),
+            }
+            self._save()
+        return uploaded.id
+
+    def cleanup(self, max_age_hours=None):
+        """Apaga do servidor e do registro os arquivos mais antigos que o TTL. Devolve quantos."""
+        max_age = self.ttl_seconds if max_age_hours is None else max_age_hours * 3600
+
+        with self._lock:
+            now = time.time()
+            stale = [self.entries.pop(sha)["file_id"] for sha, entry in list(self.entries.items())
+                     if now - entry["uploaded_at"] > max_age]
+            if stale:
+                self._save()
+        for file_id in stale:
+            try:
+                self._delete_remote(file_id)
+            except Exception as e:
+                # sem retries no client: uma falha aqui não pode impedir a execução
+                print(f"⚠️ Não foi possível apagar o arquivo remoto {file_id}: {e}")
+        return len(stale)
+
+
+class LocalFileStore:
+    """
+    Substituto local da API de arquivos (`client.files`) para testes e benchmarks.
+
+    Implementa `create`, `retrieve`, `delete` e `list`, guardando os arquivos em `root`.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, file_id):
+        return self.root / file_id
+
+    def create(self, file, purpose):
+        file_id = f"file-local-{uuid.uuid4().hex}"
+        with open(self._path(file_id), "wb") as out:
+            shutil.copyfileobj(file, out)
+        return self.retrieve(file_id)
+
+    def retrieve(self, file_id):
+        path = self._path(file_id)
+        if not path.exists():
+            raise FileNotFoundError(file_id)
+        return SimpleNamespace(id=file_id, bytes=path.stat().st_size, created_at=int(path.stat().st_mtime))
+
+    def delete(self, file_id):
+        path = self._path(file_id)
+        if not path.exists():
+            raise FileNotFoundError(file_id)
+        path.unlink()
+        return SimpleNamespace(id=file_id, deleted=True)
+
+    def list(self):
+        return [self.retrieve(path.name) for path in sorted(self.root.iterdir())]
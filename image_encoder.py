@@ -0,0 +1,204 @@
+# image_encoder.py
+import io
+import math
+import os
+
+from tracing import traced
+
+# PIL só é importado ao codificar: preset_config e vision_tokens não precisam dele
+
+# Regras de redimensionamento da API para imagens em detalhe alto: cabe em 2048x2048,
+# depois o lado menor vai a 768px; cobra 85 tokens + 170 por tile de 512x512
+API_MAX_SIDE = 2048
+API_SHORT_SIDE = 768
+TILE_SIZE = 512
+BASE_TOKENS = 85
+TILE_TOKENS = 170
+# Redução máxima (fração do lado) aceita para encaixar a imagem em uma fileira/coluna de tiles a menos
+TILE_SNAP = 0.15
+
+# Pixels mais escuros que isto contam como conteúdo ao cortar as margens
+TRIM_THRESHOLD = 245
+TRIM_PADDING = 12
+
+# Presets de codificação
+#   trim:       corta margens brancas
+#   resize:     reduz ao tamanho que a API usaria e, se faltar pouco, encaixa na grade de tiles
+#               (o tamanho da API sozinho não muda os tokens: só o corte e o encaixe economizam tiles)
+#   gray:       escala de cinza
+#   format:     PNG, JPEG ou WEBP; quality para os formatos com perda
+#   colors:     paleta do PNG (a redução suaviza as bordas e, sem paleta, o PNG fica maior que o original)
+#   max_tokens: orçamento de tokens da imagem (reduz a resolução até caber)
+#   max_bytes:  orçamento de tamanho (baixa a qualidade e, se preciso, a resolução)
+PRESETS = {
+    "original": {"trim": False, "resize": False, "gray": False, "format": "PNG"},
+    "png": {"trim": True, "resize": True, "gray": False, "format": "PNG", "colors": 256},
+    "gray": {"trim": True, "resize": True, "gray": True, "format": "PNG"},
+    "jpeg": {"trim": True, "resize": True, "gray": False, "format": "JPEG", "quality": 85},
+    "webp": {"trim": True, "resize": True, "gray": False, "format": "WEBP", "quality": 80},
+    "compact": {"trim": True, "resize": True, "gray": True, "format": "WEBP", "quality": 70,
+                "max_tokens": 765, "max_bytes": 150 * 1024},
+}
+# Sem IMAGE_PRESET a página vai cortada e com paleta; "original" envia o PNG renderizado como está
+DEFAULT_PRESET = "png"
+
+MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+def preset_config(preset=None):
+    """Configuração do preset informado ou, se None, da variável IMAGE_PRESET."""
+    if preset is None:
+        preset = os.getenv("IMAGE_PRESET", DEFAULT_PRESET)
+    if isinstance(preset, dict):
+        return preset
+    if preset not in PRESETS:
+        raise ValueError(f"Preset de imagem inválido: {preset} (use {', '.join(PRESETS)})")
+    config = dict(PRESETS[preset])
+    if os.getenv("IMAGE_MAX_TOKENS"):
+        config["max_tokens"] = int(os.getenv("IMAGE_MAX_TOKENS"))
+    if os.getenv("IMAGE_MAX_KB"):
+        config["max_bytes"] = int(float(os.getenv("IMAGE_MAX_KB")) * 1024)
+    return config
+
+
+def vision_tokens(width, height):
+    """Tokens cobrados por uma imagem em detalhe alto, após o redimensionamento da API."""
+    width, height = api_size(width, height)
+    tiles = math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE)
+    return BASE_TOKENS + TILE_TOKENS * tiles
+
+
+def api_size(width, height):
+    """Tamanho com que a API processa a imagem (ela só reduz, nunca amplia)."""
+    scale = min(1.0, API_MAX_SIDE / max(width, height))
+    short_side = min(width, height) * scale
+    if short_side > API_SHORT_SIDE:
+        scale *= API_SHORT_SIDE / short_side
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def snap_to_tiles(width, height, slack=TILE_SNAP):
+    """
+    Reduz a imagem até a borda de tile de baixo quando isso custa no máximo `slack`
+    do lado: uma página de 768x1100 (2x3 tiles) vai a 714x1024 (2x2), 340 tokens a menos.
+    """
+    scale = 1.0
+    for side in (width, height):
+        tiles = math.ceil(side / TILE_SIZE)
+        if tiles > 1 and (tiles - 1) * TILE_SIZE >= side * (1 - slack):
+            scale = min(scale, (tiles - 1) * TILE_SIZE / side)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def fit_token_budget(width, height, max_tokens):
+    """Maior tamanho (mesma proporção) cujos tiles cabem em `max_tokens`."""
+    max_tiles = max(1, (max_tokens - BASE_TOKENS) // TILE_TOKENS)
+    if vision_tokens(width, height) <= max_tokens:
+        return width, height
+    best = (1, 1)
+    # testa cada combinação de tiles que cabe no orçamento e fica com a maior área
+    for cols in range(1, max_tiles + 1):
+        rows = max_tiles // cols
+        scale = min(cols * TILE_SIZE / width, rows * TILE_SIZE / height, 1.0)
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        if size[0] * size[1] > best[0] * best[1]:
+            best = size
+    return best
+
+
+def trim_margins(img, threshold=TRIM_THRESHOLD, padding=TRIM_PADDING):
+    """Corta as margens brancas, mantendo `padding` pixels em volta do conteúdo."""
+    gray = img.convert("L")
+    mask = gray.point(lambda value: 255 if value < threshold else 0)
+    bbox = mask.getbbox()
+    if bbox is None:
+        return img  # página em branco
+    left, top, right, bottom = bbox
+    return img.crop((
+        max(left - padding, 0),
+        max(top - padding, 0),
+        min(right + padding, img.width),
+        min(bottom + padding, img.height),
+    ))
+
+
+def _save(img, fmt, quality=None, colors=None):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    options = {}
+    if colors and img.mode == "RGB":
+        img = img.quantize(colors, method=Image.Quantize.FASTOCTREE)
+    if fmt == "PNG":
+        options["compress_level"] = 6
+    elif quality is not None:
+        options["quality"] = quality
+    if fmt == "WEBP":
+        options["method"] = 2
+    img.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+
+@traced("encode_image", "render")
+def encode_image(img, preset=None):
+    """
+    Codifica a página conforme o preset e devolve (bytes, mime).
+
+    :param img: bytes PNG (backend fitz) ou imagem PIL (backend poppler)
+    :param preset: nome em PRESETS, dict de configuração ou None para IMAGE_PRESET
+    """
+    from PIL import Image
+
+    config = preset_config(preset)
+    fmt = config["format"]
+
+    if isinstance(img, bytes):
+        if not (config["trim"] or config["resize"] or config["gray"]) and fmt == "PNG" \
+                and "max_tokens" not in config and "max_bytes" not in config:
+            return img, MIME_TYPES[fmt]  # já é o PNG renderizado
+        img = Image.open(io.BytesIO(img))
+
+    img = img.convert("L" if config["gray"] else "RGB")
+
+    if config["trim"]:
+        img = trim_margins(img)
+    if config["resize"]:
+        size = snap_to_tiles(*api_size(*img.size))
+        if size != img.size:
+            img = img.resize(size, Image.LANCZOS)
+    if config.get("max_tokens"):
+        size = fit_token_budget(*img.size, config["max_tokens"])
+        if size != img.size:
+            img = img.resize(size, Image.LANCZOS)
+
+    quality, colors = config.get("quality"), config.get("colors")
+    data = _save(img, fmt, quality, colors)
+
+    max_bytes = config.get("max_bytes")
+    while max_bytes and len(data) > max_bytes and min(img.size) > 64:
+        if quality is not None and fmt != "PNG" and quality > 40:
+            quality -= 10
+        else:
+            img = img.resize((max(1, int(img.width * 0.85)), max(1, int(img.height * 0.85))), Image.LANCZOS)
+        data = _save(img, fmt, quality, colors)
+
+    return data, MIME_TYPES[fmt]
+
+
+def sniff_mime(data):
+    """Mime de bytes já codificados, pelo cabeçalho do arquivo."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def image_size(data):
+    """(largura, altura) de bytes já codificados, sem decodificar os pixels."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        return img.size
@@ -0,0 +1,154 @@
+# language_filter.py
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+# Palavras funcionais mais frequentes de cada idioma. Em texto corrido elas
+# aparecem em toda frase, então bastam para separar os idiomas dos manuais.
+STOPWORDS = {
+    "en": "the and of to in is for with on that this are be by or as from it at not if an when must "
+          "will can before after into all each only should these which your you do use any".split(),
+    "de": "der die das und ist nicht mit den von zu für auf dem des ein eine im werden wird sich bei "
+          "oder aus vor nach sind kann wenn muss auch nur durch einer einen".split(),
+    "it": "il di che la per non con del della le un una sono alla dei delle gli si nel è da essere "
+          "deve prima dopo se questo questa quando ogni solo".split(),
+    "fr": "le la les de des et est pour dans avec une un sur par pas au du ne que qui ce doit avant "
+          "après être sont cette ces lors tout".split(),
+    "es": "el la los las de y en para con por que una un del se al no es debe antes después ser son "
+          "este esta cuando cada solo".split(),
+    "pt": "o a os as de e em para com por que uma um do da dos das não é deve antes depois ser são "
+          "este esta quando cada".split(),
+    "nl": "de het een en van is niet met voor op dat te aan bij worden wordt zijn moet na als ook".split(),
+}
+STOPWORD_SETS = {lang: set(words) for lang, words in STOPWORDS.items()}
+
+WORD = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+# Escritas que não são latinas: a fração de caracteres já decide o idioma
+SCRIPTS = {
+    "zh": re.compile(r"[一-鿿]"),
+    "ja": re.compile(r"[぀-ヿ]"),
+    "ko": re.compile(r"[가-힯]"),
+    "ru": re.compile(r"[Ѐ-ӿ]"),
+}
+
+# Abaixo disso não há texto suficiente para decidir e a página é mantida
+MIN_WORDS = 20
+MIN_CONFIDENCE = 0.8
+# Palavras funcionais de outro idioma exigidas para tirar a página do inglês, em número e em
+# fração das palavras: tabelas e listas de peças em inglês têm poucas ("Part No.", "Qty")
+MIN_FOREIGN_WORDS = 5
+MIN_FOREIGN_SHARE = 0.1
+
+# O que fazer com páginas que certamente não estão em inglês:
+#   drop: não analisa e tira do PDF enviado ao pproc/silver
+#   text: manda para a rota de texto (sem imagem), mais barata, e mantém no PDF
+#   off:  desliga o filtro
+MODES = ("drop", "text", "off")
+
+
+def filter_mode(value=None):
+    """Modo do filtro; padrão pela variável LANGUAGE_FILTER (drop)."""
+    mode = value if value is not None else os.getenv("LANGUAGE_FILTER", "drop")
+    if mode not in MODES:
+        raise ValueError(f"LANGUAGE_FILTER inválido: {mode} (use {', '.join(MODES)})")
+    return mode
+
+
+def detect_language(text):
+    """
+    Detecta o idioma predominante de um texto, sem rede nem modelos.
+
+    Devolve (idioma, confiança, palavras). Com pouco texto devolve ("unknown", 0, n).
+    """
+    letters = sum(1 for ch in text if ch.isalpha())
+    if letters:
+        for lang, pattern in SCRIPTS.items():
+            share = len(pattern.findall(text)) / letters
+            if share >= 0.3:
+                return lang, min(1.0, share / 0.6), letters
+
+    # letras soltas ("a", "e") são itens, códigos e unidades, não artigos
+    words = [w.lower() for w in WORD.findall(text) if len(w) > 1]
+    if len(words) < MIN_WORDS:
+        return "unknown", 0.0, len(words)
+
+    hits = Counter()
+    function_words = english = 0
+    for word in words:
+        langs = [lang for lang, stopwords in STOPWORD_SETS.items() if word in stopwords]
+        if not langs:
+            continue
+        function_words += 1
+        english += "en" in langs
+        hits.update(lang for lang in langs if lang != "en")
+
+    if not function_words:
+        return "unknown", 0.0, len(words)
+    # a confiança mede inglês vs. não inglês; o idioma exato só vai para o log
+    english_share = english / function_words
+    if english_share >= 0.5 or not hits:
+        return "en", english_share, len(words)
+    foreign = function_words - english
+    if foreign < MIN_FOREIGN_WORDS or foreign < MIN_FOREIGN_SHARE * len(words):
+        # poucas evidências para descartar a página
+        return "unknown", 0.0, len(words)
+    return hits.most_common(1)[0][0], 1.0 - english_share, len(words)
+
+
+def non_english_pages(texts, min_confidence=MIN_CONFIDENCE):
+    """Dict índice -> (idioma, confiança, palavras) das páginas que não estão em inglês."""
+    skipped = {}
+    for idx, text in enumerate(texts):
+        lang, confidence, words = detect_language(text)
+        if lang not in ("en", "unknown") and confidence >= min_confidence:
+            skipped[idx] = (lang, confidence, words)
+    return skipped
+
+
+def write_filtered_pdf(src, keep_pages, dst):
+    """Salva em `dst` uma cópia de `src` só com as páginas `keep_pages` (base 0)."""
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    with fitz.open(src) as doc:
+        doc.select(sorted(keep_pages))
+        # no_new_id mantém o /ID do original: o mesmo filtro gera sempre os mesmos bytes
+        doc.save(str(dst), garbage=3, deflate=True, no_new_id=True)
+    return str(dst)
+
+
+class LanguageAudit:
+    """Log JSONL das páginas ignoradas por idioma, para auditar a economia."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, filename, page, lang, confidence, words, action):
+        entry = {
+            "file": filename,
+            "page": page,
+            "lang": lang,
+            "confidence": round(confidence, 3),
+            "words": words,
+            "action": action,
+            "ts": time.time(),
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.counts[lang] += 1
+
+    def print_summary(self):
+        if not self.counts:
+            return
+        detail = ", ".join(f"{lang}: {n}" for lang, n in self.counts.most_common())
+        print(f"Idioma: {sum(self.counts.values())} páginas fora do inglês ({detail}) — log em {self.path}")
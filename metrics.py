@@ -0,0 +1,263 @@
+# metrics.py
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# USD por 1M de tokens: (entrada, entrada em cache, saída). MODEL_PRICES (JSON no mesmo
+# formato, ex.: '{"gpt-4.1": [2.0, 0.5, 8.0]}') sobrescreve ou completa a tabela.
+PRICES = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-5": (1.25, 0.125, 10.00),
+    "gpt-5-mini": (0.25, 0.025, 2.00),
+    "gpt-5-nano": (0.05, 0.005, 0.40),
+}
+
+
+def model_prices():
+    prices = dict(PRICES)
+    override = os.getenv("MODEL_PRICES")
+    if override:
+        prices.update({model: tuple(values) for model, values in json.loads(override).items()})
+    return prices
+
+
+def usage_tokens(usage):
+    """
+    (prompt, completion, cached) de um `usage` da API, seja do chat completions
+    (prompt_tokens/completion_tokens) ou da Responses API (input_tokens/output_tokens).
+    """
+    if usage is None:
+        return 0, 0, 0
+    prompt = getattr(usage, "prompt_tokens", None)
+    if prompt is not None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        completion = usage.completion_tokens
+    else:
+        prompt = getattr(usage, "input_tokens", 0) or 0
+        details = getattr(usage, "input_tokens_details", None)
+        completion = getattr(usage, "output_tokens", 0) or 0
+    cached = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+    return prompt, completion or 0, cached
+
+
+def call_cost(model, prompt, completion, cached, prices=None):
+    """Custo em USD de uma chamada; None se o modelo não está na tabela de preços."""
+    price = (prices or model_prices()).get(model)
+    if price is None:
+        return None
+    input_price, cached_price, output_price = price
+    return ((prompt - cached) * input_price + cached * cached_price + completion * output_price) / 1_000_000
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _p95(values):
+    values = sorted(values)
+    return values[min(int(len(values) * 0.95), len(values) - 1)] if values else None
+
+
+class ApiMetrics:
+    """
+    Tokens, custo e latência de cada chamada à API, por estágio, documento e página.
+
+    Cada chamada vira uma linha em um JSONL só de acréscimo (`open`); o resumo
+    (tokens/página, custo por seção, vazão) sai de `summary`, e `prometheus` gera o
+    mesmo resumo no formato texto do Prometheus.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.pages = {}  # documento -> páginas
+        self.started = time.time()
+        self._file = None
+        self._prices = model_prices()
+        self._lock = threading.Lock()
+
+    def open(self, path):
+        """Começa uma execução nova, gravando as chamadas em `path`."""
+        self.close()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self.calls = []
+            self.pages = {}
+            self.started = time.time()
+            self._prices = model_prices()
+            self._file = open(path, "a", encoding="utf-8")
+
+    def set_pages(self, document, pages):
+        with self._lock:
+            self.pages[document] = pages
+
+    def record(self, stage, model, usage=None, latency=0.0, retries=0, document=None, pages=None, error=None):
+        """Registra uma chamada; `retries` são as novas tentativas que ela representa (a soma dá o total)."""
+        prompt, completion, cached = usage_tokens(usage)
+        entry = {
+            "ts": time.time(),
+            "stage": stage,
+            "model": model,
+            "document": document,
+            "pages": pages,
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "cached_tokens": cached,
+            "latency": latency,
+            "retries": retries,
+            "cost_usd": call_cost(model, prompt, completion, cached, self._prices),
+            "error": None if error is None else f"{type(error).__name__}: {error}",
+        }
+        with self._lock:
+            self.calls.append(entry)
+            if self._file is not None:
+                self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self._file.flush()
+
+    @staticmethod
+    def _totals(calls):
+        prompt = sum(call["prompt_tokens"] for call in calls)
+        completion = sum(call["completion_tokens"] for call in calls)
+        latencies = [call["latency"] for call in calls if call["error"] is None]
+        return {
+            "calls": len(calls),
+            "retries": sum(call["retries"] for call in calls),
+            "errors": sum(call["error"] is not None for call in calls),
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "cached_tokens": sum(call["cached_tokens"] for call in calls),
+            "cost_usd": sum(call["cost_usd"] or 0.0 for call in calls),
+            "unpriced_calls": sum(call["cost_usd"] is None and call["error"] is None for call in calls),
+            "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+            "latency_p95": _p95(latencies),
+        }
+
+    def summary(self):
+        with self._lock:
+            calls = list(self.calls)
+            pages = dict(self.pages)
+        seconds = time.time() - self.started
+        total_pages = sum(pages.values())
+
+        by_stage, by_document = {}, {}
+        for call in calls:
+            by_stage.setdefault(call["stage"], []).append(call)
+            by_document.setdefault(call["document"] or "-", []).append(call)
+
+        documents = {}
+        for document, document_calls in by_document.items():
+            totals = self._totals(document_calls)
+            document_pages = pages.get(document)
+            tokens = totals["prompt_tokens"] + totals["completion_tokens"]
+            documents[document] = {
+                **totals,
+                "pages": document_pages,
+                "tokens_per_page": tokens / document_pages if document_pages else None,
+                "cost_per_page": totals["cost_usd"] / document_pages if document_pages else None,
+            }
+
+        totals = self._totals(calls)
+        tokens = totals["prompt_tokens"] + totals["completion_tokens"]
+        return {
+            "seconds": seconds,
+            "pages": total_pages,
+            "totals": {
+                **totals,
+                "tokens_per_page": tokens / total_pages if total_pages else None,
+                "cost_per_page": totals["cost_usd"] / total_pages if total_pages else None,
+                "pages_per_minute": total_pages / seconds * 60 if seconds > 0 else None,
+                "tokens_per_second": tokens / seconds if seconds > 0 else None,
+            },
+            "stages": {stage: self._totals(stage_calls) for stage, stage_calls in by_stage.items()},
+            "documents": documents,
+        }
+
+    def print_summary(self):
+        summary = self.summary()
+        totals = summary["totals"]
+        if not totals["calls"]:
+            return
+        per_page = f", {totals['tokens_per_page']:,.0f} tokens/página" if totals["tokens_per_page"] else ""
+        print(f"API: {totals['calls']} chamadas, {totals['prompt_tokens']:,} tokens de entrada "
+              f"({totals['cached_tokens']:,} em cache), {totals['completion_tokens']:,} de saída{per_page} — "
+              f"US$ {totals['cost_usd']:.4f}")
+        for stage, stats in summary["stages"].items():
+            print(f"  {stage:<8}{stats['calls']:>5} chamadas {stats['retries']:>3} retries "
+                  f"{stats['prompt_tokens'] + stats['completion_tokens']:>10,} tokens  US$ {stats['cost_usd']:.4f}")
+        for document, stats in summary["documents"].items():
+            per_page = f" (US$ {stats['cost_per_page']:.5f}/página)" if stats["cost_per_page"] is not None else ""
+            print(f"  {document}: US$ {stats['cost_usd']:.4f}{per_page}")
+        if totals["unpriced_calls"]:
+            print(f"⚠️ {totals['unpriced_calls']} chamadas de modelos sem preço na tabela (MODEL_PRICES)")
+
+    def prometheus(self):
+        """Resumo no formato texto do Prometheus (para o textfile collector do node_exporter)."""
+        with self._lock:
+            calls = list(self.calls)
+            pages = dict(self.pages)
+
+        series = {}
+
+        def add(name, labels, value):
+            key = tuple(sorted(labels.items()))
+            series.setdefault(name, {})
+            series[name][key] = series[name].get(key, 0) + value
+
+        for call in calls:
+            labels = {"stage": call["stage"], "model": call["model"], "document": call["document"] or "-"}
+            add("pipeline_api_calls_total", labels, 1)
+            add("pipeline_api_retries_total", labels, call["retries"])
+            add("pipeline_api_errors_total", labels, call["error"] is not None)
+            for kind in ("prompt", "completion", "cached"):
+                add("pipeline_api_tokens_total", {**labels, "kind": kind}, call[f"{kind}_tokens"])
+            add("pipeline_api_cost_usd_total", labels, call["cost_usd"] or 0.0)
+            add("pipeline_api_latency_seconds_sum", labels, call["latency"])
+            add("pipeline_api_latency_seconds_count", labels, 1)
+        for document, document_pages in pages.items():
+            add("pipeline_pages_total", {"document": document}, document_pages)
+
+        help_text = {
+            "pipeline_api_calls_total": ("counter", "Chamadas à API"),
+            "pipeline_api_retries_total": ("counter", "Novas tentativas de chamadas à API"),
+            "pipeline_api_errors_total": ("counter", "Chamadas à API que falharam"),
+            "pipeline_api_tokens_total": ("counter", "Tokens por tipo (prompt, completion, cached)"),
+            "pipeline_api_cost_usd_total": ("counter", "Custo estimado em USD"),
+            "pipeline_api_latency_seconds": ("summary", "Latência das chamadas à API"),
+            "pipeline_pages_total": ("counter", "Páginas processadas"),
+        }
+        # _sum e _count pertencem à família do summary, com um único HELP/TYPE
+        families = {}
+        for name, values in series.items():
+            family = name.rsplit("_", 1)[0] if name.endswith(("_sum", "_count")) else name
+            families.setdefault(family, []).append((name, values))
+
+        lines = []
+        for family, members in families.items():
+            kind, description = help_text[family]
+            lines += [f"# HELP {family} {description}", f"# TYPE {family} {kind}"]
+            for name, values in members:
+                for labels, value in values.items():
+                    rendered = ",".join(f'{key}="{_label_value(val)}"' for key, val in labels)
+                    lines.append(f"{name}{{{rendered}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # o collector pode ler a qualquer momento: grava ao lado e renomeia
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(self.prometheus(), encoding="utf-8")
+        os.replace(tmp_path, path)
+        return path
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
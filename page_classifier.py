@@ -0,0 +1,157 @@
+# page_classifier.py
+import os
+import threading
+
+import fitz  # PyMuPDF
+
+# Tipos de página
+TEXT = "text"        # só texto (ícones pequenos permitidos) → chamada de texto, sem imagem
+IMAGE = "image"      # figuras, diagramas ou desenhos vetoriais → chamada de visão
+SCANNED = "scanned"  # página digitalizada (imagem ocupando a página) → chamada de visão
+
+IMAGE_MARKER = '{"image": true}'
+
+# Limiares da classificação (frações da área da página)
+SCANNED_IMAGE_COVERAGE = 0.6   # imagens cobrindo mais que isso e pouco texto → digitalizada
+MAX_TEXT_IMAGE_COVERAGE = 0.03  # acima disso as imagens deixam de ser ícones
+MIN_SCANNED_TEXT_CHARS = 50
+# Caminhos vetoriais tolerados em uma página de texto (sublinhados, molduras, linhas de cabeçalho);
+# tabelas desenhadas e diagramas passam disso e vão para a visão
+MAX_TEXT_DRAWINGS = 8
+
+
+def _area(rect):
+    return max(rect.width, 0) * max(rect.height, 0)
+
+
+def text_with_image_markers(page, image_rects=None):
+    """
+    Texto da página em ordem de leitura, com {"image": true} no lugar de cada
+    imagem informada pelo fitz.
+    """
+    if image_rects is None:
+        image_rects = [fitz.Rect(info["bbox"]) for info in page.get_image_info()]
+
+    blocks = [(b[1], b[0], b[4].strip()) for b in page.get_text("blocks", sort=True) if b[6] == 0]
+    blocks += [(rect.y0, rect.x0, IMAGE_MARKER) for rect in image_rects]
+    blocks.sort(key=lambda b: (round(b[0]), b[1]))
+    return "\n\n".join(text for _, _, text in blocks if text)
+
+
+def classify_page(page):
+    """
+    Classifica uma página pelo que o fitz já sabe dela, sem renderizar.
+
+    Devolve um dict com `kind` (TEXT, IMAGE ou SCANNED), as medidas usadas na
+    decisão e, para páginas de texto, `text` com os marcadores de imagem.
+    """
+    page_area = _area(page.rect) or 1.0
+    image_rects = [fitz.Rect(info["bbox"]) & page.rect for info in page.get_image_info()]
+    image_coverage = min(sum(_area(r) for r in image_rects) / page_area, 1.0)
+
+    text_blocks = [b for b in page.get_text("blocks") if b[6] == 0]
+    text_chars = sum(len(b[4].strip()) for b in text_blocks)
+    text_coverage = min(sum(_area(fitz.Rect(b[:4])) for b in text_blocks) / page_area, 1.0)
+
+    drawings = len(page.get_drawings())
+
+    if image_coverage >= SCANNED_IMAGE_COVERAGE and text_chars < MIN_SCANNED_TEXT_CHARS:
+        kind = SCANNED
+    elif image_coverage > MAX_TEXT_IMAGE_COVERAGE or drawings > MAX_TEXT_DRAWINGS:
+        kind = IMAGE
+    else:
+        kind = TEXT
+
+    info = {
+        "kind": kind,
+        "images": len(image_rects),
+        "image_coverage": image_coverage,
+        "drawings": drawings,
+        "text_chars": text_chars,
+        "text_coverage": text_coverage,
+    }
+    if kind == TEXT:
+        info["text"] = text_with_image_markers(page, image_rects)
+    return info
+
+
+def classify_document(path):
+    """Classifica todas as páginas do PDF (lista na ordem das páginas)."""
+    with fitz.open(path) as doc:
+        return [classify_page(page) for page in doc]
+
+
+def routing_enabled(value=None):
+    """Roteamento de páginas de texto ligado? Padrão pela variável TEXT_PAGE_ROUTING (1)."""
+    if value is not None:
+        return value
+    return os.getenv("TEXT_PAGE_ROUTING", "1").lower() not in ("0", "false", "no")
+
+
+class RouteStats:
+    """
+    Contabiliza páginas, chamadas, latência e tokens por rota ("vision" / "text")
+    para relatar a fração de páginas desviadas da visão e a economia obtida.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.kinds = {TEXT: 0, IMAGE: 0, SCANNED: 0}
+        self._lock = threading.Lock()
+
+    def count_kind(self, kind, n=1):
+        with self._lock:
+            self.kinds[kind] += n
+
+    def record(self, route, pages, seconds, usage=None):
+        """Registra uma chamada que analisou `pages` páginas."""
+        with self._lock:
+            entry = self.routes.setdefault(route, {"pages": 0, "calls": 0, "seconds": 0.0, "tokens": 0})
+            entry["pages"] += pages
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            if usage is not None:
+                entry["tokens"] += usage.total_tokens
+
+    def _per_page(self, route, field):
+        entry = self.routes.get(route)
+        if not entry or not entry["pages"]:
+            return None
+        return entry[field] / entry["pages"]
+
+    def summary(self):
+        with self._lock:
+            classified = sum(self.kinds.values())
+            text_pages = self.routes.get("text", {}).get("pages", 0)
+            vision_tokens = self._per_page("vision", "tokens")
+            text_tokens = self._per_page("text", "tokens")
+            vision_seconds = self._per_page("vision", "seconds")
+            text_seconds = self._per_page("text", "seconds")
+
+        saved_tokens = saved_seconds = None
+        if vision_tokens is not None and text_tokens is not None:
+            saved_tokens = text_pages * (vision_tokens - text_tokens)
+            saved_seconds = text_pages * (vision_seconds - text_seconds)
+        return {
+            "kinds": dict(self.kinds),
+            "routed_fraction": self.kinds[TEXT] / classified if classified else 0.0,
+            "routes": {route: dict(entry) for route, entry in self.routes.items()},
+            "tokens_per_page": {"vision": vision_tokens, "text": text_tokens},
+            "seconds_per_page": {"vision": vision_seconds, "text": text_seconds},
+            "saved_tokens": saved_tokens,
+            "saved_seconds": saved_seconds,
+        }
+
+    def print_summary(self):
+        s = self.summary()
+        kinds = s["kinds"]
+        if sum(kinds.values()):
+            print(f"Páginas: {kinds[TEXT]} texto, {kinds[IMAGE]} com imagem, {kinds[SCANNED]} digitalizadas "
+                  f"({s['routed_fraction']:.0%} enviadas sem imagem)")
+        for route, entry in s["routes"].items():
+            pages = entry["pages"] or 1
+            print(f"  {route:<7} {entry['pages']:>5} páginas em {entry['calls']:>5} chamadas — "
+                  f"{entry['tokens'] / pages:,.0f} tokens/página, {entry['seconds'] / pages:.2f}s/página")
+        if s["saved_tokens"] is not None:
+            print(f"  Economia estimada da rota de texto: {s['saved_tokens']:,.0f} tokens, "
+                  f"{s['saved_seconds']:.0f}s de chamada")
@@ -0,0 +1,113 @@
+# page_index.py
+import difflib
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from structured_output import write_json_atomic
+
+# Escala da renderização usada só para o hash da imagem (0.25 ≈ 18 DPI): barata, e ainda
+# muda quando muda um desenho, uma tabela ou uma foto da página
+FINGERPRINT_SCALE = 0.25
+
+
+def page_diff_enabled(value=None):
+    """Reaproveitamento por página entre revisões ligado? Padrão pela variável PAGE_DIFF (1)."""
+    if value is not None:
+        return value
+    return os.getenv("PAGE_DIFF", "1").lower() not in ("0", "false", "no")
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def page_fingerprints(pdf_path, texts, scale=FINGERPRINT_SCALE):
+    """
+    Fingerprint de cada página: hash do texto extraído pelo fitz + hash da página
+    renderizada em baixa resolução (tons de cinza). Não depende da posição da página
+    nem dos metadados do PDF, então sobrevive a uma nova revisão do manual.
+    """
+    fingerprints = []
+    matrix = fitz.Matrix(scale, scale)
+    with fitz.open(pdf_path) as doc:
+        for page, text in zip(doc, texts):
+            pix = page.get_pixmap(matrix=matrix, colorspace=fitz.csGRAY, alpha=False)
+            fingerprints.append(f"{_sha256(text.encode('utf-8'))[:32]}:{_sha256(pix.samples)[:32]}")
+    return fingerprints
+
+
+def diff_pages(old, new):
+    """
+    Compara as sequências de fingerprints da revisão anterior e da nova.
+
+    :return: (pares (índice antigo, índice novo) das páginas iguais, contagem de
+             páginas alteradas, inseridas e removidas)
+    """
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    unchanged = []
+    counts = {"changed": 0, "inserted": 0, "deleted": 0}
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            unchanged.extend(zip(range(i1, i2), range(j1, j2)))
+            continue
+        counts["changed"] += min(i2 - i1, j2 - j1)
+        counts["inserted"] += max((j2 - j1) - (i2 - i1), 0)
+        counts["deleted"] += max((i2 - i1) - (j2 - j1), 0)
+    return unchanged, counts
+
+
+class PageIndex:
+    """
+    Índice de páginas de uma seção (results/pages/<pdf>.json): fingerprint e
+    descrição de cada página da última revisão analisada, com a fingerprint das
+    configurações da análise (modelo, prompt, parâmetros).
+
+    Quando chega uma revisão nova do manual, só as páginas alteradas ou inseridas
+    vão para a API; as iguais recebem a descrição da revisão anterior.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.settings = None
+        self.pages = []
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.settings = data["settings"]
+                self.pages = data["pages"]
+            except (json.JSONDecodeError, KeyError, OSError) as e:
+                print(f"⚠️ Índice de páginas ilegível ({self.path}): {e}. Nenhuma página será reaproveitada.")
+
+    def reuse(self, fingerprints, pending, settings):
+        """
+        Descrições da revisão anterior para as páginas pendentes que não mudaram.
+
+        :return: ({índice novo: descrição}, contagem de alteradas/inseridas/removidas),
+                 ou ({}, None) se não há revisão anterior com as mesmas configurações
+        """
+        if not self.pages or self.settings != settings:
+            return {}, None
+        unchanged, counts = diff_pages([page["fingerprint"] for page in self.pages], fingerprints)
+        # páginas que só mudaram de lugar também têm a descrição reaproveitada
+        by_fingerprint = {page["fingerprint"]: page["description"] for page in self.pages
+                          if page["description"] is not None}
+        reused = {new: self.pages[old]["description"] for old, new in unchanged
+                  if self.pages[old]["description"] is not None}
+        pending = set(pending)
+        for idx, page_fingerprint in enumerate(fingerprints):
+            if idx not in reused and page_fingerprint in by_fingerprint:
+                reused[idx] = by_fingerprint[page_fingerprint]
+        return {idx: content for idx, content in reused.items() if idx in pending}, counts
+
+    def save(self, fingerprints, descriptions, settings):
+        self.settings = settings
+        self.pages = [
+            {"fingerprint": page_fingerprint, "description": content}
+            for page_fingerprint, content in zip(fingerprints, descriptions)
+        ]
+        write_json_atomic({"settings": settings, "pages": self.pages}, self.path)
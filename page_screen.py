@@ -0,0 +1,169 @@
+# page_screen.py
+import concurrent.futures
+import hashlib
+import io
+import os
+import re
+import threading
+
+import numpy as np
+from PIL import Image
+
+# Resultado da triagem de uma página renderizada
+BLANK = "blank"          # sem conteúdo: não vai para a API
+DUPLICATE = "duplicate"  # igual a uma página anterior: reaproveita a descrição dela
+NEW = "new"              # precisa ser analisada
+
+# Pixels mais escuros que isto contam como tinta
+INK_LEVEL = 200
+# Fração de tinta abaixo da qual a página é considerada em branco
+BLANK_INK = 0.001
+# Páginas "intencionalmente em branco" têm um pouco de texto; aceitas até esta fração de tinta
+BLANK_TEXT_MAX_INK = 0.02
+BLANK_TEXT = re.compile(r"^(this page (is )?)?(intentionally )?(left )?blank\.?$")
+
+# dHash de HASH_SIZE x HASH_SIZE bits; duplicatas diferem em no máximo MAX_DISTANCE bits
+HASH_SIZE = 16
+MAX_DISTANCE = 8
+# Páginas lembradas pelo índice (as mais antigas saem primeiro)
+MAX_ENTRIES = 4096
+# Redução da imagem antes das contas (a triagem não precisa de 200 DPI)
+REDUCE_FACTOR = 4
+
+PAGE_NUMBER_LINE = re.compile(r"^\s*(page|pag\.?|p\.)?\s*\d+(\s*(of|/|de)\s*\d+)?\s*$", re.IGNORECASE)
+
+
+def screening_enabled(value=None):
+    """Triagem ligada? Padrão pela variável PAGE_SCREENING (1)."""
+    if value is not None:
+        return value
+    return os.getenv("PAGE_SCREENING", "1").lower() not in ("0", "false", "no")
+
+
+def page_array(img, reduce=REDUCE_FACTOR):
+    """Página renderizada (bytes ou PIL) como matriz uint8 em escala de cinza, reduzida."""
+    if isinstance(img, bytes):
+        img = Image.open(io.BytesIO(img))
+    gray = img.convert("L")
+    if reduce > 1:
+        gray = gray.reduce(reduce)
+    return np.asarray(gray)
+
+
+def ink_coverage(arr, level=INK_LEVEL):
+    return float(np.count_nonzero(arr < level)) / arr.size
+
+
+def dhash(arr, size=HASH_SIZE):
+    """
+    Hash perceptual por diferença: média por blocos em (size x size+1) e
+    comparação de cada bloco com o vizinho da direita. Devolve size*size/8 bytes.
+    """
+    rows = np.linspace(0, arr.shape[0], size + 1).astype(int)[:-1]
+    cols = np.linspace(0, arr.shape[1], size + 2).astype(int)[:-1]
+    sums = np.add.reduceat(np.add.reduceat(arr.astype(np.float64), rows, axis=0), cols, axis=1)
+    counts = np.outer(np.diff(np.append(rows, arr.shape[0])), np.diff(np.append(cols, arr.shape[1])))
+    means = sums / counts
+    return np.packbits(means[:, 1:] > means[:, :-1])
+
+
+def text_key(text):
+    """Chave do texto da página, sem espaços extras, caixa e linhas só com número de página."""
+    lines = [line.strip().lower() for line in text.splitlines()]
+    normalized = " ".join(" ".join(line.split()) for line in lines if line and not PAGE_NUMBER_LINE.match(line))
+    return normalized, int.from_bytes(hashlib.sha1(normalized.encode("utf-8")).digest()[:8], "big", signed=True)
+
+
+def link(placeholder, future):
+    """Copia o resultado (ou a exceção) de `future` para `placeholder` quando terminar."""
+    def _copy(done):
+        error = done.exception()
+        if error is not None:
+            placeholder.set_exception(error)
+        else:
+            placeholder.set_result(done.result())
+    future.add_done_callback(_copy)
+
+
+class PageScreen:
+    """
+    Triagem das páginas renderizadas antes da chamada de visão.
+
+    - Páginas em branco (pouca tinta, ou só "intentionally left blank") são puladas.
+    - Páginas quase iguais a uma anterior (mesmo texto e dHash a até `max_distance`
+      bits) reaproveitam a descrição dela, mesmo que ainda esteja em análise.
+
+    O índice fica em memória e é compartilhado por todos os documentos da execução.
+    """
+
+    def __init__(self, blank_ink=None, max_distance=None, max_entries=MAX_ENTRIES):
+        if blank_ink is None:
+            blank_ink = float(os.getenv("SCREEN_BLANK_INK", BLANK_INK))
+        if max_distance is None:
+            max_distance = int(os.getenv("SCREEN_MAX_DISTANCE", MAX_DISTANCE))
+        self.blank_ink = blank_ink
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+
+        self._hashes = np.zeros((max_entries, HASH_SIZE * HASH_SIZE // 8), dtype=np.uint8)
+        self._keys = np.zeros(max_entries, dtype=np.int64)
+        self._futures = [None] * max_entries
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+        self.counts = {BLANK: 0, DUPLICATE: 0, NEW: 0}
+
+    def _is_blank(self, ink, normalized_text):
+        if ink < self.blank_ink:
+            return True
+        return ink < BLANK_TEXT_MAX_INK and bool(BLANK_TEXT.match(normalized_text))
+
+    def screen(self, img, text):
+        """
+        Classifica a página e devolve (status, future):
+
+        - (BLANK, None)
+        - (DUPLICATE, future da página original) — aguarde o resultado dele
+        - (NEW, placeholder) — quem chamou deve resolvê-lo com `link(placeholder, future)`
+          ou `placeholder.set_result(...)`, pois duplicatas futuras vão esperar por ele
+        """
+        arr = page_array(img)
+        ink = ink_coverage(arr)
+        normalized, key = text_key(text)
+        if self._is_blank(ink, normalized):
+            with self._lock:
+                self.counts[BLANK] += 1
+            return BLANK, None
+
+        page_hash = dhash(arr)
+        with self._lock:
+            n = self._size
+            candidates = np.flatnonzero(self._keys[:n] == key)
+            if candidates.size:
+                distances = np.unpackbits(self._hashes[candidates] ^ page_hash, axis=1).sum(axis=1)
+                best = int(np.argmin(distances))
+                if distances[best] <= self.max_distance:
+                    self.counts[DUPLICATE] += 1
+                    return DUPLICATE, self._futures[candidates[best]]
+
+            placeholder = concurrent.futures.Future()
+            slot = self._next
+            self._hashes[slot] = page_hash
+            self._keys[slot] = key
+            self._futures[slot] = placeholder
+            self._next = (slot + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+            self.counts[NEW] += 1
+            return NEW, placeholder
+
+    def record_blank(self):
+        """Conta uma página em branco detectada fora da triagem (ex.: rota de texto sem texto)."""
+        with self._lock:
+            self.counts[BLANK] += 1
+
+    def print_summary(self):
+        blank, duplicate = self.counts[BLANK], self.counts[DUPLICATE]
+        if blank or duplicate:
+            print(f"Triagem: {blank} páginas em branco, {duplicate} duplicadas — "
+                  f"{blank + duplicate} chamadas de visão evitadas")
@@ -1,41 +1,193 @@
 # parcionar_pdf.py
-import fitz  # PyMuPDF
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-def parcionar(pages, section_name, pdf_path, output_dir):
+import fitz  # PyMuPDF
+
+# Opções de Document.save das seções: garbage=3 remove objetos órfãos e junta os duplicados
+# (fontes e imagens compartilhadas entre páginas), deflate comprime os streams. garbage=4
+# também compara o conteúdo dos streams, mas custa bem mais e quase não reduz o tamanho.
+SAVE_OPTIONS = {"garbage": 3, "deflate": True}
+
+
+def page_range(pages, total_pages):
     """
-    Particiona um PDF em uma seção específica usando PyMuPDF.
+    Valida o intervalo [primeira_pagina, ultima_pagina] (base 1) e o limita ao documento.
 
-    :param pages: lista [primeira_pagina, ultima_pagina] (base 1)
-    :param section_name: nome da seção
-    :param pdf_path: caminho completo para o PDF bruto
-    :param output_dir: pasta onde o PDF particionado será salvo
+    :return: (primeira_pagina, ultima_pagina) ajustadas
     """
     first_page, last_page = pages
 
     if first_page < 1 or last_page < first_page:
         raise ValueError("Páginas inválidas para particionar.")
 
-    output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    doc = fitz.open(pdf_path)  # abre o PDF
-    total_pages = doc.page_count
-
     if last_page > total_pages:
         last_page = total_pages  # não extrapolar
 
-    # cria novo PDF
+    return first_page, last_page
+
+
+def split_range(pages, window):
+    """Quebra [primeira, ultima] (base 1) em intervalos consecutivos de até `window` páginas."""
+    first_page, last_page = pages
+    window = max(int(window), 1)
+    return [[start, min(start + window - 1, last_page)] for start in range(first_page, last_page + 1, window)]
+
+
+def write_page_range(doc, first_page, last_page, output_file, **save_options):
+    """
+    Salva as páginas [first_page, last_page] (base 1) do documento aberto em `output_file`.
+
+    `save_options` vão para `Document.save` (ex.: garbage, deflate).
+    """
     new_doc = fitz.open()
 
-    # fitz indexa páginas a partir de 0
-    for i in range(first_page - 1, last_page):
-        new_doc.insert_pdf(doc, from_page=i, to_page=i)
+    # fitz indexa páginas a partir de 0; o intervalo vai inteiro em uma única inserção
+    new_doc.insert_pdf(doc, from_page=first_page - 1, to_page=last_page - 1)
 
-    output_file = output_dir / f"{section_name}.pdf"
-    new_doc.save(output_file)
+    new_doc.save(output_file, **save_options)
     new_doc.close()
+    return output_file
+
+
+def parcionar(pages, section_name, pdf_path, output_dir):
+    """
+    Particiona um PDF em uma seção específica usando PyMuPDF.
+
+    :param pages: lista [primeira_pagina, ultima_pagina] (base 1)
+    :param section_name: nome da seção
+    :param pdf_path: caminho completo para o PDF bruto
+    :param output_dir: pasta onde o PDF particionado será salvo
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    doc = fitz.open(pdf_path)  # abre o PDF
+    first_page, last_page = page_range(pages, doc.page_count)
+
+    output_file = output_dir / f"{section_name}.pdf"
+    write_page_range(doc, first_page, last_page, output_file)
     doc.close()
 
     print(f"PDF particionado salvo em: {output_file}")
     return output_file
+
+
+# -------------------------------------------------------------------
+# Particionamento em lote: várias seções a partir de uma única abertura do PDF
+# -------------------------------------------------------------------
+def section_filename(name):
+    """Nome de arquivo seguro para a seção (títulos do sumário têm barras, dois-pontos...)."""
+    name = re.sub(r'[<>:"/\\|?*\x00-\x1f]+', " ", name)
+    return re.sub(r"\s+", " ", name).strip(" .") or "secao"
+
+
+def unique_sections(sections):
+    """
+    Renomeia seções com o mesmo nome de arquivo (títulos repetidos no sumário ou no
+    manifesto) com um sufixo numérico: "Manutenção", "Manutenção (2)"... Sem isso a
+    segunda seção sobrescreveria o PDF da primeira. A comparação ignora maiúsculas,
+    como o sistema de arquivos do Windows.
+    """
+    used = set()
+    result = []
+    for name, pages in sections:
+        unique, n = name, 1
+        while unique.lower() in used:
+            n += 1
+            unique = f"{name} ({n})"
+        used.add(unique.lower())
+        result.append((unique, pages))
+    return result
+
+
+def sections_from_toc(pdf_path, level=1):
+    """
+    Seções a partir do sumário (outline) do PDF: cada entrada do nível `level` vai
+    da sua página até a página anterior à próxima entrada do mesmo nível (ou ao fim).
+
+    :return: lista de (nome, [primeira_pagina, ultima_pagina]) (base 1)
+    """
+    with fitz.open(pdf_path) as doc:
+        toc = doc.get_toc()
+        page_count = doc.page_count
+    entries = [(title, page) for lvl, title, page, *_ in toc if lvl == level and page >= 1]
+    if not entries:
+        raise ValueError(f"O PDF não tem sumário no nível {level}.")
+
+    sections = []
+    for i, (title, first_page) in enumerate(entries):
+        next_page = entries[i + 1][1] if i + 1 < len(entries) else page_count + 1
+        last_page = max(next_page - 1, first_page)
+        sections.append((section_filename(title), [first_page, last_page]))
+    return unique_sections(sections)
+
+
+def sections_from_manifest(path):
+    """
+    Seções a partir de um manifesto JSON: {"nome": [primeira, ultima], ...} ou
+    [{"name": "nome", "pages": [primeira, ultima]}, ...].
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if isinstance(manifest, dict):
+        sections = [(section_filename(name), list(pages)) for name, pages in manifest.items()]
+    else:
+        sections = [(section_filename(item["name"]), list(item["pages"])) for item in manifest]
+    # nomes diferentes no manifesto podem virar o mesmo nome de arquivo ("A/B" e "A B")
+    return unique_sections(sections)
+
+
+_worker_doc = None
+
+
+def _init_worker(pdf_path):
+    global _worker_doc
+    _worker_doc = fitz.open(pdf_path)
+
+
+def _write_section(first_page, last_page, output_file, save_options):
+    write_page_range(_worker_doc, first_page, last_page, output_file, **save_options)
+    return output_file
+
+
+def parcionar_lote(sections, pdf_path, output_dir, workers=None, save_options=None):
+    """
+    Particiona várias seções do mesmo PDF de uma vez.
+
+    O PDF é aberto uma única vez por processo. Cada seção é copiada com uma inserção
+    de intervalo. Com `workers` > 1 (padrão: variável PARTITION_WORKERS ou o número de
+    CPUs, limitado ao número de seções) as seções são gravadas em paralelo por um pool
+    de processos. Seções com o mesmo nome recebem um sufixo numérico (unique_sections).
+
+    :param sections: lista de (nome, [primeira_pagina, ultima_pagina]) — ver sections_from_toc/sections_from_manifest
+    :param save_options: opções de Document.save (padrão: SAVE_OPTIONS)
+    :return: caminhos dos PDFs gerados, na ordem das seções
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    save_options = SAVE_OPTIONS if save_options is None else save_options
+    if workers is None:
+        workers = int(os.getenv("PARTITION_WORKERS", str(os.cpu_count() or 1)))
+
+    with fitz.open(pdf_path) as doc:
+        jobs = [
+            (*page_range(pages, doc.page_count), output_dir / f"{name}.pdf")
+            for name, pages in unique_sections(sections)
+        ]
+        serial = workers <= 1 or len(jobs) <= 1
+        if serial:
+            outputs = [write_page_range(doc, first_page, last_page, output_file, **save_options)
+                       for first_page, last_page, output_file in jobs]
+
+    if not serial:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_init_worker,
+                                 initargs=(str(pdf_path),)) as executor:
+            futures = [executor.submit(_write_section, *job, save_options) for job in jobs]
+            outputs = [future.result() for future in futures]
+
+    print(f"{len(outputs)} seções particionadas em: {output_dir}")
+    return outputs
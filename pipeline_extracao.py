@@ -3,74 +3,182 @@
 # PDF to Text & Image Analysis with OpenAI
 # This script extracts text and images from PDF documents, sends them for AI analysis, and saves the results as JSON.
 
-from pdf2image import convert_from_path
 import base64
-import fitz  # PyMuPDF (corrigido: "import pymupdf" pode dar erro)
 from dotenv import load_dotenv
 import concurrent.futures
 import os
-import io
-from tqdm import tqdm
-from openai import OpenAI
 import json
 from datetime import datetime
 from prompts import *
 import time
-import tiktoken
+import threading
+import asyncio
+import functools
 import random
-from openai import RateLimitError, APIError
+import re
 from pathlib import Path
+from analysis_cache import AnalysisCache, cache_key, file_sha256
+from analysis_engine import AnalysisEngine
+from rate_limiter import get_limiter
+from checkpoint import PageJournal, page_input_hash
+from scheduler import Stage, StageGraph
+from image_encoder import encode_image, image_size, preset_config, sniff_mime, vision_tokens
+from metrics import ApiMetrics
+from structured_output import (STRUCTURED_RETRIES, PartialFile, SectionParser, StreamStats, StructuredStats, assemble,
+                               invalid_json, repair_instruction, structured_enabled, text_format, write_json_atomic)
+from artifacts import ArtifactWriter, compact_json, count_image_tags
+from stage_manifest import START_STAGES, StageManifest, content_hash, fingerprint, forced_stages
+import tracing
+from tracing import span, traced, tracing_enabled
 
 # -------------------------------------------------------------------
 # Setup
 # -------------------------------------------------------------------
-load_dotenv()
+# Importar o módulo não lê o .env nem cria o client: a chave só é exigida na primeira
+# chamada à API. Os pontos de entrada (cli.py, screen.py) carregam o .env antes de importar.
+# O SDK da OpenAI, o PyMuPDF, o tqdm e os módulos que dependem deles (numpy, PIL) também
+# só são importados nas funções que os usam.
 now = datetime.now().strftime(r"%Y%m%dT%H%M%S")
-api_key = os.getenv("OPENAI_API_KEY")
 
-if not api_key:
-    raise ValueError("OPENAI_API_KEY não encontrada no arquivo .env")
+client = None  # criado por openai_client(); pode ser trocado antes do uso (ex.: benchmarks)
+_client_lock = threading.Lock()
+
+
+def openai_api_key():
+    load_dotenv()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY não encontrada no arquivo .env")
+    return api_key
+
+
+def openai_client():
+    """Client síncrono (responses/files) compartilhado pelo processo, criado no primeiro uso."""
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from openai import OpenAI
+                # sem retries do SDK: 429 e 5xx do pproc/silver/arquivos voltam para safe_pproc /
+                # safe_silver_json, que avisam o limitador (como no client assíncrono da análise)
+                client = OpenAI(api_key=openai_api_key(), max_retries=0)
+    return client
 
-client = OpenAI(api_key=api_key)
 
 # Model configuration
 ANALYSIS_MODEL = "gpt-4.1"
 PPROC_MODEL = "gpt-5-mini"
+# Páginas só com texto (ver page_classifier.py) vão para um modelo mais barato, sem imagem
+TEXT_ANALYSIS_MODEL = "gpt-4.1-mini"
+
+# Parâmetros da chamada de visão (também fazem parte da chave do cache)
+ANALYSIS_PARAMS = {"max_tokens": 1000, "temperature": 0, "top_p": 0.1}
+
+# Requisições de visão em voo ao mesmo tempo (somando todos os documentos da execução)
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "6"))
+
+# Páginas de texto enviadas juntas em uma única chamada
+TEXT_BATCH_PAGES = int(os.getenv("TEXT_BATCH_PAGES", "4"))
+
+# Páginas de visão por chamada (1 = uma página por chamada). Com mais de uma, o tamanho
+# de cada lote é escolhido pelo custo estimado das páginas (ver plan_vision_batches)
+VISION_BATCH_PAGES = int(os.getenv("VISION_BATCH_PAGES", "1"))
+VISION_BATCH_TOKENS = int(os.getenv("VISION_BATCH_TOKENS", "6000"))
+
+# Quantas páginas renderizadas podem ficar em memória ao mesmo tempo (com lotes de visão,
+# cada item da fila do analyze ocupa VISION_BATCH_PAGES páginas)
+MAX_PAGES_IN_MEMORY = int(os.getenv("MAX_PAGES_IN_MEMORY", str(2 * ANALYSIS_CONCURRENCY * max(VISION_BATCH_PAGES, 1))))
+
+# Orçamentos iniciais (RPM, TPM) por modelo; os cabeçalhos x-ratelimit-* das respostas
+# corrigem esses valores para os limites reais da conta
+RATE_LIMITS = {
+    ANALYSIS_MODEL: (int(os.getenv("ANALYSIS_RPM", "500")), int(os.getenv("ANALYSIS_TPM", "30000"))),
+    PPROC_MODEL: (int(os.getenv("PPROC_RPM", "500")), int(os.getenv("PPROC_TPM", "200000"))),
+    TEXT_ANALYSIS_MODEL: (int(os.getenv("TEXT_RPM", "500")), int(os.getenv("TEXT_TPM", "200000"))),
+}
+
+# Tentativas de uma página de visão após 429 ou erro da API
+ANALYSIS_RETRIES = 6
+# Tentativas do pproc/silver (e do envio do PDF). O client síncrono não repete nada
+# sozinho, então cada 429 passa pelo limitador antes da próxima tentativa
+PPROC_RETRIES = 6
+# Espera máxima entre tentativas após um erro da API que não é 429 (s)
+MAX_BACKOFF = 60
 
 # -------------------------------------------------------------------
 # Utility Functions
 # -------------------------------------------------------------------
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    import tiktoken
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # modelos mais novos que a versão instalada do tiktoken
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # sem acesso para baixar o vocabulário: a contagem vira estimativa por caracteres
+        print(f"⚠️ Tokenizer indisponível para {model}: {e}. Usando estimativa de 4 caracteres/token.")
+        return None
+
+
 def count_tokens(model, text):
-    enc = tiktoken.encoding_for_model(model)
+    enc = _encoding(model)
+    if enc is None:
+        return len(text) // 4
     return len(enc.encode(text))
 
 
-def estimate_total_tokens(model, texts, num_images):
+def model_limiter(model, max_concurrency=1):
+    """Limitador de taxa compartilhado por todas as chamadas ao `model` neste processo."""
+    rpm, tpm = RATE_LIMITS.get(model, (500, 30000))
+    return get_limiter(model, rpm, tpm, max_concurrency)
+
+
+def image_tokens(img_bytes):
+    """Tokens cobrados pela imagem já codificada (tiles de 512px do tamanho que a API processa)."""
+    return vision_tokens(*image_size(img_bytes))
+
+
+def estimate_total_tokens(model, texts, images):
     """Estima tokens considerando apenas 1 vez o prompt base e aplicando margem de segurança."""
     total = count_tokens(model, analysis_prompt)  # só uma vez
     for t in texts:
         total += count_tokens(model, t)           # texto da página
-        total += 85                               # custo médio por imagem
+    for img_bytes in images:
+        total += image_tokens(img_bytes)          # tiles da imagem codificada
     return int(total * 1.2)  # margem de 20%
 
 
-def convert_doc_to_images(path):
-    return convert_from_path(path)
+def get_img_bytes(img, preset=None):
+    """
+    Codifica a página renderizada para envio (ver image_encoder.py).
 
+    Aceita bytes PNG (backend fitz) ou uma imagem PIL (backend poppler); o preset
+    padrão vem da variável IMAGE_PRESET.
+    """
+    return encode_image(img, preset)[0]
 
-def get_img_uri(img):
-    png_buffer = io.BytesIO()
-    img.save(png_buffer, format="PNG")
-    png_buffer.seek(0)
-    base64_png = base64.b64encode(png_buffer.read()).decode("utf-8")
-    return f"data:image/png;base64,{base64_png}"
+
+@traced("get_img_uri", "render")
+def get_img_uri(img_bytes):
+    """Data URI de uma imagem já codificada por get_img_bytes."""
+    if not isinstance(img_bytes, bytes):
+        img_bytes = get_img_bytes(img_bytes)
+    encoded = base64.b64encode(img_bytes).decode("utf-8")
+    return f"data:{sniff_mime(img_bytes)};base64,{encoded}"
 
 
 def extract_text_by_page(path):
+    import fitz  # PyMuPDF
+
     with fitz.open(path) as doc:
         return [page.get_text("text") for page in doc]
 
 
+@traced("load_safe_json", "json")
 def load_safe_json(raw_str):
     """Valida e corrige JSON malformatado retornado pela IA."""
     try:
@@ -91,27 +199,199 @@ def split_list(lst, n):
         yield lst[i:i + n]
 
 
+@functools.lru_cache(maxsize=None)
+def json_stats():
+    """Taxas de JSON inválido do pproc/silver no processo (ver structured_output.py)."""
+    return StructuredStats()
+
+
+@functools.lru_cache(maxsize=None)
+def stream_stats():
+    """Primeiro byte e vazão das respostas em streaming do pproc/silver no processo."""
+    return StreamStats()
+
+
+@functools.lru_cache(maxsize=None)
+def api_metrics():
+    """Tokens, custo e latência das chamadas da execução (ver metrics.py)."""
+    return ApiMetrics()
+
+
+@functools.lru_cache(maxsize=None)
+def file_registry():
+    """Registro de uploads compartilhado pelo processo (ver file_registry.py)."""
+    from file_registry import FileRegistry
+    return FileRegistry(openai_client().files)
+
+
+def upload_pdf(path):
+    """Envia o PDF uma única vez por conteúdo e devolve o file_id (reaproveitado entre estágios e execuções)."""
+    return file_registry().get_or_upload(path)
+
+
 # -------------------------------------------------------------------
 # Processing functions
 # -------------------------------------------------------------------
-def safe_pproc(pproc_prompt, path, json_str, retries=3):
+def _stream_sections(stage, input_items, schema_name, estimated_tokens, sink=None, tags=None, retry=False):
+    """
+    Uma chamada em streaming ao PPROC_MODEL. O JSON é decodificado seção a seção
+    conforme chega e, com `sink`, cada pedaço também vai direto para o disco.
+    Com `retry`, a chamada conta como um retry nas métricas da API.
+    """
+    limiter = model_limiter(PPROC_MODEL)
+    limiter.wait(estimated_tokens)
+
+    start = time.monotonic()
+    usage = None
+    try:
+        with span("responses.create", "api", stage=stage, stream=True):
+            raw = openai_client().responses.with_raw_response.create(
+                model=PPROC_MODEL,
+                input=input_items,
+                text=text_format(schema_name),
+                stream=True,
+            )
+            limiter.update_from_headers(raw.headers)
+
+            parser = SectionParser()
+            ttfb = output_tokens = None
+            for event in raw.parse():
+                if event.type == "response.output_text.delta":
+                    if ttfb is None:
+                        ttfb = time.monotonic() - start
+                    parser.feed(event.delta)
+                    if sink is not None:
+                        sink.write(event.delta)
+                elif event.type == "response.completed":
+                    usage = event.response.usage
+                    output_tokens = usage.output_tokens if usage is not None else None
+                elif event.type == "response.failed":
+                    raise RuntimeError(f"❌ [{stage}] resposta falhou: {event.response.error}")
+            parser.close()
+    except Exception as e:
+        api_metrics().record(stage, PPROC_MODEL, usage, time.monotonic() - start, int(retry), error=e, **(tags or {}))
+        raise
+
+    seconds = time.monotonic() - start
+    api_metrics().record(stage, PPROC_MODEL, usage, seconds, int(retry), **(tags or {}))
+    json_stats().record_response(stage, parser.valid)
+    stream_stats().record(stage, ttfb, seconds, parser.chars, output_tokens)
+    print(f"[{stage}] primeiro byte em {ttfb if ttfb is not None else seconds:.1f}s; "
+          f"{parser.chars / 1024:.1f} KB em {seconds:.1f}s")
+    return parser
+
+
+def structured_response(stage, input_items, schema_name, estimated_tokens, retries=STRUCTURED_RETRIES,
+                        output_path=None, tags=None):
+    """
+    JSON do pproc/silver com saída estruturada. Seções que chegam quebradas, ou que
+    faltaram porque a resposta foi cortada, são pedidas de novo sozinhas, sem
+    refazer a chamada do documento inteiro. Uma seção quebrada sem chave legível
+    não tem como ser pedida pelo nome: aí a chamada inteira é refeita.
+
+    Com `output_path` a resposta é gravada em `<output_path>.part` enquanto chega e
+    renomeada ao final; se alguma seção precisou ser refeita, o arquivo recebe o
+    JSON já consertado.
+    """
+    sink = PartialFile(output_path) if output_path is not None else None
+    try:
+        result, streamed_valid = _structured_sections(stage, input_items, schema_name, estimated_tokens, retries, sink,
+                                                      tags)
+        if sink is not None:
+            if not streamed_valid:
+                sink.rewrite(result)
+            sink.commit()
+    except BaseException:
+        if sink is not None:
+            sink.discard()
+        raise
+    return result
+
+
+def _structured_sections(stage, input_items, schema_name, estimated_tokens, retries, sink, tags=None):
+    """(objeto, a primeira resposta já era o JSON final?)"""
+    parser = first = _stream_sections(stage, input_items, schema_name, estimated_tokens, sink, tags)
+    for _ in range(retries):
+        if parser.started:
+            break
+        # nenhum objeto JSON na resposta: não há seção para aproveitar
+        print(f"⚠️ [{stage}] resposta sem JSON. Refazendo a chamada...")
+        parser = _stream_sections(stage, input_items, schema_name, estimated_tokens, tags=tags, retry=True)
+
+    if not parser.started:
+        # nenhuma tentativa trouxe um objeto JSON: o documento fica marcado como no load_safe_json
+        json_stats().record_lost_document(stage)
+        print(f"❌ [{stage}] nenhuma resposta com JSON após {retries + 1} tentativas")
+        return {"error": "invalid_json", "raw": parser.head}, False
+
+    order, sections, broken = list(parser.order), dict(parser.sections), dict(parser.broken)
+    unnamed = set(parser.unnamed)
+    after = parser.last_key() if parser.truncated else None
+
+    for _ in range(retries):
+        if not broken and after is None:
+            break
+        json_stats().record_retry(stage, len(broken) + (after is not None))
+        if unnamed:
+            # o "#N" não é uma chave do documento: não dá para pedir só essa seção
+            print(f"⚠️ [{stage}] seção quebrada sem chave legível. Refazendo a chamada inteira...")
+            retry = _stream_sections(stage, input_items, schema_name, estimated_tokens, tags=tags, retry=True)
+            if retry.started:
+                parser = retry
+                order, sections, broken = list(parser.order), dict(parser.sections), dict(parser.broken)
+                unnamed = set(parser.unnamed)
+                after = parser.last_key() if parser.truncated else None
+            continue
+
+        print(f"⚠️ [{stage}] JSON inválido em {len(broken)} seções{' (resposta cortada)' if after else ''}. "
+              f"Pedindo só essas seções de novo...")
+        repair = {"role": "user", "content": [{"type": "input_text", "text": repair_instruction(list(broken), after)}]}
+        retry = _stream_sections(stage, input_items + [repair], schema_name, estimated_tokens, tags=tags, retry=True)
+
+        for key in retry.order:
+            if key in retry.sections:
+                sections.setdefault(key, retry.sections[key])
+                broken.pop(key, None)
+            elif key not in sections:
+                broken[key] = retry.broken[key]
+                if key in retry.unnamed:
+                    unnamed.add(key)
+            if key not in order:
+                order.append(key)
+        after = (retry.last_key() or after) if retry.truncated else None
+
+    if broken or after is not None:
+        json_stats().record_lost(stage, len(broken))
+        print(f"❌ [{stage}] {len(broken)} seções continuaram inválidas após {retries} tentativas"
+              f"{' e a resposta continuou cortada' if after else ''}")
+    return assemble(order, sections, broken), parser is first and first.valid
+
+
+def safe_pproc(pproc_prompt, path, json_str, retries=PPROC_RETRIES, output_path=None, tags=None):
+    from openai import APIError, RateLimitError
+
     backoff = 5
     for attempt in range(retries):
         try:
-            return pproc(pproc_prompt, path, json_str)
-        except (RateLimitError, APIError) as e:
-            wait = backoff * (2 ** attempt) + random.uniform(0, 2)
+            return pproc(pproc_prompt, path, json_str, output_path, tags)
+        except RateLimitError as e:
+            # a próxima tentativa espera no limitador pelo tempo indicado pela API
+            wait = model_limiter(PPROC_MODEL).record_rate_limited(e.response.headers)
+            print(f"⚠️ Rate limit no pproc. Retentando em {wait:.1f}s...")
+        except APIError as e:
+            wait = min(backoff * (2 ** attempt), MAX_BACKOFF) + random.uniform(0, 2)
             print(f"⚠️ Erro no pproc: {e}. Retentando em {wait:.1f}s...")
             time.sleep(wait)
     raise RuntimeError("❌ pproc falhou após várias tentativas")
 
-def pproc(pproc_prompt, path, json_str):
+def pproc(pproc_prompt, path, json_str, output_path=None, tags=None):
+    """
+    JSON do pproc; com `output_path` ele também é gravado (em streaming) nesse arquivo.
+    `tags` (document, pages) identificam a chamada nas métricas de tokens e custo.
+    """
     print(f"Processando arquivo {path}")
 
-    file = client.files.create(
-        file=open(path, "rb"),
-        purpose="user_data"
-    )
+    file_id = upload_pdf(path)
 
     json_sys_prompt = (
         f"{pproc_prompt}\n\n"
@@ -120,26 +400,51 @@ def pproc(pproc_prompt, path, json_str):
         f"Preserve all details, conditions, and states: {json_str}"
     )
 
-    response = client.responses.create(
-        model=PPROC_MODEL,
-        input=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "input_file", "file_id": file.id},
-                    {"type": "input_text", "text": json_sys_prompt},
-                ],
-            }
-        ],
-    )
+    input_items = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "input_file", "file_id": file_id},
+                {"type": "input_text", "text": json_sys_prompt},
+            ],
+        }
+    ]
+    estimated_tokens = count_tokens(PPROC_MODEL, json_sys_prompt)
+    if structured_enabled():
+        return structured_response("pproc", input_items, "pproc_document", estimated_tokens, output_path=output_path,
+                                   tags=tags)
+
+    limiter = model_limiter(PPROC_MODEL)
+    limiter.wait(estimated_tokens)
+
+    start = time.monotonic()
+    try:
+        with span("responses.create", "api", stage="pproc"):
+            raw = openai_client().responses.with_raw_response.create(
+                model=PPROC_MODEL,
+                input=input_items,
+            )
+            response = raw.parse()
+    except Exception as e:
+        api_metrics().record("pproc", PPROC_MODEL, None, time.monotonic() - start, error=e, **(tags or {}))
+        raise
+    api_metrics().record("pproc", PPROC_MODEL, response.usage, time.monotonic() - start, **(tags or {}))
+    limiter.update_from_headers(raw.headers)
+
     if PPROC_MODEL == "gpt-5-mini":
-        return response.output_text.replace("```json", "").replace("```", "")
+        output = response.output_text.replace("```json", "").replace("```", "")
     else:
-        return str(response.output[0].content[0].text).replace("```json", "").replace("```", "")
+        output = str(response.output[0].content[0].text).replace("```json", "").replace("```", "")
+    pproc_json = load_safe_json(output)
+    if output_path is not None:
+        write_json_atomic(pproc_json, output_path)
+    return pproc_json
 
 
-def safe_silver_json(pdf, json, silver_json_prompt, retries=3):
+def safe_silver_json(pdf, json, silver_json_prompt, retries=PPROC_RETRIES, output_path=None, tags=None):
     """Wrapper com retry logic e logging detalhado para silver_json."""
+    from openai import APIError, RateLimitError
+
     backoff = 10
 
     for attempt in range(retries):
@@ -147,17 +452,17 @@ def safe_silver_json(pdf, json, silver_json_prompt, retries=3):
             print(f"\n{'='*60}")
             print(f"[SILVER_JSON] Tentativa {attempt + 1}/{retries}")
             print(f"{'='*60}")
-            return silver_json(pdf, json, silver_json_prompt)
+            return silver_json(pdf, json, silver_json_prompt, output_path, tags)
 
         except RateLimitError as e:
-            wait = backoff * (2 ** attempt) + random.uniform(0, 3)
+            # a espera acontece no limitador, no início da próxima tentativa
+            wait = model_limiter(PPROC_MODEL).record_rate_limited(e.response.headers)
             print(f"\n⚠️ [SILVER_JSON] RateLimitError na tentativa {attempt + 1}/{retries}")
             print(f"   Detalhes: {e}")
             print(f"   Aguardando {wait:.1f}s antes de tentar novamente...")
-            time.sleep(wait)
 
         except APIError as e:
-            wait = backoff * (2 ** attempt) + random.uniform(0, 3)
+            wait = min(backoff * (2 ** attempt), MAX_BACKOFF) + random.uniform(0, 3)
             print(f"\n⚠️ [SILVER_JSON] APIError na tentativa {attempt + 1}/{retries}")
             print(f"   Tipo: {type(e).__name__}")
             print(f"   Código: {getattr(e, 'status_code', 'N/A')}")
@@ -177,60 +482,93 @@ def safe_silver_json(pdf, json, silver_json_prompt, retries=3):
     raise RuntimeError(f"❌ [SILVER_JSON] Falhou após {retries} tentativas")
 
 
-def silver_json(pdf, json, silver_json_prompt):
+def silver_json(pdf, json, silver_json_prompt, output_path=None, tags=None):
+    """
+    JSON final (silver) a partir do PDF e do JSON do pproc.
+
+    :param json: caminho do JSON do pproc (renomeado para .tmp ao final) ou o próprio objeto, já em memória
+    :param output_path: arquivo onde a resposta é gravada enquanto chega
+    :param tags: document/pages da chamada, para as métricas de tokens e custo
+    """
+    in_memory = not isinstance(json, (str, os.PathLike))
     print(f"\n[SILVER_JSON] Iniciando processamento")
     print(f"[SILVER_JSON] PDF: {os.path.basename(pdf)}")
-    print(f"[SILVER_JSON] JSON: {os.path.basename(json)}")
+    print(f"[SILVER_JSON] JSON: {'em memória' if in_memory else os.path.basename(json)}")
 
     try:
-        # Lê o JSON como string
-        print(f"[SILVER_JSON] Lendo arquivo JSON...")
-        with open(json, "r", encoding="utf-8") as json_f:
-            json_string = json_f.read()
+        if in_memory:
+            json_string = compact_json(json)
+        else:
+            # Lê o JSON como string
+            print(f"[SILVER_JSON] Lendo arquivo JSON...")
+            with open(json, "r", encoding="utf-8") as json_f:
+                json_string = json_f.read()
 
         json_size_kb = len(json_string) / 1024
         print(f"[SILVER_JSON] Tamanho do JSON: {len(json_string)} caracteres ({json_size_kb:.2f} KB)")
 
         # Envia o PDF
-        print(f"[SILVER_JSON] Enviando PDF para OpenAI...")
+        print(f"[SILVER_JSON] Enviando PDF para OpenAI (ou reaproveitando envio anterior)...")
         pdf_size_mb = os.path.getsize(pdf) / (1024 * 1024)
         print(f"[SILVER_JSON] Tamanho do PDF: {pdf_size_mb:.2f} MB")
 
-        with open(pdf, "rb") as pdf_f:
-            pdf_file = client.files.create(file=pdf_f, purpose="user_data")
+        pdf_file_id = upload_pdf(pdf)
 
-        print(f"[SILVER_JSON] PDF enviado com sucesso. File ID: {pdf_file.id}")
+        print(f"[SILVER_JSON] PDF disponível. File ID: {pdf_file_id}")
 
         # Cria a resposta
         print(f"[SILVER_JSON] Chamando API com modelo: {PPROC_MODEL}")
         print(f"[SILVER_JSON] Tamanho do prompt: {len(silver_json_prompt)} caracteres")
 
-        response = client.responses.create(
-            model=PPROC_MODEL,
-            input=[
-                {"role": "system", "content": silver_json_prompt},
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "input_file", "file_id": pdf_file.id},
-                        {"type": "input_text", "text": json_string}
-                    ],
-                },
-            ],
-        )
+        input_items = [
+            {"role": "system", "content": silver_json_prompt},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "input_file", "file_id": pdf_file_id},
+                    {"type": "input_text", "text": json_string}
+                ],
+            },
+        ]
+        estimated_tokens = count_tokens(PPROC_MODEL, silver_json_prompt) + count_tokens(PPROC_MODEL, json_string)
+
+        if structured_enabled():
+            output = structured_response("silver", input_items, "silver_document", estimated_tokens,
+                                         output_path=output_path, tags=tags)
+        else:
+            limiter = model_limiter(PPROC_MODEL)
+            limiter.wait(estimated_tokens)
+
+            start = time.monotonic()
+            try:
+                with span("responses.create", "api", stage="silver"):
+                    raw = openai_client().responses.with_raw_response.create(
+                        model=PPROC_MODEL,
+                        input=input_items,
+                    )
+                    response = raw.parse()
+            except Exception as e:
+                api_metrics().record("silver", PPROC_MODEL, None, time.monotonic() - start, error=e, **(tags or {}))
+                raise
+            api_metrics().record("silver", PPROC_MODEL, response.usage, time.monotonic() - start, **(tags or {}))
+
+            limiter.update_from_headers(raw.headers)
+            output = load_safe_json(response.output_text.replace("```json", "").replace("```", ""))
+            if output_path is not None:
+                write_json_atomic(output, output_path)
 
         print(f"[SILVER_JSON] Resposta recebida com sucesso")
 
-        # Renomeia o arquivo JSON para .tmp em vez de excluir
-        print(f"[SILVER_JSON] Renomeando arquivo JSON para .tmp...")
-        base, ext = os.path.splitext(json)
-        novo_nome = base + ".tmp"
-        os.rename(json, novo_nome)
-        print(f"[SILVER_JSON] Arquivo renomeado: {os.path.basename(novo_nome)}")
+        if not in_memory:
+            # Renomeia o arquivo JSON para .tmp em vez de excluir
+            print(f"[SILVER_JSON] Renomeando arquivo JSON para .tmp...")
+            base, ext = os.path.splitext(json)
+            novo_nome = base + ".tmp"
+            os.rename(json, novo_nome)
+            print(f"[SILVER_JSON] Arquivo renomeado: {os.path.basename(novo_nome)}")
 
         # Retorna o output do modelo
-        output = response.output_text.replace("```json", "").replace("```", "")
-        print(f"[SILVER_JSON] Tamanho da resposta: {len(output)} caracteres")
+        print(f"[SILVER_JSON] Seções na resposta: {len(output) if isinstance(output, dict) else 'N/A'}")
         print(f"[SILVER_JSON] Processamento concluído com sucesso\n")
 
         return output
@@ -245,62 +583,439 @@ def silver_json(pdf, json, silver_json_prompt):
 
 
 
-def analyze_doc_image(img, text, model=ANALYSIS_MODEL):
-    img_uri = get_img_uri(img)
-    return analyze_image(img_uri, text, model)
+def _cached_analysis(img, text, model, cache):
+    """Devolve (bytes da imagem, chave do cache, resultado em cache ou None)."""
+    img_bytes = get_img_bytes(img)
+    if cache is None:
+        return img_bytes, None, None
+    key = cache_key(img_bytes, text, analysis_prompt, model, ANALYSIS_PARAMS)
+    return img_bytes, key, cache.get(key)
 
 
-def analyze_image(data_uri, text, model=ANALYSIS_MODEL):
-    """Analisa imagem + texto (sem retries automáticos)."""
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": analysis_prompt},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "image_url", "image_url": {"url": data_uri}},
-                    {"type": "text", "text": text},
-                ],
-            },
-        ],
-        max_tokens=1000,
-        temperature=0,
-        top_p=0.1,
-    )
+def submit_doc_image(engine, img, text, model=ANALYSIS_MODEL, cache=None, stats=None, tags=None):
+    """
+    Agenda a análise de uma página no motor assíncrono.
+
+    Devolve um `concurrent.futures.Future`, já resolvido quando a página está no cache.
+    `tags` (document, pages) identificam a chamada nas métricas da API.
+    """
+    img_bytes, key, cached = _cached_analysis(img, text, model, cache)
+    if cached is not None:
+        future = concurrent.futures.Future()
+        future.set_result(cached)
+        return future
+
+    cost = estimate_total_tokens(model, [text], [img_bytes]) + ANALYSIS_PARAMS["max_tokens"]
+    future = engine.submit(analyze_image_async, engine.client, get_img_uri(img_bytes), text, model,
+                           limiter=engine.limiter, estimated_tokens=cost, stats=stats, tags=tags, cost=cost)
+
+    if cache is not None:
+        def _store(done):
+            if not done.cancelled() and done.exception() is None:
+                cache.put(key, done.result())
+        future.add_done_callback(_store)
+    return future
+
+
+def analysis_messages(data_uri, text):
+    return [
+        {"role": "system", "content": analysis_prompt},
+        {
+            "role": "user",
+            "content": [
+                {"type": "image_url", "image_url": {"url": data_uri}},
+                {"type": "text", "text": text},
+            ],
+        },
+    ]
+
+
+async def _chat_with_retries(aclient, model, messages, params, limiter=None, estimated_tokens=0, stage="vision",
+                            tags=None):
+    """
+    Chamada de chat com os retries da análise de páginas.
+
+    Lê os cabeçalhos x-ratelimit-* de cada resposta para o `limiter`; um 429
+    pausa todas as chamadas pelo tempo indicado pela API e a requisição é
+    reenviada depois, cobrando novamente o orçamento. Tokens, latência e retries
+    vão para api_metrics() sob `stage`, com as `tags` (document, pages).
+    """
+    from openai import APIError, RateLimitError
+
+    tags = tags or {}
+    for attempt in range(ANALYSIS_RETRIES):
+        start = time.monotonic()
+        try:
+            with span("chat.completions", "api", model=model, attempt=attempt):
+                raw = await aclient.chat.completions.with_raw_response.create(model=model, messages=messages, **params)
+        except RateLimitError as e:
+            if limiter is None or attempt == ANALYSIS_RETRIES - 1:
+                api_metrics().record(stage, model, None, time.monotonic() - start, attempt, error=e, **tags)
+                raise
+            limiter.record_rate_limited(e.response.headers)
+            await limiter.wait_async(estimated_tokens)
+            continue
+        except APIError as e:
+            if attempt == ANALYSIS_RETRIES - 1:
+                api_metrics().record(stage, model, None, time.monotonic() - start, attempt, error=e, **tags)
+                raise
+            wait = 2 ** attempt + random.uniform(0, 1)
+            print(f"⚠️ Erro na análise de página: {e}. Retentando em {wait:.1f}s...")
+            await asyncio.sleep(wait)
+            continue
+
+        response = raw.parse()
+        api_metrics().record(stage, model, response.usage, time.monotonic() - start, attempt, **tags)
+        if limiter is not None:
+            limiter.update_from_headers(raw.headers)
+            if response.usage is not None:
+                # o limite de TPM conta max_tokens, não os tokens efetivamente gerados
+                limiter.record_usage(estimated_tokens, response.usage.prompt_tokens + params["max_tokens"])
+        return response
+
+
+async def analyze_image_async(aclient, data_uri, text, model=ANALYSIS_MODEL, limiter=None, estimated_tokens=0,
+                              stats=None, tags=None):
+    """Análise de uma página (imagem + texto), executada pelo AnalysisEngine."""
+    start = time.perf_counter()
+    response = await _chat_with_retries(aclient, model, analysis_messages(data_uri, text), ANALYSIS_PARAMS,
+                                        limiter, estimated_tokens, "vision", tags)
+    if stats is not None:
+        stats.record("vision", 1, time.perf_counter() - start, response.usage)
     return response.choices[0].message.content
 
 
+# -------------------------------------------------------------------
+# Lotes: várias páginas por chamada, separadas por <<<PAGE n>>>
+# -------------------------------------------------------------------
+PAGE_DELIMITER = re.compile(r"^\s*<<<PAGE (\d+)>>>\s*$", re.MULTILINE)
+
+
+def split_page_batch(output, indices):
+    """Separa a resposta de um lote pelos delimitadores; None se as páginas não baterem."""
+    parts = PAGE_DELIMITER.split(output)
+    found = {int(number) - 1: content.strip() for number, content in zip(parts[1::2], parts[2::2])}
+    if sorted(found) != sorted(indices):
+        return None
+    return [found[idx] for idx in indices]
+
+
+def batch_params(num_pages):
+    return {**ANALYSIS_PARAMS, "max_tokens": ANALYSIS_PARAMS["max_tokens"] * num_pages}
+
+
+def _submit_batch(keys, cache, submit_missing):
+    """
+    Consulta o cache página a página e agenda só as que faltam com `submit_missing(índices)`.
+
+    Devolve um `concurrent.futures.Future` com a lista de descrições na ordem de `keys`.
+    """
+    results = [cache.get(key) if cache is not None else None for key in keys]
+    missing = [i for i, content in enumerate(results) if content is None]
+
+    future = concurrent.futures.Future()
+    if not missing:
+        future.set_result(results)
+        return future
+
+    def _merge(done):
+        error = done.exception()
+        if error is not None:
+            future.set_exception(error)
+            return
+        for i, content in zip(missing, done.result()):
+            results[i] = content
+            if cache is not None:
+                cache.put(keys[i], content)
+        future.set_result(results)
+
+    submit_missing(missing).add_done_callback(_merge)
+    return future
+
+
+# -------------------------------------------------------------------
+# Rota de texto: páginas sem figuras, várias por chamada e sem imagem
+# -------------------------------------------------------------------
+def text_analysis_messages(pages):
+    """`pages`: lista de (índice, texto com marcadores de imagem)."""
+    body = "\n\n".join(f"<<<PAGE {idx + 1}>>>\n{text}" for idx, text in pages)
+    return [
+        {"role": "system", "content": text_analysis_prompt},
+        {"role": "user", "content": body},
+    ]
+
+
+def estimate_text_tokens(model, pages):
+    total = count_tokens(model, text_analysis_prompt)
+    total += sum(count_tokens(model, text) + 10 for _, text in pages)
+    return int(total * 1.2) + batch_params(len(pages))["max_tokens"]
+
+
+async def analyze_text_async(aclient, pages, model=TEXT_ANALYSIS_MODEL, limiter=None, estimated_tokens=0, stats=None,
+                             tags=None):
+    """
+    Analisa um lote de páginas só de texto em uma chamada e devolve as descrições na ordem de `pages`.
+
+    Se a resposta não trouxer exatamente as páginas pedidas, cada página é reenviada sozinha.
+    """
+    start = time.perf_counter()
+    response = await _chat_with_retries(aclient, model, text_analysis_messages(pages), batch_params(len(pages)),
+                                        limiter, estimated_tokens, "text",
+                                        {**(tags or {}), "pages": [idx + 1 for idx, _ in pages]})
+    if stats is not None:
+        stats.record("text", len(pages), time.perf_counter() - start, response.usage)
+
+    output = response.choices[0].message.content or ""
+    contents = split_page_batch(output, [idx for idx, _ in pages])
+    if contents is not None:
+        return contents
+    if len(pages) == 1:
+        # uma página só: a resposta inteira é a descrição, mesmo sem delimitador
+        return [PAGE_DELIMITER.sub("", output).strip()]
+
+    print(f"⚠️ Lote de texto com páginas divergentes ({[idx for idx, _ in pages]}); reenviando página a página")
+    contents = []
+    for page in pages:
+        cost = estimate_text_tokens(model, [page])
+        if limiter is not None:
+            await limiter.wait_async(cost)
+        contents += await analyze_text_async(aclient, [page], model, limiter, cost, stats, tags)
+    return contents
+
+
+def submit_text_pages(engine, pages, model=TEXT_ANALYSIS_MODEL, cache=None, stats=None, tags=None):
+    """
+    Agenda a análise de um lote de páginas de texto no motor assíncrono.
+
+    Páginas em cache não entram na chamada. Devolve um `concurrent.futures.Future`
+    com a lista de descrições na ordem de `pages`.
+    """
+    keys = [cache_key(b"", text, text_analysis_prompt, model, ANALYSIS_PARAMS) for _, text in pages]
+
+    def _submit(missing):
+        batch = [pages[i] for i in missing]
+        cost = estimate_text_tokens(model, batch)
+        return engine.submit(analyze_text_async, engine.client, batch, model,
+                             limiter=model_limiter(model), estimated_tokens=cost, stats=stats, tags=tags,
+                             cost=cost, budget=model_limiter(model))
+
+    return _submit_batch(keys, cache, _submit)
+
+
+# -------------------------------------------------------------------
+# Lotes de visão: K páginas (imagem + texto) por chamada
+# -------------------------------------------------------------------
+def plan_vision_batches(pages, texts, model=ANALYSIS_MODEL, max_pages=None, max_tokens=None):
+    """
+    Agrupa as páginas, na ordem, em lotes de até `max_pages` páginas cujo custo
+    estimado (imagem + texto) cabe em `max_tokens`: páginas curtas vão em lotes
+    maiores, páginas longas sozinhas.
+
+    `pages`: iterável de tuplas (índice, ..., imagem codificada por get_img_bytes); o custo
+    da imagem vem do tamanho codificado. Devolve listas dessas mesmas tuplas.
+    """
+    max_pages = VISION_BATCH_PAGES if max_pages is None else max_pages
+    max_tokens = VISION_BATCH_TOKENS if max_tokens is None else max_tokens
+
+    batch, batch_tokens = [], 0
+    for page in pages:
+        tokens = image_tokens(page[-1]) + count_tokens(model, texts[page[0]])
+        if batch and (len(batch) >= max_pages or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(page)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def batch_analysis_messages(pages):
+    """`pages`: lista de (índice, data URI da imagem, texto da página)."""
+    content = []
+    for idx, data_uri, text in pages:
+        content += [
+            {"type": "text", "text": f"<<<PAGE {idx + 1}>>>"},
+            {"type": "image_url", "image_url": {"url": data_uri}},
+            {"type": "text", "text": text},
+        ]
+    return [
+        {"role": "system", "content": batch_analysis_prompt},
+        {"role": "user", "content": content},
+    ]
+
+
+async def analyze_images_async(aclient, pages, model=ANALYSIS_MODEL, limiter=None, estimated_tokens=0, stats=None,
+                               tags=None):
+    """
+    Analisa um lote de páginas (imagem + texto) em uma chamada e devolve as descrições na ordem de `pages`.
+
+    Se a resposta não trouxer exatamente as páginas pedidas, cada página é reenviada
+    sozinha pelo caminho de uma página por chamada.
+    """
+    start = time.perf_counter()
+    response = await _chat_with_retries(aclient, model, batch_analysis_messages(pages), batch_params(len(pages)),
+                                        limiter, estimated_tokens, "vision",
+                                        {**(tags or {}), "pages": [idx + 1 for idx, _, _ in pages]})
+    if stats is not None:
+        stats.record("vision", len(pages), time.perf_counter() - start, response.usage)
+
+    output = response.choices[0].message.content or ""
+    contents = split_page_batch(output, [idx for idx, _, _ in pages])
+    if contents is not None:
+        return contents
+    if len(pages) == 1:
+        return [PAGE_DELIMITER.sub("", output).strip()]
+
+    print(f"⚠️ Lote de visão com páginas divergentes ({[idx for idx, _, _ in pages]}); reenviando página a página")
+    contents = []
+    for idx, data_uri, text in pages:
+        img_bytes = base64.b64decode(data_uri.partition(",")[2])
+        cost = estimate_total_tokens(model, [text], [img_bytes]) + ANALYSIS_PARAMS["max_tokens"]
+        if limiter is not None:
+            await limiter.wait_async(cost)
+        contents.append(await analyze_image_async(aclient, data_uri, text, model, limiter, cost, stats,
+                                                  {**(tags or {}), "pages": [idx + 1]}))
+    return contents
+
+
+def submit_doc_images(engine, pages, model=ANALYSIS_MODEL, cache=None, stats=None, tags=None):
+    """
+    Agenda a análise de um lote de páginas renderizadas em uma única chamada de visão.
+
+    `pages`: lista de (índice, imagem já codificada por get_img_bytes, texto), como sai de
+    plan_vision_batches. Páginas em cache não entram na chamada.
+    Devolve um `concurrent.futures.Future` com a lista de descrições na ordem de `pages`.
+    """
+    images = [img_bytes for _, img_bytes, _ in pages]
+    keys = [
+        cache_key(img_bytes, text, batch_analysis_prompt, model, ANALYSIS_PARAMS)
+        for img_bytes, (_, _, text) in zip(images, pages)
+    ]
+
+    def _submit(missing):
+        batch = [(pages[i][0], get_img_uri(images[i]), pages[i][2]) for i in missing]
+        cost = estimate_total_tokens(model, [text for _, _, text in batch], [images[i] for i in missing]) \
+            + batch_params(len(batch))["max_tokens"]
+        return engine.submit(analyze_images_async, engine.client, batch, model,
+                             limiter=engine.limiter, estimated_tokens=cost, stats=stats, tags=tags, cost=cost)
+
+    return _submit_batch(keys, cache, _submit)
+
+
+def resume_from_checkpoint(journal, input_hashes, total_pages):
+    """Devolve (resultados já concluídos no journal, índices das páginas pendentes)."""
+    results = [None] * total_pages
+    pending = []
+    for idx in range(total_pages):
+        done = journal.completed(idx, input_hashes[idx]) if journal is not None else None
+        if done is not None:
+            results[idx] = done
+        else:
+            pending.append(idx)
+
+    if len(pending) < total_pages:
+        print(f"Checkpoint: {total_pages - len(pending)} páginas já concluídas, {len(pending)} restantes")
+    failed = journal.failed_pages() if journal is not None else []
+    if failed:
+        print(f"Checkpoint: {len(failed)} páginas com erro na execução anterior serão refeitas: {failed}")
+    return results, pending
+
+
+def read_artifact(path):
+    """JSON de um artefato intermediário, no nome original ou já renomeado para .tmp (consumido)."""
+    for candidate in (path, os.path.splitext(path)[0] + ".tmp"):
+        if os.path.exists(candidate):
+            with open(candidate, "r", encoding="utf-8") as f:
+                return json.load(f)
+    return None
+
+
+def load_raw_entries(raw_dir, filename):
+    """Raw da última execução, por arquivo: raw_<nome>.jsonl ou, de execuções antigas, raw_<nome>.json."""
+    entries = {}
+    jsonl_path = Path(raw_dir) / f"raw_{filename}.jsonl"
+    legacy_path = Path(raw_dir) / f"raw_{filename}.json"
+    if jsonl_path.exists():
+        with open(jsonl_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry["filename"]] = entry
+    elif legacy_path.exists():
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            for entry in json.load(f):
+                entries[entry["filename"]] = entry
+    return entries
+
+
 def contar_tags_imagem(caminho_arquivo):
     with open(caminho_arquivo, 'r', encoding='utf-8') as f:
         dados = json.load(f)
-
-    def contar_recursivamente(obj):
-        contador = 0
-        if isinstance(obj, dict):
-            for chave, valor in obj.items():
-                if chave in ['image', 'images']:
-                    contador += 1
-                contador += contar_recursivamente(valor)
-        elif isinstance(obj, list):
-            for item in obj:
-                contador += contar_recursivamente(item)
-        return contador
-
-    return contar_recursivamente(dados)
+    return count_image_tags(dados)
 
 
 # -------------------------------------------------------------------
 # Main pipeline
 # -------------------------------------------------------------------
-def pipeline(base_path, filename, general_information, selected_file=None, chunk_size=10):
+def pipeline(base_path, filename, general_information, selected_file=None, max_pages_in_memory=MAX_PAGES_IN_MEMORY,
+             use_cache=True, concurrency=ANALYSIS_CONCURRENCY, route_text_pages=None,
+             vision_batch_pages=VISION_BATCH_PAGES, start_stage=None):
+    """
+    Executa render → analyze → raw → pproc → silver para os PDFs da seção.
+
+    Os estágios rodam encadeados (scheduler.StageGraph): com vários PDFs, o
+    pproc/silver de um documento acontece enquanto as páginas do seguinte são
+    analisadas. Ao final é impressa a utilização de cada estágio.
+
+    Com `route_text_pages` (padrão: variável TEXT_PAGE_ROUTING) as páginas só
+    de texto não são renderizadas: vão em lotes para TEXT_ANALYSIS_MODEL.
+    Com `vision_batch_pages` > 1 as demais vão em lotes de até esse número de
+    páginas por chamada de visão (cada item da fila do analyze passa a ser um lote).
+    Com PPROC_WINDOW_PAGES > 0, seções maiores que a janela passam pelo pproc e
+    pelo silver em janelas de páginas paralelas, e os JSONs são juntados no final.
+
+    Cada documento tem um manifesto (results/manifest) com a fingerprint dos
+    insumos de cada estágio: estágios cuja fingerprint não mudou reaproveitam o
+    artefato da execução anterior. Com `start_stage` ("pproc" ou "silver") a
+    execução começa nesse estágio, refeito à força, a partir dos artefatos
+    em results/raw ou results/silver.
+    """
+    import fitz  # PyMuPDF
+    from openai import AsyncOpenAI
+    from tqdm import tqdm
+
+    from language_filter import LanguageAudit, filter_mode, non_english_pages, write_filtered_pdf
+    from page_classifier import TEXT, RouteStats, classify_document, routing_enabled
+    from page_index import PageIndex, page_diff_enabled, page_fingerprints
+    from page_screen import BLANK, DUPLICATE, PageScreen, link, screening_enabled
+    from render_pdf import iter_pages, render_settings
+    from windowed import merge_tree, plan_windows, run_windows, window_json, window_settings, write_windows
 
     start_time = time.time()
+    # spans do caminho quente (PIPELINE_TRACE=1): trace em results/traces ao final
+    tracing.enable(tracing_enabled())
 
     path_parcionados = Path(base_path) / "PDFs parcionados"
 
     raw_dir = Path(base_path) / "results" / "raw"
     silver_dir = Path(base_path) / "results" / "silver"
+    checkpoint_dir = Path(base_path) / "results" / "checkpoints"
+    filtered_dir = Path(base_path) / "results" / "filtered"
+    windows_dir = Path(base_path) / "results" / "windows"
+    manifest_dir = Path(base_path) / "results" / "manifest"
+    pages_dir = Path(base_path) / "results" / "pages"
+
+    if start_stage is not None and start_stage not in START_STAGES:
+        raise ValueError(f"start_stage inválido: {start_stage} (use {', '.join(START_STAGES)})")
+    forced = forced_stages(start_stage)
+
+    # o lote em renderização, um na fila e um no worker do analyze; com lotes de visão
+    # cada item tem até vision_batch_pages páginas, então o teto é contado em lotes
+    batch_pages = max(vision_batch_pages, 1)
+    max_items_in_memory = max_pages_in_memory // batch_pages
+    if max_items_in_memory < 3:
+        raise ValueError(f"max_pages_in_memory inválido: {max_pages_in_memory} "
+                         f"(mínimo {3 * batch_pages} com {batch_pages} páginas por lote)")
 
     if not os.path.isdir(path_parcionados):
         raise FileNotFoundError(f"Pasta não encontrada: {path_parcionados}")
@@ -316,65 +1031,559 @@ def pipeline(base_path, filename, general_information, selected_file=None, chunk
         print("Nenhum arquivo selecionado — processando todos os PDFs da pasta.")
 
     now = datetime.now().strftime(r"%Y%m%dT%H%M%S")
-    docs = []
-
-    for f in files:
-        pdf_path = os.path.join(path_parcionados, f)
-        doc = {"filename": f}
-        
-
-        imgs = convert_doc_to_images(pdf_path)
-        text = extract_text_by_page(pdf_path)
-        pages_description = []
-
-        print(f"Processando páginas do documento: {f}")
+    metrics_dir = Path(base_path) / "results" / "metrics"
+    # tokens, custo e latência de cada chamada: uma linha por chamada, resumo ao final
+    api_metrics().open(metrics_dir / f"calls_{filename}_{now}.jsonl")
+    # artefatos intermediários vão para o disco em segundo plano; os estágios usam a cópia em memória
+    artifacts = ArtifactWriter()
+    raw_path = raw_dir / f"raw_{filename}.jsonl"
+    # lido antes de qualquer gravação: a execução a partir do pproc/silver usa o raw anterior
+    raw_entries = load_raw_entries(raw_dir, filename) if start_stage is not None else {}
+    route_text_pages = routing_enabled(route_text_pages)
+    route_stats = RouteStats()
+    vision_prompt = batch_analysis_prompt if vision_batch_pages > 1 else analysis_prompt
+    # a renderização (RENDER_BACKEND/DPI/COLORSPACE) e a codificação da imagem (IMAGE_PRESET)
+    # também são insumos da página no checkpoint e no manifesto do analyze
+    vision_params = {**ANALYSIS_PARAMS, "image": preset_config(), "render": render_settings()}
+    language_mode = filter_mode()
+    language_audit = LanguageAudit(Path(base_path) / "results" / "logs" / "language_filter.jsonl")
+    # índice de páginas em branco/duplicadas compartilhado por todos os documentos da execução
+    screen = PageScreen() if screening_enabled() else None
+    # pproc/silver por janelas de páginas (PPROC_WINDOW_PAGES; 0 = seção inteira)
+    window_pages, window_concurrency = window_settings()
+    # índice de páginas por seção para reaproveitar a análise entre revisões (PAGE_DIFF)
+    page_diff = page_diff_enabled()
+
+    cache = None
+    if use_cache:
+        cache_path = os.getenv("ANALYSIS_CACHE_PATH") or Path(base_path) / "results" / "cache" / "analysis.sqlite"
+        cache = AnalysisCache(cache_path)
+
+    removed = file_registry().cleanup()
+    if removed:
+        print(f"Arquivos remotos expirados removidos: {removed}")
+
+    # Retries de 429 ficam com o limitador, não com o SDK, para que ele enxergue todos os sinais
+    engine = AnalysisEngine(
+        concurrency,
+        client=AsyncOpenAI(api_key=openai_api_key(), max_retries=0),
+        limiter=model_limiter(ANALYSIS_MODEL, max_concurrency=concurrency),
+    )
 
-        for chunk in split_list(list(enumerate(imgs)), chunk_size):
-            with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-                futures = [executor.submit(analyze_doc_image, img, text[idx], ANALYSIS_MODEL) for idx, img in chunk]
+    def output_name(f):
+        # com vários PDFs cada um ganha seus próprios arquivos silver
+        return filename if len(files) == 1 else f"{filename}_{Path(f).stem}"
+
+    total_pages = 0
+    if start_stage is None:
+        for f in files:
+            with fitz.open(os.path.join(path_parcionados, f)) as pdf:
+                total_pages += pdf.page_count
+    pbar = tqdm(total=total_pages)
+
+    # fingerprint comum a todas as páginas; o hash do PDF entra por documento
+    analysis_settings = fingerprint(
+        ANALYSIS_MODEL, vision_prompt, vision_params, TEXT_ANALYSIS_MODEL, text_analysis_prompt, ANALYSIS_PARAMS,
+        route_text_pages, language_mode, screen is not None,
+    )
 
-                with tqdm(total=len(chunk)) as pbar:
-                    for _ in concurrent.futures.as_completed(futures):
-                        pbar.update(1)
+    # ---------------------------------------------------------------
+    # Estágios
+    # ---------------------------------------------------------------
+    def reuse_analysis(doc):
+        """Reaproveita a análise se a fingerprint não mudou e o journal tem todas as páginas."""
+        entry = doc["manifest"].fresh("analyze", doc["analyze_fp"])
+        if entry is None or "analyze" in forced or not os.path.exists(entry["meta"]["pproc_pdf"]):
+            return False
+        meta = entry["meta"]
+        journal = PageJournal(checkpoint_dir / f"{Path(doc['filename']).stem}.jsonl")
+        results = [journal.completed(idx, input_hash) for idx, input_hash in enumerate(meta["input_hashes"])]
+        journal.close()
+        dropped = set(meta["dropped"])
+        if any(content is None for idx, content in enumerate(results) if idx not in dropped):
+            return False
+
+        doc.update(pages_description=results, dropped=dropped, pproc_pdf=meta["pproc_pdf"])
+        api_metrics().set_pages(doc["filename"], len(results))
+        pbar.update(len(results))
+        print(f"{doc['filename']}: análise sem mudanças desde a última execução — render/analyze pulados")
+        return True
+
+    def record_analysis(doc):
+        if doc.get("page_index") is not None:
+            doc["page_index"].save(doc["page_fps"], doc["pages_description"], analysis_settings)
+        doc["manifest"].record(
+            "analyze", doc["analyze_fp"], content_hash(doc["pages_description"]),
+            artifact=doc["journal"].path, input_hashes=doc["input_hashes"], dropped=sorted(doc["dropped"]),
+            pproc_pdf=doc["pproc_pdf"],
+        )
 
-                for future in futures:
-                    pages_description.append(future.result())
+    def render_stage(doc, emit):
+        f = doc["filename"]
+        pdf_path = doc["pdf_path"]
 
-        doc["pages_description"] = pages_description
-        docs.append(doc)
+        pdf_hash = file_sha256(pdf_path)
+        doc["manifest"] = StageManifest(manifest_dir / f"{Path(f).stem}.json")
+        doc["analyze_fp"] = fingerprint(pdf_hash, analysis_settings)
+        if reuse_analysis(doc):
+            emit(doc, to="raw")
+            return
 
-        # Save raw results
-        os.makedirs(raw_dir, exist_ok=True)
-        raw_path = os.path.join(raw_dir, f"raw_{filename}.json")
-        with open(raw_path, "w", encoding="utf-8") as file:
-            json.dump(docs, file, ensure_ascii=False, indent=2)
+        text = extract_text_by_page(pdf_path)
+        api_metrics().set_pages(f, len(text))
 
-        print(f"{os.path.basename(raw_path)} salvo com sucesso em {os.path.normpath(raw_path)}")
+        print(f"Processando páginas do documento: {f}")
 
-        with open(raw_path, "r", encoding="utf8") as file:
-            json_parcial = file.read()
+        # páginas fora do inglês: os prompts mandam ignorá-las, então nem chegam à API
+        non_english = non_english_pages(text) if language_mode != "off" else {}
+        dropped = set(non_english) if language_mode == "drop" else set()
+        for idx, (lang, confidence, words) in sorted(non_english.items()):
+            language_audit.record(f, idx, lang, confidence, words, action=language_mode)
+
+        if dropped and len(dropped) == len(text):
+            print(f"⚠️ {f}: nenhuma página em inglês; documento ignorado")
+            pbar.update(len(text))
+            return
+        doc["pproc_pdf"] = pdf_path
+        if dropped:
+            # o pproc/silver recebem um PDF só com as páginas mantidas
+            keep = [idx for idx in range(len(text)) if idx not in dropped]
+            doc["pproc_pdf"] = write_filtered_pdf(pdf_path, keep, filtered_dir / f)
+
+        # páginas de texto: (índice, texto com marcadores de imagem)
+        text_pages = {}
+        if route_text_pages:
+            for idx, info in enumerate(classify_document(pdf_path)):
+                route_stats.count_kind(info["kind"])
+                if info["kind"] == TEXT:
+                    text_pages[idx] = info["text"]
+        if language_mode == "text":
+            for idx in non_english:
+                text_pages.setdefault(idx, text[idx])
+
+        input_hashes = [
+            page_input_hash(pdf_hash, idx, text_pages[idx], text_analysis_prompt, TEXT_ANALYSIS_MODEL, ANALYSIS_PARAMS)
+            if idx in text_pages else
+            page_input_hash(pdf_hash, idx, page_text, vision_prompt, ANALYSIS_MODEL, vision_params)
+            for idx, page_text in enumerate(text)
+        ]
+        journal = PageJournal(checkpoint_dir / f"{Path(f).stem}.jsonl")
+        results, pending = resume_from_checkpoint(journal, input_hashes, len(text))
+        pending = [idx for idx in pending if idx not in dropped]
+
+        # revisão nova do manual: só as páginas alteradas ou inseridas voltam para a API
+        page_index = page_fps = None
+        if page_diff:
+            page_index = PageIndex(pages_dir / f"{Path(f).stem}.json")
+            page_fps = page_fingerprints(pdf_path, text)
+            reused, counts = page_index.reuse(page_fps, pending, analysis_settings)
+            if counts is not None and pending:
+                print(f"{f}: revisão anterior encontrada — {counts['changed']} páginas alteradas, "
+                      f"{counts['inserted']} inseridas, {counts['deleted']} removidas; "
+                      f"{len(reused)} descrições reaproveitadas")
+            for idx, content in reused.items():
+                results[idx] = content
+                journal.record(idx, input_hashes[idx], content=content)
+            pending = [idx for idx in pending if idx not in reused]
+        pbar.update(len(text) - len(pending))
+
+        doc.update(text=text, input_hashes=input_hashes, journal=journal, pages_description=results,
+                   dropped=dropped, remaining=len(pending), failed=[], lock=threading.Lock(),
+                   page_index=page_index, page_fps=page_fps)
+
+        if not pending:
+            journal.close()
+            record_analysis(doc)
+            emit(doc, to="raw")
+            return
+
+        # lotes de texto primeiro: não dependem da renderização
+        pending_text = [idx for idx in pending if idx in text_pages]
+        for batch in split_list(pending_text, max(TEXT_BATCH_PAGES, 1)):
+            emit({"doc": doc, "pages": [(idx, text_pages[idx]) for idx in batch]})
+
+        pending_vision = [idx for idx in pending if idx not in text_pages]
+        pages = iter_pages(pdf_path, pages=pending_vision)
+        if vision_batch_pages <= 1:
+            for idx, img in pages:
+                emit({"doc": doc, "idx": idx, "img": img})
+            return
+
+        # cada página é codificada aqui: o tamanho da imagem codificada define o custo do lote
+        encoded = ((idx, img, get_img_bytes(img)) for idx, img in pages)
+        for batch in plan_vision_batches(encoded, text, ANALYSIS_MODEL, max_pages=vision_batch_pages):
+            emit({"doc": doc, "images": batch})
+
+    def submit_text(doc, pages):
+        """Futures por página de um lote de texto; páginas sem texto nem imagem não vão para a API."""
+        futures = {}
+        for idx, page_text in pages:
+            if not page_text.strip():
+                futures[idx] = concurrent.futures.Future()
+                futures[idx].set_result("")
+                if screen is not None:
+                    screen.record_blank()
+        pending = [(idx, page_text) for idx, page_text in pages if idx not in futures]
+        if pending:
+            batch = submit_text_pages(engine, pending, TEXT_ANALYSIS_MODEL, cache, route_stats,
+                                      {"document": doc["filename"]})
+            for position, (idx, _) in enumerate(pending):
+                futures[idx] = concurrent.futures.Future()
+                batch.add_done_callback(functools.partial(_pick, futures[idx], position))
+        return futures
+
+    def _pick(page_future, position, batch):
+        error = batch.exception()
+        if error is not None:
+            page_future.set_exception(error)
+        else:
+            page_future.set_result(batch.result()[position])
+
+    def submit_vision(doc, images):
+        """
+        Futures por página renderizada. Com a triagem, páginas em branco não vão para
+        a API e duplicatas esperam a descrição da página original.
+        """
+        futures, new_pages, placeholders = {}, [], {}
+        for idx, img, img_bytes in images:
+            status, shared = screen.screen(img, doc["text"][idx]) if screen is not None else (None, None)
+            if status == BLANK:
+                futures[idx] = concurrent.futures.Future()
+                futures[idx].set_result("")
+            elif status == DUPLICATE:
+                futures[idx] = shared
+            else:
+                # nos lotes a imagem já chega codificada (ver render_stage)
+                new_pages.append((idx, img if img_bytes is None else img_bytes, doc["text"][idx]))
+                placeholders[idx] = shared
 
-        pproc_json = load_safe_json(pproc(pproc_prompt, pdf_path, json_parcial))
+        try:
+            if new_pages and vision_batch_pages > 1:
+                batch = submit_doc_images(engine, new_pages, ANALYSIS_MODEL, cache, route_stats,
+                                          {"document": doc["filename"]})
+                for position, (idx, _, _) in enumerate(new_pages):
+                    futures[idx] = concurrent.futures.Future()
+                    batch.add_done_callback(functools.partial(_pick, futures[idx], position))
+            else:
+                for idx, img, page_text in new_pages:
+                    futures[idx] = submit_doc_image(engine, img, page_text, ANALYSIS_MODEL, cache, route_stats,
+                                                    {"document": doc["filename"], "pages": [idx + 1]})
+        except Exception as e:
+            # duplicatas de outras páginas podem estar esperando por estes placeholders
+            for placeholder in placeholders.values():
+                if placeholder is not None:
+                    placeholder.set_exception(e)
+            raise
 
+        for idx, placeholder in placeholders.items():
+            if placeholder is not None:
+                link(placeholder, futures[idx])
+        return futures
+
+    def analyze_stage(item, emit):
+        doc = item["doc"]
+        if "pages" in item:
+            futures = submit_text(doc, item["pages"])
+        elif "images" in item:
+            futures = submit_vision(doc, item.pop("images"))
+        else:
+            futures = submit_vision(doc, [(item["idx"], item.pop("img"), None)])
+
+        outcomes = []
+        for idx, future in sorted(futures.items()):
+            try:
+                outcomes.append((idx, future.result(), None))
+            except Exception as e:
+                outcomes.append((idx, None, e))
+        for idx, content, error in outcomes:
+            doc["journal"].record(idx, doc["input_hashes"][idx], content=content, error=error)
+        pbar.update(len(outcomes))
+
+        with doc["lock"]:
+            for idx, content, error in outcomes:
+                if error is not None:
+                    doc["failed"].append(idx)
+                else:
+                    doc["pages_description"][idx] = content
+            doc["remaining"] -= len(outcomes)
+            last_page = doc["remaining"] == 0
+
+        if not last_page:
+            return
+        doc["journal"].close()
+        if doc["failed"]:
+            raise RuntimeError(
+                f"{doc['filename']}: {len(doc['failed'])} páginas falharam: {sorted(doc['failed'])}. "
+                f"Reexecute para processar só as páginas restantes."
+            )
+        record_analysis(doc)
+        emit(doc)
+
+    def raw_stage(doc, emit):
+        # páginas fora do inglês e páginas em branco (descrição vazia) não entram no raw;
+        # "pages" é a página de cada descrição no PDF do pproc (sem as páginas descartadas), base 1
+        kept = [idx for idx in range(len(doc["pages_description"])) if idx not in doc["dropped"]]
+        described = [
+            (position, doc["pages_description"][idx]) for position, idx in enumerate(kept, start=1)
+            if doc["pages_description"][idx] != ""
+        ]
+        entry = {
+            "filename": doc["filename"],
+            "pdf": str(doc["pproc_pdf"]),
+            "pages": [position for position, _ in described],
+            "pages_description": [content for _, content in described],
+        }
+
+        # Save raw results: uma linha por documento, anexada sem reescrever os anteriores.
+        # O manifesto só registra o raw depois que a linha foi gravada de fato.
+        raw_fp = fingerprint(doc["manifest"].artifact_hash("analyze"))
+        artifacts.append(raw_path, entry, on_written=functools.partial(
+            doc["manifest"].record, "raw", raw_fp, content_hash(entry), artifact=raw_path))
+        print(f"{doc['filename']}: raw anexado a {os.path.normpath(raw_path)}")
+
+        doc["raw"] = entry
+        emit(doc)
+
+    def stg_silver_path_of(doc):
+        return os.path.join(silver_dir, f"tmp_silver_{output_name(doc['filename'])}.json")
+
+    def pproc_windows(doc, windows):
+        """Um PDF por janela e, se há raw, o JSON parcial com as descrições das páginas que caem nela."""
+        name = output_name(doc["filename"])
+        raw = doc.get("raw")
+        paths = write_windows(doc["pproc_pdf"], windows, windows_dir / name)
+        items = []
+        for (first_page, last_page), pdf in zip(windows, paths):
+            item = {
+                "document": doc["filename"],
+                "pages": [first_page, last_page],
+                "pdf": pdf,
+                "stg_silver_path": os.path.join(silver_dir, f"tmp_silver_{name}_p{first_page:04d}-{last_page:04d}.json"),
+                "silver_path": str(windows_dir / name / f"silver_p{first_page:04d}-{last_page:04d}.json"),
+            }
+            if raw is not None:
+                # raw de execuções antigas não tem "pages": as descrições seguem a ordem das páginas
+                pages = raw.get("pages") or range(1, len(raw["pages_description"]) + 1)
+                descriptions = [
+                    content for page, content in zip(pages, raw["pages_description"])
+                    if first_page <= page <= last_page
+                ]
+                item["json_parcial"] = window_json(doc["filename"], [first_page, last_page], descriptions)
+            items.append(item)
+        return items
+
+    def load_pproc(doc):
+        """Carrega a saída do pproc (e a de cada janela) gravada por uma execução anterior."""
+        pproc_json = read_artifact(doc["stg_silver_path"])
+        if pproc_json is None:
+            return False
+        windows = plan_windows(doc["pproc_pdf"], window_pages)
+        if windows:
+            items = pproc_windows(doc, windows)
+            for item in items:
+                item.pop("json_parcial", None)
+                item["pproc_json"] = read_artifact(item["stg_silver_path"])
+                if item["pproc_json"] is None:
+                    return False
+            doc["windows"] = items
+        doc["pproc_json"] = pproc_json
+        return True
+
+    def window_tags(window):
+        first_page, last_page = window["pages"]
+        return {"document": window["document"], "pages": list(range(first_page, last_page + 1))}
+
+    def pproc_window(window):
+        part = safe_pproc(pproc_prompt, window["pdf"], window.pop("json_parcial"), output_path=window["stg_silver_path"],
+                          tags=window_tags(window))
+        if invalid_json(part):
+            print(f"⚠️ pproc das páginas {window['pages']} devolveu JSON inválido; mantido no merge")
+        window["pproc_json"] = part
+        return part
+
+    def pproc_stage(doc, emit):
         os.makedirs(silver_dir, exist_ok=True)
-        stg_silver_path = os.path.join(silver_dir, f"tmp_silver_{filename}.json")
-        with open(stg_silver_path, "w", encoding="utf8") as r:
-            json.dump(pproc_json, r, ensure_ascii=False)
-
+        doc["stg_silver_path"] = stg_silver_path = stg_silver_path_of(doc)
+        doc["pproc_pdf_hash"] = file_sha256(doc["pproc_pdf"])
+        pproc_fp = fingerprint(doc["pproc_pdf_hash"], pproc_prompt, PPROC_MODEL, content_hash(doc["raw"]),
+                               window_pages, structured_enabled())
+
+        entry = doc["manifest"].fresh("pproc", pproc_fp)
+        if entry is not None and "pproc" not in forced and load_pproc(doc) \
+                and content_hash(doc["pproc_json"]) == entry["artifact_hash"]:
+            print(f"{doc['filename']}: pproc sem mudanças desde a última execução — reaproveitado")
+            doc["pproc_hash"] = entry["artifact_hash"]
+            emit(doc)
+            return
+        doc.pop("windows", None)
+
+        windows = plan_windows(doc["pproc_pdf"], window_pages)
+        pproc_input = compact_json([{"filename": doc["filename"], "pages_description": doc["raw"]["pages_description"]}])
+        if windows:
+            # map: pproc de cada janela em paralelo; reduce: merge hierárquico dos JSONs
+            doc["windows"] = pproc_windows(doc, windows)
+            print(f"pproc de {doc['filename']} em {len(windows)} janelas de até {window_pages} páginas")
+            doc["pproc_json"] = merge_tree(run_windows(pproc_window, doc["windows"], window_concurrency))
+        else:
+            # a resposta vai para o disco enquanto chega; o silver usa o objeto devolvido
+            doc["pproc_json"] = safe_pproc(pproc_prompt, doc["pproc_pdf"], pproc_input, output_path=stg_silver_path,
+                                           tags={"document": doc["filename"]})
+
+        doc["pproc_hash"] = content_hash(doc["pproc_json"])
+        # sem registro no manifesto para JSON inválido: a próxima execução refaz o pproc em vez de
+        # reaproveitar o marcador
+        record = None if invalid_json(doc["pproc_json"]) else functools.partial(
+            doc["manifest"].record, "pproc", pproc_fp, doc["pproc_hash"], artifact=stg_silver_path)
+        if record is None:
+            print(f"❌ {doc['filename']}: pproc sem JSON válido")
+        if windows:
+            # gravado em segundo plano: registrado só depois da gravação
+            artifacts.write(stg_silver_path, doc["pproc_json"], on_written=record)
+        elif record is not None:
+            record()
+        emit(doc)
+
+    def silver_stage(doc, emit):
         final_prompt = silver_prompt(general_information)
 
-        final_silver = load_safe_json(safe_silver_json(pdf_path, stg_silver_path, final_prompt))
-        final_silver_path = os.path.join(silver_dir, f"silver_{filename}.json")
-
-        with open(final_silver_path, "w", encoding="utf8") as r:
-            json.dump(final_silver, r, ensure_ascii=False)
-
-        total_images = contar_tags_imagem(final_silver_path)
+        final_silver_path = os.path.join(silver_dir, f"silver_{output_name(doc['filename'])}.json")
+        silver_fp = fingerprint(doc["pproc_pdf_hash"], final_prompt, PPROC_MODEL, doc["pproc_hash"],
+                                window_pages, structured_enabled())
+
+        entry = doc["manifest"].fresh("silver", silver_fp)
+        if entry is not None and "silver" not in forced and entry["artifact"] == final_silver_path \
+                and os.path.exists(final_silver_path):
+            print(f"{os.path.basename(final_silver_path)} sem mudanças desde a última execução — reaproveitado")
+            print(f"Total de imagens encontradas: {contar_tags_imagem(final_silver_path)}")
+            emit(final_silver_path)
+            return
+
+        if doc.get("windows"):
+            final_silver = merge_tree(run_windows(
+                lambda window: safe_silver_json(window["pdf"], window.pop("pproc_json"), final_prompt,
+                                                output_path=window["silver_path"], tags=window_tags(window)),
+                doc["windows"],
+                window_concurrency,
+            ))
+            write_json_atomic(final_silver, final_silver_path)
+        else:
+            # a resposta vai para o disco enquanto chega e só ganha o nome final quando completa
+            final_silver = safe_silver_json(doc["pproc_pdf"], doc.pop("pproc_json"), final_prompt,
+                                            output_path=final_silver_path, tags={"document": doc["filename"]})
+        if invalid_json(final_silver):
+            print(f"❌ {doc['filename']}: silver sem JSON válido")
+        else:
+            doc["manifest"].record("silver", silver_fp, content_hash(final_silver), artifact=final_silver_path)
+
+        # JSONs do pproc já consumidos viram .tmp (depois de gravados, se a gravação ainda estiver na fila)
+        for stg_path in [doc["stg_silver_path"]] + [window["stg_silver_path"] for window in doc.get("windows", [])]:
+            artifacts.rename(stg_path, os.path.splitext(stg_path)[0] + ".tmp")
+
+        total_images = count_image_tags(final_silver)
 
         print(f"{os.path.basename(final_silver_path)} salvo com sucesso em {os.path.normpath(final_silver_path)}")
         print(f"Total de imagens encontradas: {total_images}")
+        emit(final_silver_path)
+
+    def artifact_docs():
+        """Documentos para começar do pproc (raw anterior) ou do silver (saída anterior do pproc)."""
+        for f in files:
+            pdf_path = os.path.join(path_parcionados, f)
+            raw = raw_entries.get(f)
+            doc = {"filename": f, "pdf_path": pdf_path, "raw": raw,
+                   "manifest": StageManifest(manifest_dir / f"{Path(f).stem}.json")}
+            if raw is not None and raw.get("pdf") and os.path.exists(raw["pdf"]):
+                doc["pproc_pdf"] = raw["pdf"]
+            else:
+                # raw antigo: o PDF filtrado por idioma, se houver, senão o original
+                filtered = filtered_dir / f
+                doc["pproc_pdf"] = str(filtered) if filtered.exists() else pdf_path
+
+            if raw is not None:
+                api_metrics().set_pages(f, len(raw["pages_description"]))
+            if start_stage == "pproc":
+                if raw is None:
+                    print(f"⚠️ {f}: sem raw em {raw_dir}; documento ignorado")
+                    continue
+            else:
+                doc["stg_silver_path"] = stg_silver_path_of(doc)
+                if not load_pproc(doc):
+                    print(f"⚠️ {f}: sem saída do pproc em {silver_dir}; documento ignorado")
+                    continue
+                doc["pproc_pdf_hash"] = file_sha256(doc["pproc_pdf"])
+                doc["pproc_hash"] = content_hash(doc["pproc_json"])
+            yield doc
+
+    # itens em memória: a fila de entrada do analyze + um por worker + o que está sendo renderizado.
+    # Com um teto menor que a concorrência, os workers do analyze diminuem para caber nele
+    analyze_workers = min(concurrency, max_items_in_memory - 2)
+    stages = [
+        Stage("render", render_stage, workers=1, queue_size=2),
+        Stage("analyze", analyze_stage, workers=analyze_workers, queue_size=max_items_in_memory - analyze_workers - 1),
+        Stage("raw", raw_stage, workers=1, queue_size=2),
+        Stage("pproc", pproc_stage, workers=1, queue_size=2),
+        Stage("silver", silver_stage, workers=1, queue_size=2),
+    ]
+    if start_stage is not None:
+        stages = stages[[stage.name for stage in stages].index(start_stage):]
+        items = artifact_docs()
+    else:
+        items = ({"filename": f, "pdf_path": os.path.join(path_parcionados, f)} for f in files)
+    graph = StageGraph(stages)
 
-        # Calcula o tempo total de execução
-        end_time = time.time()
-        elapsed_seconds = end_time - start_time
-        print(f"Tempo total de execução da pipeline: {elapsed_seconds:.2f} segundos ({elapsed_seconds/60:.2f} minutos)")
+    try:
+        graph.run(items)
+
+    finally:
+        pbar.close()
+        engine.close()
+        artifacts.close()
+        graph.print_stats()
+        if tracing.enabled():
+            tracing.print_summary()
+            trace_path = tracing.write_chrome_trace(Path(base_path) / "results" / "traces" / f"trace_{filename}_{now}.json")
+            print(f"Trace salvo em {trace_path} (abra em chrome://tracing ou ui.perfetto.dev)")
+        limiter_stats = engine.limiter.stats()
+        print(f"Rate limit ({ANALYSIS_MODEL}): concorrência final {limiter_stats['concurrency']}, "
+              f"{limiter_stats['rate_limited']} respostas 429")
+        if route_text_pages or vision_batch_pages > 1:
+            route_stats.print_summary()
+        language_audit.print_summary()
+        if screen is not None:
+            screen.print_summary()
+        json_stats().print_summary()
+        stream_stats().print_summary()
+        api_metrics().print_summary()
+        write_json_atomic(api_metrics().summary(), metrics_dir / f"summary_{filename}_{now}.json")
+        print(f"Métricas da API em {metrics_dir}")
+        if os.getenv("PROMETHEUS_TEXTFILE"):
+            api_metrics().write_prometheus(os.getenv("PROMETHEUS_TEXTFILE"))
+        api_metrics().close()
+        print(f"Uploads de PDF: {file_registry().uploads} novos, {file_registry().reuses} reaproveitados")
+        if cache is not None:
+            stats = cache.stats()
+            print(f"Cache de análise: {stats['hits']} hits, {stats['misses']} misses "
+                  f"({stats['hit_rate']:.0%} de acerto) — {stats['entries']} entradas, {stats['size_mb']:.1f} MB")
+            cache.close()
+
+    # Calcula o tempo total de execução
+    end_time = time.time()
+    elapsed_seconds = end_time - start_time
+    print(f"Tempo total de execução da pipeline: {elapsed_seconds:.2f} segundos ({elapsed_seconds/60:.2f} minutos)")
+
+    errors = graph.errors()
+    if errors:
+        stage_name, item, error = errors[0]
+        raise RuntimeError(f"{len(errors)} documento(s) falharam; primeiro erro no estágio {stage_name}: {error}") from error
+    if artifacts.errors:
+        # artefatos não gravados ficam fora do manifesto e são refeitos na próxima execução
+        path, error = artifacts.errors[0]
+        raise RuntimeError(f"{len(artifacts.errors)} artefato(s) não foram gravados; primeiro: {path}: {error}") from error
+
+
+if __name__ == "__main__":
+    # mantido por compatibilidade: equivale a `python cli.py process ...`
+    import sys
+    from cli import main
+
+    sys.exit(main(["process", *sys.argv[1:]]))
@@ -57,6 +57,46 @@ This is CRITICAL.
 
 """
 
+batch_analysis_prompt = analysis_prompt + """
+7. **Multiple Pages**
+- You may receive several pages in one message. Each page starts with a delimiter line like <<<PAGE 3>>>, followed by the page image and its extracted text.
+- For every page, output its delimiter line followed by that page's content, in the same order.
+- Never merge pages, never skip a delimiter, and never move content from one page to another.
+
+"""
+
+text_analysis_prompt = """
+You will be provided with the text layer of one or more technical document pages, already in reading order.
+Each page starts with a delimiter line like <<<PAGE 3>>>.
+Your task is to extract ALL content completely and faithfully, without summarizing or paraphrasing.
+
+0. **EXTRACT ONLY INFORMATION WRTTEN IN ENGLISH** don't extract information in any other language - just ignore it
+
+1. **Titles**
+- If a clear title exists, start with: {TITLE}
+
+2. **Content Extraction**
+- Extract ALL text exactly as written, preserving original terminology and technical vocabulary.
+- If the content includes lists, subpoints, conditions (e.g., "if ON vs OFF"), indicator states, or multiple cycle options, represent them explicitly as nested lists or bullet points.
+- Do not collapse or summarize conditional behaviors. Each condition must appear separately.
+- I need the extraction to be completely faithful to the original document, without missing anything and without adding anything, as it is a technical manual with procedures that must be followed to the letter under the risk of security problems and loss of equipment warranties.
+
+3. **Visual Elements → {"image": true}**
+- The input already contains {"image": true} wherever the page has a visual element.
+- Keep every {"image": true} exactly where it appears. NEVER omit, move or add image markers.
+
+4. **Safety and Warnings**
+- Safety instructions must be extracted in full detail, including optional or alternative instructions.
+
+5. **Terminology**
+- Preserve original wording for headings, labels, and terminology. Do not translate, simplify, or modernize terms.
+
+6. **Output Format**
+- For every input page, output its delimiter line (e.g. <<<PAGE 3>>>) followed by that page's content, in the same order.
+- Inside each page: if a title exists, {TITLE} followed by the content description; otherwise only the content description.
+
+"""
+
 pproc_prompt = """
 # PDF TO JSON TRANSFORMER
 
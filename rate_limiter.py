@@ -0,0 +1,262 @@
+# rate_limiter.py
+import asyncio
+import re
+import threading
+import time
+
+# Fração do limite informado pela API que nos permitimos usar
+SAFETY_FACTOR = 0.92
+# Abaixo desta fração restante (requests ou tokens) a concorrência é reduzida
+LOW_WATERMARK = 0.1
+# Espera padrão após um 429 sem cabeçalho retry-after
+DEFAULT_RETRY_AFTER = 5.0
+
+
+def parse_reset(value):
+    """Converte durações da API ("1s", "6m0s", "120ms", "0.5") em segundos."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+def _header_float(headers, name):
+    if headers is None:
+        return None
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+# Intervalo máximo entre verificações enquanto se espera orçamento, para que
+# limites corrigidos pelos cabeçalhos passem a valer para quem já está esperando
+MAX_WAIT_STEP = 1.0
+
+
+class TokenBucket:
+    """
+    Balde de tokens com reabastecimento contínuo (`per_minute` por minuto).
+
+    Um custo é liberado quando o saldo cobre min(custo, capacidade) e então
+    debitado inteiro, o que permite custos maiores que a capacidade (o saldo
+    fica negativo e atrasa as próximas chamadas).
+    """
+
+    def __init__(self, per_minute, burst_seconds=1):
+        self.burst_seconds = burst_seconds
+        self.set_rate(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def set_rate(self, per_minute):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate * self.burst_seconds, 1.0)
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def shortfall(self, amount, now):
+        """Segundos até o saldo cobrir `amount` (0 se já cobre)."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0.0) / self.rate
+
+    def take(self, amount):
+        self.level -= amount
+
+    def cap(self, remaining, now):
+        """Alinha o saldo local com o que a API informa como restante."""
+        self._refill(now)
+        self.level = min(self.level, remaining)
+
+
+class AdaptiveRateLimiter:
+    """
+    Limitador compartilhado por todas as chamadas a um modelo.
+
+    - Dois baldes (requests/minuto e tokens/minuto) cobram o custo estimado de cada chamada,
+      corrigido pela razão real/estimado observada no campo `usage` das respostas.
+    - Os cabeçalhos x-ratelimit-* das respostas corrigem os limites e o saldo.
+    - Concorrência e vazão seguem AIMD: a concorrência sobe +1 a cada janela de
+      sucessos com folga e cai pela metade quando a folga acaba ou chega um 429;
+      a vazão dos baldes (`throttle`) recua 15% a cada 429 e se recupera aos poucos.
+    """
+
+    def __init__(self, rpm, tpm, max_concurrency, min_concurrency=1, decrease_factor=0.5, cooldown=2.0):
+        self.limit_rpm = rpm
+        self.limit_tpm = tpm
+        self.throttle = 1.0
+        self.requests = TokenBucket(rpm * SAFETY_FACTOR)
+        self.tokens = TokenBucket(tpm * SAFETY_FACTOR)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency = max(min_concurrency, max_concurrency // 2)
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+
+        self.rate_limited = 0
+        self.cost_scale = 1.0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def _apply_rates(self):
+        self.requests.set_rate(self.limit_rpm * SAFETY_FACTOR * self.throttle)
+        self.tokens.set_rate(self.limit_tpm * SAFETY_FACTOR * self.throttle)
+
+    # ---------------------------------------------------------------
+    # Reserva de capacidade
+    # ---------------------------------------------------------------
+    def try_acquire(self, cost):
+        """
+        Debita uma requisição de `cost` tokens se houver orçamento e devolve 0;
+        caso contrário não debita nada e devolve quantos segundos esperar.
+        """
+        with self._lock:
+            now = time.monotonic()
+            cost = cost * self.cost_scale
+            wait = max(
+                self.requests.shortfall(1, now),
+                self.tokens.shortfall(cost, now),
+                self._paused_until - now,
+            )
+            if wait > 0:
+                return wait
+            self.requests.take(1)
+            self.tokens.take(cost)
+            return 0.0
+
+    def wait(self, cost):
+        while True:
+            delay = self.try_acquire(cost)
+            if delay <= 0:
+                return
+            time.sleep(min(delay, MAX_WAIT_STEP))
+
+    async def wait_async(self, cost):
+        while True:
+            delay = self.try_acquire(cost)
+            if delay <= 0:
+                return
+            await asyncio.sleep(min(delay, MAX_WAIT_STEP))
+
+    # ---------------------------------------------------------------
+    # Retorno da API
+    # ---------------------------------------------------------------
+    def update_from_headers(self, headers):
+        """Ajusta limites, saldo e concorrência a partir dos cabeçalhos x-ratelimit-*."""
+        limit_requests = _header_float(headers, "x-ratelimit-limit-requests")
+        limit_tokens = _header_float(headers, "x-ratelimit-limit-tokens")
+        remaining_requests = _header_float(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_float(headers, "x-ratelimit-remaining-tokens")
+
+        with self._lock:
+            now = time.monotonic()
+            if limit_requests:
+                self.limit_rpm = limit_requests
+            if limit_tokens:
+                self.limit_tpm = limit_tokens
+            if self.throttle < 1.0:
+                self.throttle = min(1.0, self.throttle + 0.002)
+            self._apply_rates()
+            if remaining_requests is not None:
+                self.requests.cap(remaining_requests, now)
+            if remaining_tokens is not None:
+                self.tokens.cap(remaining_tokens, now)
+
+            low = (
+                (limit_requests and remaining_requests is not None
+                 and remaining_requests < limit_requests * LOW_WATERMARK)
+                or (limit_tokens and remaining_tokens is not None
+                    and remaining_tokens < limit_tokens * LOW_WATERMARK)
+            )
+            if low:
+                self._decrease(now)
+            else:
+                self._increase()
+
+    def record_usage(self, estimated, actual):
+        """Calibra as próximas estimativas com os tokens efetivamente cobrados (média móvel)."""
+        if not estimated or not actual:
+            return
+        with self._lock:
+            self.cost_scale = 0.8 * self.cost_scale + 0.2 * (actual / estimated)
+
+    def record_rate_limited(self, headers=None):
+        """Registra um 429: pausa todas as chamadas e reduz a concorrência."""
+        retry_after = _header_float(headers, "retry-after-ms")
+        if retry_after is not None:
+            retry_after /= 1000.0
+        else:
+            retry_after = _header_float(headers, "retry-after")
+        if retry_after is None:
+            retry_after = parse_reset(headers.get("x-ratelimit-reset-requests")) if headers is not None else None
+        if retry_after is None:
+            retry_after = DEFAULT_RETRY_AFTER
+
+        with self._lock:
+            now = time.monotonic()
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, now + retry_after)
+            if self._decrease(now):
+                self.throttle = max(0.3, self.throttle * 0.85)
+                self._apply_rates()
+        return retry_after
+
+    def _increase(self):
+        self._successes += 1
+        if self._successes >= self.concurrency and self.concurrency < self.max_concurrency:
+            self.concurrency += 1
+            self._successes = 0
+
+    def _decrease(self, now):
+        # uma rajada de respostas da mesma janela conta como um único sinal
+        if now - self._last_decrease < self.cooldown:
+            return False
+        self._last_decrease = now
+        self._successes = 0
+        self.concurrency = max(self.min_concurrency, int(self.concurrency * self.decrease_factor))
+        return True
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "rate_limited": self.rate_limited,
+            "cost_scale": self.cost_scale,
+            "throttle": self.throttle,
+            "rpm": self.requests.per_minute,
+            "tpm": self.tokens.per_minute,
+        }
+
+
+# -------------------------------------------------------------------
+# Um limitador por modelo, compartilhado por todo o processo
+# -------------------------------------------------------------------
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model, rpm, tpm, max_concurrency=4):
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(rpm, tpm, max_concurrency)
+            _limiters[model] = limiter
+        elif max_concurrency > limiter.max_concurrency:
+            limiter.max_concurrency = max_concurrency
+        return limiter
@@ -0,0 +1,120 @@
+# render_pdf.py
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+from tracing import traced
+
+# Backends disponíveis: "fitz" (padrão, sem dependências externas) e "poppler" (pdf2image + pdftoppm)
+DEFAULT_BACKEND = "fitz"
+DEFAULT_DPI = 200
+DEFAULT_COLORSPACE = "rgb"
+DEFAULT_FORMAT = "png"
+
+COLORSPACES = {
+    "rgb": fitz.csRGB,
+    "gray": fitz.csGRAY,
+}
+
+
+def _config(value, env_name, default, cast=str):
+    """Usa o valor passado ou, se None, a variável de ambiente correspondente."""
+    if value is not None:
+        return value
+    return cast(os.getenv(env_name, default))
+
+
+@traced("render_page", "render")
+def render_page(doc, index, dpi=DEFAULT_DPI, colorspace=DEFAULT_COLORSPACE, fmt=DEFAULT_FORMAT):
+    """Renderiza uma página com PyMuPDF e devolve os bytes já codificados."""
+    if colorspace not in COLORSPACES:
+        raise ValueError(f"Colorspace inválido: {colorspace} (use {', '.join(COLORSPACES)})")
+
+    pix = doc.load_page(index).get_pixmap(dpi=dpi, colorspace=COLORSPACES[colorspace], alpha=False)
+    return pix.tobytes(fmt)
+
+
+# -------------------------------------------------------------------
+# Pool de processos: cada worker abre o PDF uma única vez
+# -------------------------------------------------------------------
+_worker_doc = None
+
+
+def _init_worker(path):
+    global _worker_doc
+    _worker_doc = fitz.open(path)
+
+
+def _render_in_worker(index, dpi, colorspace, fmt):
+    return index, render_page(_worker_doc, index, dpi, colorspace, fmt)
+
+
+def iter_pages_fitz(path, pages, dpi=DEFAULT_DPI, colorspace=DEFAULT_COLORSPACE, fmt=DEFAULT_FORMAT, processes=0):
+    """
+    Gera (índice, bytes) para cada página usando pixmaps do PyMuPDF.
+
+    Com `processes` > 0 a renderização é distribuída em um pool de processos,
+    mantendo no máximo `processes` páginas adiantadas em relação ao consumidor.
+    """
+    if not processes:
+        with fitz.open(path) as doc:
+            for index in pages:
+                yield index, render_page(doc, index, dpi, colorspace, fmt)
+        return
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(path,)) as executor:
+        pending = deque()
+        for index in pages:
+            pending.append(executor.submit(_render_in_worker, index, dpi, colorspace, fmt))
+            if len(pending) > processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_pages_poppler(path, pages, dpi=DEFAULT_DPI, colorspace=DEFAULT_COLORSPACE):
+    """Gera (índice, imagem PIL) via pdf2image. Requer o poppler instalado."""
+    from pdf2image import convert_from_path
+
+    for index in pages:
+        img = convert_from_path(path, dpi=dpi, first_page=index + 1, last_page=index + 1,
+                                grayscale=(colorspace == "gray"))[0]
+        yield index, img
+
+
+def render_settings(backend=None, dpi=None, colorspace=None):
+    """
+    Backend, DPI e colorspace efetivos (valor passado ou variáveis RENDER_*). Mudam a
+    imagem enviada, então também entram no hash dos insumos de cada página.
+    """
+    return {
+        "backend": _config(backend, "RENDER_BACKEND", DEFAULT_BACKEND),
+        "dpi": _config(dpi, "RENDER_DPI", DEFAULT_DPI, int),
+        "colorspace": _config(colorspace, "RENDER_COLORSPACE", DEFAULT_COLORSPACE),
+    }
+
+
+def iter_pages(path, pages=None, backend=None, dpi=None, colorspace=None, processes=None):
+    """
+    Renderiza as páginas sob demanda com o backend configurado.
+
+    Parâmetros não informados vêm das variáveis de ambiente RENDER_BACKEND,
+    RENDER_DPI, RENDER_COLORSPACE e RENDER_PROCESSES.
+
+    :param pages: índices (base 0) a renderizar; None para todas as páginas
+    """
+    settings = render_settings(backend, dpi, colorspace)
+    backend, dpi, colorspace = settings["backend"], settings["dpi"], settings["colorspace"]
+    processes = _config(processes, "RENDER_PROCESSES", 0, int)
+
+    if pages is None:
+        with fitz.open(path) as doc:
+            pages = range(doc.page_count)
+
+    if backend == "fitz":
+        return iter_pages_fitz(path, pages, dpi, colorspace, processes=processes)
+    if backend == "poppler":
+        return iter_pages_poppler(path, pages, dpi, colorspace)
+    raise ValueError(f"Backend de renderização inválido: {backend} (use 'fitz' ou 'poppler')")
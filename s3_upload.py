@@ -1,12 +1,53 @@
 import boto3
+import concurrent.futures
+import functools
+import gzip
+import hashlib
+import io
 import os
+from pathlib import Path
+
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 
-load_dotenv()
+MB = 1024 * 1024
+
+# Arquivos enviados ao mesmo tempo por sincronizar_pasta
+S3_CONCURRENCY = 8
+# Partes enviadas ao mesmo tempo dentro de um upload multipart
+S3_PART_CONCURRENCY = 4
+# Tamanho a partir do qual o upload vira multipart, e tamanho de cada parte (MB)
+S3_MULTIPART_THRESHOLD_MB = 16
+S3_MULTIPART_CHUNK_MB = 16
+
+# Metadado com o MD5 do arquivo local (antes do gzip): permite pular objetos iguais
+# mesmo quando o ETag não é um MD5 (uploads multipart)
+SOURCE_MD5 = "source-md5"
+
+
+def _setting(name, default):
+    return int(os.getenv(name, default))
+
+
+def gzip_enabled(value=None):
+    """Content-Encoding gzip nos JSON enviados? Padrão pela variável S3_GZIP (0)."""
+    if value is not None:
+        return value
+    return os.getenv("S3_GZIP", "0").lower() in ("1", "true", "yes")
 
-def enviar_para_s3(filepath: str, key: str):
-    if not os.path.exists(filepath):
-        raise FileNotFoundError(f"Arquivo não encontrado: {filepath}")
+
+def s3_bucket():
+    load_dotenv()
+    return os.getenv("AWS_S3_BUCKET", "chatvolt-peritho-bucket")
+
+
+@functools.lru_cache(maxsize=1)
+def s3_client():
+    """Cliente único (thread-safe) com pool de conexões do tamanho da concorrência dos uploads."""
+    # o .env só é lido no primeiro uso, não na importação
+    load_dotenv()
 
     # Validar credenciais AWS
     aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
@@ -19,15 +60,114 @@ def enviar_para_s3(filepath: str, key: str):
             "AWS_SECRET_ACCESS_KEY no arquivo .env"
         )
 
-    bucket = os.getenv("AWS_S3_BUCKET", "chatvolt-peritho-bucket")
-
-    s3 = boto3.client(
+    pool = _setting("S3_CONCURRENCY", S3_CONCURRENCY) * _setting("S3_PART_CONCURRENCY", S3_PART_CONCURRENCY)
+    return boto3.client(
         "s3",
         aws_access_key_id=aws_access_key,
         aws_secret_access_key=aws_secret_key,
-        region_name=aws_region
+        region_name=aws_region,
+        # AWS_ENDPOINT_URL aponta para um S3 compatível (MinIO, moto) em testes
+        endpoint_url=os.getenv("AWS_ENDPOINT_URL") or None,
+        config=Config(max_pool_connections=max(pool, 10), retries={"max_attempts": 5, "mode": "adaptive"}),
     )
-    s3.upload_file(filepath, bucket, key)
+
+
+def transfer_config():
+    return TransferConfig(
+        multipart_threshold=_setting("S3_MULTIPART_THRESHOLD_MB", S3_MULTIPART_THRESHOLD_MB) * MB,
+        multipart_chunksize=_setting("S3_MULTIPART_CHUNK_MB", S3_MULTIPART_CHUNK_MB) * MB,
+        max_concurrency=_setting("S3_PART_CONCURRENCY", S3_PART_CONCURRENCY),
+        use_threads=True,
+    )
+
+
+def s3_etag(data, config):
+    """ETag que o S3 atribui a `data` enviado com `config` (MD5 simples ou MD5 das partes + "-N")."""
+    if len(data) < config.multipart_threshold:
+        return hashlib.md5(data).hexdigest()
+    chunk = config.multipart_chunksize
+    digests = [hashlib.md5(data[i:i + chunk]).digest() for i in range(0, len(data), chunk)]
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+def _remote_object(client, bucket, key):
+    try:
+        return client.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+
+
+def _upload(client, bucket, filepath, key, use_gzip, config):
+    """Envia um arquivo, a menos que o objeto remoto já tenha o mesmo conteúdo. Devolve (enviado?, bytes)."""
+    data = Path(filepath).read_bytes()
+    source_md5 = hashlib.md5(data).hexdigest()
+    extra_args = {"Metadata": {SOURCE_MD5: source_md5}}
+    if use_gzip and filepath.lower().endswith(".json"):
+        # mtime=0: o mesmo JSON gera sempre os mesmos bytes (e o mesmo ETag)
+        data = gzip.compress(data, mtime=0)
+        extra_args.update(ContentEncoding="gzip", ContentType="application/json")
+
+    remote = _remote_object(client, bucket, key)
+    if remote is not None:
+        same_source = remote.get("Metadata", {}).get(SOURCE_MD5) == source_md5 \
+            and remote.get("ContentEncoding") == extra_args.get("ContentEncoding")
+        if same_source or remote["ETag"].strip('"') == s3_etag(data, config):
+            return False, 0
+
+    client.upload_fileobj(io.BytesIO(data), bucket, key, ExtraArgs=extra_args, Config=config)
+    return True, len(data)
+
+
+def enviar_para_s3(filepath: str, key: str, use_gzip=None):
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(f"Arquivo não encontrado: {filepath}")
+
+    bucket = s3_bucket()
+    uploaded, _ = _upload(s3_client(), bucket, filepath, key, gzip_enabled(use_gzip), transfer_config())
+    if not uploaded:
+        print(f"s3://{bucket}/{key} já está atualizado — envio pulado")
 
     return f"s3://{bucket}/{key}"
 
+
+def sincronizar_pasta(folder, prefix="", pattern="*.json", use_gzip=None, concurrency=None):
+    """
+    Envia todos os arquivos de `folder` (ex.: results/silver, results/gold) que casam
+    com `pattern` para `prefix/` no bucket, vários ao mesmo tempo com o mesmo cliente.
+    Objetos remotos com o mesmo conteúdo (MD5/ETag) não são reenviados.
+
+    :return: {"uploaded": [...], "skipped": [...], "failed": {key: erro}, "bytes": enviados}
+    """
+    folder = Path(folder)
+    if not folder.is_dir():
+        raise FileNotFoundError(f"Pasta não encontrada: {folder}")
+
+    prefix = prefix.strip().strip("/")
+    files = sorted(path for path in folder.glob(pattern) if path.is_file())
+    client, bucket, config = s3_client(), s3_bucket(), transfer_config()
+    use_gzip = gzip_enabled(use_gzip)
+    concurrency = concurrency or _setting("S3_CONCURRENCY", S3_CONCURRENCY)
+
+    result = {"uploaded": [], "skipped": [], "failed": {}, "bytes": 0}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(min(concurrency, len(files)), 1)) as executor:
+        futures = {
+            executor.submit(_upload, client, bucket, str(path), f"{prefix}/{path.name}" if prefix else path.name,
+                            use_gzip, config): path.name
+            for path in files
+        }
+        for future in concurrent.futures.as_completed(futures):
+            key = f"{prefix}/{futures[future]}" if prefix else futures[future]
+            try:
+                uploaded, sent = future.result()
+            except Exception as e:
+                print(f"⚠️ Falha ao enviar {key}: {e}")
+                result["failed"][key] = str(e)
+                continue
+            result["uploaded" if uploaded else "skipped"].append(key)
+            result["bytes"] += sent
+
+    print(f"s3://{bucket}/{prefix}: {len(result['uploaded'])} enviados, {len(result['skipped'])} já atualizados, "
+          f"{len(result['failed'])} falhas ({result['bytes'] / MB:.1f} MB)")
+    return result
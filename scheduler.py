@@ -0,0 +1,140 @@
+# scheduler.py
+import queue
+import threading
+import time
+import traceback
+
+from tracing import span
+
+_STOP = object()
+
+
+class Stage:
+    """
+    Um estágio do grafo: `fn(item, emit)` processa um item e chama `emit(novo_item)`
+    para enviá-lo ao próximo estágio (ou `emit(novo_item, to="nome")` para pular estágios).
+
+    :param workers: threads consumindo a fila de entrada do estágio
+    :param queue_size: capacidade da fila de entrada (0 = sem limite)
+    """
+
+    def __init__(self, name, fn, workers=1, queue_size=2):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0  # tempo esperando vaga na fila do estágio seguinte
+        self.errors = []
+        self._lock = threading.Lock()
+
+
+class StageGraph:
+    """
+    Executa estágios encadeados, cada um com suas threads e uma fila limitada de entrada.
+
+    Itens diferentes ocupam estágios diferentes ao mesmo tempo (ex.: o silver do
+    documento N enquanto as páginas do documento N+1 são analisadas). Filas cheias
+    seguram o estágio anterior, o que limita a memória em uso.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self._index = {stage.name: i for i, stage in enumerate(self.stages)}
+        self.outputs = []
+        self.wall_seconds = 0.0
+
+    def _emitter(self, position):
+        def emit(item, to=None):
+            target = position + 1 if to is None else self._index[to]
+            if target <= position:
+                raise ValueError("emit só pode enviar itens para estágios seguintes")
+
+            stage = self.stages[position]
+            start = time.perf_counter()
+            if target >= len(self.stages):
+                with stage._lock:
+                    self.outputs.append(item)
+            else:
+                self.stages[target].queue.put(item)
+            with stage._lock:
+                stage.blocked_seconds += time.perf_counter() - start
+        return emit
+
+    def _worker(self, position):
+        stage = self.stages[position]
+        emit = self._emitter(position)
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                return
+            start = time.perf_counter()
+            try:
+                with span(stage.name, "stage"):
+                    stage.fn(item, emit)
+            except Exception as e:
+                print(f"❌ [{stage.name}] {type(e).__name__}: {e}")
+                traceback.print_exc()
+                with stage._lock:
+                    stage.errors.append((item, e))
+            finally:
+                with stage._lock:
+                    stage.items += 1
+                    stage.busy_seconds += time.perf_counter() - start
+
+    def run(self, items):
+        """Processa `items` pelo grafo e devolve o que sair do último estágio."""
+        start = time.perf_counter()
+        threads = []
+        for position, stage in enumerate(self.stages):
+            stage_threads = [
+                threading.Thread(target=self._worker, args=(position,), name=f"stage-{stage.name}-{n}", daemon=True)
+                for n in range(stage.workers)
+            ]
+            for thread in stage_threads:
+                thread.start()
+            threads.append(stage_threads)
+
+        for item in items:
+            self.stages[0].queue.put(item)
+
+        # encerra os estágios em ordem: um estágio só para depois que todos os anteriores pararam
+        for stage, stage_threads in zip(self.stages, threads):
+            for _ in stage_threads:
+                stage.queue.put(_STOP)
+            for thread in stage_threads:
+                thread.join()
+
+        self.wall_seconds = time.perf_counter() - start
+        return self.outputs
+
+    def errors(self):
+        return [(stage.name, item, error) for stage in self.stages for item, error in stage.errors]
+
+    def stats(self):
+        """
+        Utilização por estágio: fração do tempo total em que as threads do estágio
+        estavam trabalhando (sem contar o tempo bloqueadas na fila seguinte).
+        """
+        wall = self.wall_seconds or 1e-9
+        return [
+            {
+                "stage": stage.name,
+                "workers": stage.workers,
+                "items": stage.items,
+                "busy_seconds": stage.busy_seconds,
+                "blocked_seconds": stage.blocked_seconds,
+                "utilization": (stage.busy_seconds - stage.blocked_seconds) / (wall * stage.workers),
+                "errors": len(stage.errors),
+            }
+            for stage in self.stages
+        ]
+
+    def print_stats(self):
+        print(f"\n{'estágio':<10}{'workers':>8}{'itens':>7}{'ocupado (s)':>13}{'bloqueado (s)':>15}{'utilização':>12}")
+        for s in self.stats():
+            print(f"{s['stage']:<10}{s['workers']:>8}{s['items']:>7}{s['busy_seconds']:>13.1f}"
+                  f"{s['blocked_seconds']:>15.1f}{s['utilization']:>12.0%}")
+        print(f"Tempo total: {self.wall_seconds:.1f}s")
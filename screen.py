@@ -1,14 +1,17 @@
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from tkinter import filedialog, messagebox
-from pipeline_extracao import pipeline
-from parcionar_pdf import parcionar
-from s3_upload import enviar_para_s3
+from dotenv import load_dotenv
 import os
 import threading
 from pathlib import Path
 import shutil
 
+# A pipeline (OpenAI, PyMuPDF), o particionamento e o S3 são importados só quando a ação
+# roda: a janela abre sem pagar por eles. O .env é lido antes, porque as configurações
+# da pipeline vêm de variáveis de ambiente lidas na importação.
+load_dotenv()
+
 # -------------------------------------------------------------------
 # Funções auxiliares
 # -------------------------------------------------------------------
@@ -19,19 +22,36 @@ def executar():
         manual_name = entry_manual.get().strip()
         sectionname = entry_section.get().strip()
 
-        if not serial_number or not manual_name or not sectionname:
+        acao = var_acao.get()
+        # no particionamento em lote os nomes das seções vêm do sumário/manifesto
+        lote = acao == 1 and var_lote.get() != "uma"
+
+        if not serial_number or not manual_name or (not sectionname and not lote):
             messagebox.showerror("Erro", "Preencha Serial Number, Nome do Manual e Nome da Seção antes de continuar.")
             return
 
-        acao = var_acao.get()
-
         if acao == 1:  # Particionar PDF
+            from parcionar_pdf import parcionar, parcionar_lote, sections_from_manifest, sections_from_toc
+
             path_manual_bruto = entry_pdf_bruto.get().strip()
 
             if not path_manual_bruto:
                 messagebox.showerror("Erro", "Selecione o PDF bruto antes de continuar.")
                 return
 
+            if lote:
+                parcionados_dir = Path(path_manual_bruto).parent / "PDFs parcionados"
+                if var_lote.get() == "sumario":
+                    sections = sections_from_toc(path_manual_bruto)
+                else:
+                    manifest_path = filedialog.askopenfilename(filetypes=[("Manifesto de seções", "*.json")])
+                    if not manifest_path:
+                        return
+                    sections = sections_from_manifest(manifest_path)
+                outputs = parcionar_lote(sections, path_manual_bruto, parcionados_dir)
+                messagebox.showinfo("Sucesso", f"{len(outputs)} seções particionadas em {parcionados_dir}")
+                return
+
             try:
                 first_page = int(entry_first.get())
                 last_page = int(entry_last.get())
@@ -63,6 +83,9 @@ def executar():
 
             path_pdfs_parcionados = entry_pdfs_parcionados.get().strip()
             file_choice = combo_files.get()
+            # "início" roda tudo; pproc/silver partem dos artefatos em results/raw e results/silver
+            start_stage = combo_start_stage.get()
+            start_stage = None if start_stage in ("", "início") else start_stage
 
             base_path = Path(path_pdfs_parcionados).parent
 
@@ -94,8 +117,10 @@ def executar():
 
             def run_pipeline():
                 try:
+                    from pipeline_extracao import pipeline
+
                     # 🔹 Passa o filename para a função pipeline
-                    pipeline(base_path, filename, general_information, file_choice)
+                    pipeline(base_path, filename, general_information, file_choice, start_stage=start_stage)
                 except Exception as e:
                     import traceback
                     error_details = traceback.format_exc()
@@ -117,6 +142,8 @@ def executar():
             threading.Thread(target=run_pipeline, daemon=True).start()
 
         elif acao == 3:  # Upload para S3
+            from s3_upload import enviar_para_s3, sincronizar_pasta
+
             file_choice = combo_files_s3.get().strip()
             s3_folder = entry_s3_folder.get().strip()
             filename_override = entry_filename.get().strip()
@@ -125,6 +152,27 @@ def executar():
                 messagebox.showerror("Erro", "Selecione um arquivo local para enviar.")
                 return
 
+            if os.path.isdir(file_choice):
+                # pasta inteira (ex.: results/silver): só os JSONs novos ou alterados são enviados
+                btn_executar.config(state="disabled")
+                status_label.config(text=f"Sincronizando {file_choice} → s3://.../{s3_folder} ... (aguarde)")
+
+                def run_sync():
+                    try:
+                        result = sincronizar_pasta(file_choice, s3_folder)
+                    except Exception as e:
+                        root.after(0, lambda e=e: messagebox.showerror("Erro", str(e)))
+                    else:
+                        resumo = (f"{len(result['uploaded'])} enviados, {len(result['skipped'])} já atualizados, "
+                                  f"{len(result['failed'])} falhas")
+                        root.after(0, lambda: messagebox.showinfo("Sucesso", f"Pasta sincronizada: {resumo}"))
+                    finally:
+                        root.after(0, lambda: btn_executar.config(state="normal"))
+                        root.after(0, lambda: status_label.config(text=""))
+
+                threading.Thread(target=run_sync, daemon=True).start()
+                return
+
             filename = filename_override if filename_override else os.path.basename(file_choice)
             if not filename:
                 messagebox.showerror("Erro", "Nome do arquivo no S3 não pode ficar vazio.")
@@ -195,6 +243,22 @@ def escolher_json():
         entry_filename.insert(0, os.path.basename(filename))
 
 
+def escolher_pasta_s3():
+    folder = filedialog.askdirectory()
+    if folder:
+        combo_files_s3.set(folder)
+        entry_filename.delete(0, "end")
+
+
+def atualizar_nome_secao(event=None):
+    """Atualiza o nome da seção com base no PDF selecionado"""
+    file_choice = combo_files.get()
+    if file_choice:
+        section_name = os.path.splitext(file_choice)[0]
+        entry_section.delete(0, "end")
+        entry_section.insert(0, section_name)
+
+
 def mostrar_frame_acao():
     acao = var_acao.get()
     frame_secao.pack_forget()
@@ -215,106 +279,114 @@ def mostrar_frame_acao():
 # -------------------------------------------------------------------
 # Interface principal
 # -------------------------------------------------------------------
-root = ttk.Window(themename="flatly")
-root.title("Pipeline PDF + S3")
-root.geometry("700x700")
+# Só ao rodar a janela: processos spawn (PARTITION_WORKERS, RENDER_PROCESSES) importam
+# este módulo de novo e não podem abrir outra janela.
+if __name__ == "__main__":
+    root = ttk.Window(themename="flatly")
+    root.title("Pipeline PDF + S3")
+    root.geometry("700x700")
 
-# ---------------------- Campos obrigatórios iniciais ----------------------
-frame_info = ttk.Labelframe(root, text="Informações Iniciais", padding=10)
-frame_info.pack(fill="x", padx=10, pady=10)
+    # ---------------------- Campos obrigatórios iniciais ----------------------
+    frame_info = ttk.Labelframe(root, text="Informações Iniciais", padding=10)
+    frame_info.pack(fill="x", padx=10, pady=10)
 
-ttk.Label(frame_info, text="Serial Number:").grid(row=0, column=0, sticky="w", pady=4)
-entry_serial = ttk.Entry(frame_info, width=30)
-entry_serial.grid(row=0, column=1, padx=5, pady=4)
+    ttk.Label(frame_info, text="Serial Number:").grid(row=0, column=0, sticky="w", pady=4)
+    entry_serial = ttk.Entry(frame_info, width=30)
+    entry_serial.grid(row=0, column=1, padx=5, pady=4)
 
 
 
 
 
-ttk.Label(frame_info, text="Nome do Manual:").grid(row=1, column=0, sticky="w", pady=4)
-entry_manual = ttk.Entry(frame_info, width=30)
-entry_manual.grid(row=1, column=1, padx=5, pady=4)
+    ttk.Label(frame_info, text="Nome do Manual:").grid(row=1, column=0, sticky="w", pady=4)
+    entry_manual = ttk.Entry(frame_info, width=30)
+    entry_manual.grid(row=1, column=1, padx=5, pady=4)
 
-ttk.Label(frame_info, text="Nome da Seção:").grid(row=2, column=0, sticky="w", pady=4)
-entry_section = ttk.Entry(frame_info, width=30)
-entry_section.grid(row=2, column=1, padx=5, pady=4)
+    ttk.Label(frame_info, text="Nome da Seção:").grid(row=2, column=0, sticky="w", pady=4)
+    entry_section = ttk.Entry(frame_info, width=30)
+    entry_section.grid(row=2, column=1, padx=5, pady=4)
 
-# ---------------------- Escolha da ação ----------------------
-frame_acao = ttk.Labelframe(root, text="Ação", padding=10)
-frame_acao.pack(fill="x", padx=10, pady=8)
+    # ---------------------- Escolha da ação ----------------------
+    frame_acao = ttk.Labelframe(root, text="Ação", padding=10)
+    frame_acao.pack(fill="x", padx=10, pady=8)
 
-var_acao = ttk.IntVar(value=1)
-ttk.Radiobutton(frame_acao, text="1 - Particionar PDFs", variable=var_acao, value=1, command=mostrar_frame_acao).pack(anchor="w", pady=2)
-ttk.Radiobutton(frame_acao, text="2 - Processar PDFs (Pipeline)", variable=var_acao, value=2, command=mostrar_frame_acao).pack(anchor="w", pady=2)
-ttk.Radiobutton(frame_acao, text="3 - Enviar arquivos para Amazon S3", variable=var_acao, value=3, command=mostrar_frame_acao).pack(anchor="w", pady=2)
+    var_acao = ttk.IntVar(value=1)
+    ttk.Radiobutton(frame_acao, text="1 - Particionar PDFs", variable=var_acao, value=1, command=mostrar_frame_acao).pack(anchor="w", pady=2)
+    ttk.Radiobutton(frame_acao, text="2 - Processar PDFs (Pipeline)", variable=var_acao, value=2, command=mostrar_frame_acao).pack(anchor="w", pady=2)
+    ttk.Radiobutton(frame_acao, text="3 - Enviar arquivos para Amazon S3", variable=var_acao, value=3, command=mostrar_frame_acao).pack(anchor="w", pady=2)
 
-# ---------------------- Ação 1 ----------------------
-frame_secao = ttk.Labelframe(root, text="Parâmetros da Seção (ação 1)", padding=10)
-ttk.Label(frame_secao, text="Primeira página:").grid(row=0, column=0, sticky="w", pady=2)
-entry_first = ttk.Entry(frame_secao, width=10)
-entry_first.grid(row=0, column=1, padx=5, pady=2)
+    # ---------------------- Ação 1 ----------------------
+    frame_secao = ttk.Labelframe(root, text="Parâmetros da Seção (ação 1)", padding=10)
+    ttk.Label(frame_secao, text="Primeira página:").grid(row=0, column=0, sticky="w", pady=2)
+    entry_first = ttk.Entry(frame_secao, width=10)
+    entry_first.grid(row=0, column=1, padx=5, pady=2)
 
-ttk.Label(frame_secao, text="Última página:").grid(row=1, column=0, sticky="w", pady=2)
-entry_last = ttk.Entry(frame_secao, width=10)
-entry_last.grid(row=1, column=1, padx=5, pady=2)
+    ttk.Label(frame_secao, text="Última página:").grid(row=1, column=0, sticky="w", pady=2)
+    entry_last = ttk.Entry(frame_secao, width=10)
+    entry_last.grid(row=1, column=1, padx=5, pady=2)
 
-frame_pdf = ttk.Labelframe(root, text="PDF Bruto (ação 1)", padding=10)
-entry_pdf_bruto = ttk.Entry(frame_pdf, width=50)
-entry_pdf_bruto.pack(side="left", padx=5, pady=5, fill="x", expand=True)
-ttk.Button(frame_pdf, text="Selecionar", bootstyle=SECONDARY, command=escolher_pdf).pack(side="left", padx=5)
+    ttk.Label(frame_secao, text="Seções:").grid(row=2, column=0, sticky="w", pady=2)
+    var_lote = ttk.StringVar(value="uma")
+    frame_lote = ttk.Frame(frame_secao)
+    frame_lote.grid(row=2, column=1, columnspan=2, sticky="w", padx=5, pady=2)
+    ttk.Radiobutton(frame_lote, text="Só esta seção", variable=var_lote, value="uma").pack(side="left", padx=(0, 8))
+    ttk.Radiobutton(frame_lote, text="Todas, pelo sumário do PDF", variable=var_lote, value="sumario").pack(side="left", padx=(0, 8))
+    ttk.Radiobutton(frame_lote, text="Todas, por manifesto JSON", variable=var_lote, value="manifesto").pack(side="left")
 
-# ---------------------- Ação 2 ----------------------
-frame_pasta = ttk.Labelframe(root, text="Pasta PDFs Parcionados", padding=10)
-entry_pdfs_parcionados = ttk.Entry(frame_pasta, width=50)
-entry_pdfs_parcionados.pack(side="left", padx=5, pady=5, fill="x", expand=True)
-ttk.Button(frame_pasta, text="Selecionar", bootstyle=SECONDARY, command=escolher_pasta).pack(side="left", padx=5)
+    frame_pdf = ttk.Labelframe(root, text="PDF Bruto (ação 1)", padding=10)
+    entry_pdf_bruto = ttk.Entry(frame_pdf, width=50)
+    entry_pdf_bruto.pack(side="left", padx=5, pady=5, fill="x", expand=True)
+    ttk.Button(frame_pdf, text="Selecionar", bootstyle=SECONDARY, command=escolher_pdf).pack(side="left", padx=5)
 
-def atualizar_nome_secao(event=None):
-    """Atualiza o nome da seção com base no PDF selecionado"""
-    file_choice = combo_files.get()
-    if file_choice:
-        section_name = os.path.splitext(file_choice)[0]
-        entry_section.delete(0, "end")
-        entry_section.insert(0, section_name)
+    # ---------------------- Ação 2 ----------------------
+    frame_pasta = ttk.Labelframe(root, text="Pasta PDFs Parcionados", padding=10)
+    entry_pdfs_parcionados = ttk.Entry(frame_pasta, width=50)
+    entry_pdfs_parcionados.pack(side="left", padx=5, pady=5, fill="x", expand=True)
+    ttk.Button(frame_pasta, text="Selecionar", bootstyle=SECONDARY, command=escolher_pasta).pack(side="left", padx=5)
 
-frame_arquivos = ttk.Labelframe(root, text="Escolha o PDF para processar (ação 2)", padding=10)
-combo_files = ttk.Combobox(frame_arquivos, width=50, state="readonly")
-combo_files.pack(fill="x", padx=5, pady=5)
-combo_files.bind("<<ComboboxSelected>>", atualizar_nome_secao)
+    frame_arquivos = ttk.Labelframe(root, text="Escolha o PDF para processar (ação 2)", padding=10)
+    combo_files = ttk.Combobox(frame_arquivos, width=50, state="readonly")
+    combo_files.pack(fill="x", padx=5, pady=5)
+    combo_files.bind("<<ComboboxSelected>>", atualizar_nome_secao)
+    ttk.Label(frame_arquivos, text="Começar do estágio:").pack(anchor="w", padx=5)
+    combo_start_stage = ttk.Combobox(frame_arquivos, width=20, state="readonly", values=["início", "pproc", "silver"])
+    combo_start_stage.set("início")
+    combo_start_stage.pack(anchor="w", padx=5, pady=5)
 
-# ---------------------- Ação 3 ----------------------
-frame_s3 = ttk.Labelframe(root, text="Envio para Amazon S3 (ação 3)", padding=10)
-ttk.Label(frame_s3, text="Pasta no S3 (dentro do bucket):").grid(row=0, column=0, sticky="w", pady=4)
-entry_s3_folder = ttk.Entry(frame_s3, width=48)
-entry_s3_folder.grid(row=0, column=1, padx=5, pady=4)
+    # ---------------------- Ação 3 ----------------------
+    frame_s3 = ttk.Labelframe(root, text="Envio para Amazon S3 (ação 3)", padding=10)
+    ttk.Label(frame_s3, text="Pasta no S3 (dentro do bucket):").grid(row=0, column=0, sticky="w", pady=4)
+    entry_s3_folder = ttk.Entry(frame_s3, width=48)
+    entry_s3_folder.grid(row=0, column=1, padx=5, pady=4)
 
-ttk.Label(frame_s3, text="Arquivo local (JSON):").grid(row=1, column=0, sticky="w", pady=4)
-combo_files_s3 = ttk.Combobox(frame_s3, width=48, state="readonly")
-combo_files_s3.grid(row=1, column=1, padx=5, pady=4)
-ttk.Button(frame_s3, text="Selecionar arquivo", bootstyle=SECONDARY, command=escolher_json).grid(row=1, column=2, padx=5)
+    ttk.Label(frame_s3, text="Arquivo ou pasta local:").grid(row=1, column=0, sticky="w", pady=4)
+    combo_files_s3 = ttk.Combobox(frame_s3, width=48, state="readonly")
+    combo_files_s3.grid(row=1, column=1, padx=5, pady=4)
+    ttk.Button(frame_s3, text="Selecionar arquivo", bootstyle=SECONDARY, command=escolher_json).grid(row=1, column=2, padx=5)
+    ttk.Button(frame_s3, text="Selecionar pasta", bootstyle=SECONDARY, command=escolher_pasta_s3).grid(row=1, column=3, padx=5)
 
-ttk.Label(frame_s3, text="Nome no S3 (arquivo):").grid(row=2, column=0, sticky="w", pady=4)
-entry_filename = ttk.Entry(frame_s3, width=48)
-entry_filename.grid(row=2, column=1, padx=5, pady=4)
+    ttk.Label(frame_s3, text="Nome no S3 (arquivo):").grid(row=2, column=0, sticky="w", pady=4)
+    entry_filename = ttk.Entry(frame_s3, width=48)
+    entry_filename.grid(row=2, column=1, padx=5, pady=4)
 
-# ---------------------- Botão executar ----------------------
-btn_executar = ttk.Button(root, text="Executar", bootstyle=SUCCESS, command=executar)
-btn_executar.pack(pady=18)
+    # ---------------------- Botão executar ----------------------
+    btn_executar = ttk.Button(root, text="Executar", bootstyle=SUCCESS, command=executar)
+    btn_executar.pack(pady=18)
 
-status_label = ttk.Label(root, text="", anchor="center")
-status_label.pack(pady=(0, 12))
+    status_label = ttk.Label(root, text="", anchor="center")
+    status_label.pack(pady=(0, 12))
 
 
 
 
-# entry_serial.insert(0, "10317674") ## TESTE !!!! apagar depois
-# entry_first.insert(0, "51") ## TESTE !!!! apagar depois
-# entry_last.insert(0, "56") ## TESTE !!!! apagar depois
-# entry_section.insert(0, "installation") ## TESTE !!!! apagar depois
+    # entry_serial.insert(0, "10317674") ## TESTE !!!! apagar depois
+    # entry_first.insert(0, "51") ## TESTE !!!! apagar depois
+    # entry_last.insert(0, "56") ## TESTE !!!! apagar depois
+    # entry_section.insert(0, "installation") ## TESTE !!!! apagar depois
 
 
 
 
 
-mostrar_frame_acao()
-root.mainloop()
+    mostrar_frame_acao()
+    root.mainloop()
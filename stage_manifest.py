@@ -0,0 +1,77 @@
+# stage_manifest.py
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+
+from structured_output import write_json_atomic
+
+# Estágios da pipeline, na ordem
+STAGES = ("render", "analyze", "raw", "pproc", "silver")
+# Estágios a partir dos quais dá para reexecutar usando os artefatos já gravados em results/
+START_STAGES = ("pproc", "silver")
+
+
+def fingerprint(*parts):
+    """Hash estável dos insumos de um estágio (hashes de arquivo, prompts, modelos, parâmetros)."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def content_hash(obj):
+    """Hash do conteúdo de um artefato já em memória (independe de como foi formatado no disco)."""
+    payload = json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def forced_stages(start_stage):
+    """Estágios que devem ser refeitos mesmo com fingerprint igual (do `start_stage` em diante)."""
+    if start_stage is None:
+        return set()
+    if start_stage not in STAGES:
+        raise ValueError(f"Estágio inválido: {start_stage} (use {', '.join(STAGES)})")
+    return set(STAGES[STAGES.index(start_stage):])
+
+
+class StageManifest:
+    """
+    Manifesto de um documento, no estilo make: para cada estágio, a fingerprint
+    dos insumos com que ele rodou e o hash do artefato que produziu.
+
+    A fingerprint de um estágio inclui o hash do artefato do estágio anterior,
+    então mudar um prompt invalida aquele estágio e, em cascata, só os seguintes.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.stages = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.stages = json.load(f).get("stages", {})
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"⚠️ Manifesto ilegível ({self.path}): {e}. Todos os estágios serão refeitos.")
+
+    def fresh(self, stage, stage_fingerprint):
+        """Registro do estágio se ele já rodou com esta fingerprint; senão None."""
+        entry = self.stages.get(stage)
+        if entry and entry["fingerprint"] == stage_fingerprint:
+            return entry
+        return None
+
+    def artifact_hash(self, stage):
+        entry = self.stages.get(stage)
+        return entry["artifact_hash"] if entry else None
+
+    def record(self, stage, stage_fingerprint, artifact_hash, artifact=None, **meta):
+        with self._lock:
+            self.stages[stage] = {
+                "fingerprint": stage_fingerprint,
+                "artifact": None if artifact is None else str(artifact),
+                "artifact_hash": artifact_hash,
+                "meta": meta,
+                "ts": time.time(),
+            }
+            write_json_atomic({"stages": self.stages}, self.path)
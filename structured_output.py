@@ -0,0 +1,347 @@
+# structured_output.py
+import json
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+
+from tracing import traced
+from windowed import merge_json
+
+# Esquema pedido ao pproc/silver. As seções do manual viram chaves livres (snake_case),
+# então o esquema não pode ser estrito: ele fixa o objeto de nível superior e o bloco
+# general_information, e o modo JSON garante que a saída seja JSON válido.
+DOCUMENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "general_information": {
+            "type": "object",
+            "properties": {
+                "customer": {"type": "string"},
+                "machine_serial_number": {"type": "string"},
+                "machine_manufacturer": {"type": "string"},
+                "machine_type": {"type": "string"},
+                "document_type": {"type": "string"},
+            },
+        },
+    },
+    "required": ["general_information"],
+    "additionalProperties": True,
+}
+
+# Novas chamadas pedindo só as seções quebradas, antes de desistir delas
+STRUCTURED_RETRIES = 2
+
+KEY = re.compile(r'^\s*"((?:[^"\\]|\\.)*)"\s*:')
+
+
+def structured_enabled(value=None):
+    """Saída estruturada ligada? Padrão pela variável STRUCTURED_OUTPUT (1)."""
+    if value is not None:
+        return value
+    return os.getenv("STRUCTURED_OUTPUT", "1").lower() not in ("0", "false", "no")
+
+
+def text_format(name):
+    """Parâmetro `text` da Responses API pedindo JSON no formato de DOCUMENT_SCHEMA."""
+    return {"format": {"type": "json_schema", "name": name, "schema": DOCUMENT_SCHEMA, "strict": False}}
+
+
+class SectionParser:
+    """
+    Parser incremental do objeto JSON de nível superior, seção a seção.
+
+    Recebe o texto em pedaços (`feed`) conforme a resposta chega. Cada seção
+    (par chave/valor de nível superior) é decodificada assim que termina, então
+    um erro de sintaxe invalida só aquela seção, e uma resposta cortada
+    preserva tudo o que veio antes do corte.
+    """
+
+    def __init__(self):
+        self.sections = {}
+        self.order = []        # chaves na ordem do documento, inclusive as quebradas
+        self.broken = {}       # chave -> texto da seção que não decodificou
+        self.unnamed = set()   # seções quebradas sem chave legível (nomes "#N" só para manter a ordem)
+        self.started = False   # achou o "{" inicial
+        self.closed = False    # achou o "}" final
+        self.trailing = False  # havia texto depois do "}" final
+        self.chars = 0
+        self._member = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._head = []        # texto antes do "{" inicial
+
+    def feed(self, chunk):
+        self.chars += len(chunk)
+        for ch in chunk:
+            if self.closed:
+                if not ch.isspace():
+                    self.trailing = True
+                continue
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self._depth = 1
+                else:
+                    self._head.append(ch)
+                continue
+
+            if self._in_string:
+                self._member.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if self._depth == 1 and ch in ",}":
+                self._finish_member()
+                if ch == "}":
+                    self._depth = 0
+                    self.closed = True
+                continue
+
+            self._member.append(ch)
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]" and self._depth > 1:
+                self._depth -= 1
+
+    def _key(self, text):
+        match = KEY.match(text)
+        try:
+            return json.loads(f'"{match.group(1)}"')
+        except (AttributeError, json.JSONDecodeError):
+            key = f"#{len(self.order)}"
+            self.unnamed.add(key)
+            return key
+
+    def _mark_broken(self, key, text):
+        self.broken[key] = text
+        if key not in self.order:
+            self.order.append(key)
+
+    def _finish_member(self):
+        text = "".join(self._member).strip()
+        self._member = []
+        if not text:
+            return
+        key = self._key(text)
+        try:
+            value = json.loads("{" + text + "}")[key]
+        except (json.JSONDecodeError, KeyError):
+            self._mark_broken(key, text)
+            return
+        if key in self.sections:
+            self.sections[key] = merge_json(self.sections[key], value)
+        else:
+            self.sections[key] = value
+            self.order.append(key)
+
+    def close(self):
+        """
+        Fim da resposta: uma seção sem fechamento conta como quebrada. Se o corte
+        veio antes de a chave terminar, basta pedir o que vem depois da última seção.
+        """
+        text = "".join(self._member).strip()
+        self._member = []
+        if self.started and not self.closed and KEY.match(text):
+            self._mark_broken(self._key(text), text)
+        return self
+
+    @property
+    def truncated(self):
+        return self.started and not self.closed
+
+    @property
+    def valid(self):
+        head = self.head.strip()
+        return self.started and self.closed and not self.broken and not self.trailing and not head
+
+    @property
+    def head(self):
+        """Texto antes do "{" inicial (a resposta inteira, se não veio objeto JSON)."""
+        return "".join(self._head)
+
+    def last_key(self):
+        """Última seção decodificada (ponto de continuação de uma resposta cortada)."""
+        complete = [key for key in self.order if key in self.sections]
+        return complete[-1] if complete else None
+
+
+def repair_instruction(broken, after=None):
+    """Instrução de nova tentativa pedindo só as seções quebradas (e, se cortada, o restante)."""
+    parts = []
+    if broken:
+        names = ", ".join(f"`{key}`" for key in broken)
+        parts.append(f"Your previous answer had invalid JSON in these top-level sections: {names}.")
+    if after is not None:
+        parts.append(f"Your previous answer was cut off after the top-level section `{after}`.")
+    wanted = []
+    if broken:
+        wanted.append("the sections listed above, using exactly the same keys")
+    if after is not None:
+        wanted.append(f"every top-level section that comes after `{after}` in the document")
+    parts.append(
+        f"Output ONLY a valid JSON object with {' and '.join(wanted)}. "
+        f"Do not repeat any other section. Follow all the previous extraction rules."
+    )
+    return " ".join(parts)
+
+
+def invalid_json(obj):
+    """É o marcador {"error": "invalid_json", "raw": ...} de uma resposta sem JSON aproveitável?"""
+    return isinstance(obj, dict) and obj.get("error") == "invalid_json"
+
+
+def assemble(order, sections, broken):
+    """
+    Objeto final na ordem do documento. Seções que continuaram quebradas após as
+    novas tentativas ficam marcadas como no load_safe_json, sem perder as demais.
+    """
+    result = {}
+    for key in order:
+        if key in sections:
+            result[key] = sections[key]
+        elif key in broken:
+            result[key] = {"error": "invalid_json", "raw": broken[key]}
+    return result
+
+
+class StructuredStats:
+    """Taxa de JSON inválido e de seções refeitas, por estágio (pproc, silver...)."""
+
+    def __init__(self):
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def _counts(self, stage):
+        return self.counts.setdefault(stage, Counter())
+
+    def record_response(self, stage, valid):
+        with self._lock:
+            counts = self._counts(stage)
+            counts["responses"] += 1
+            counts["invalid"] += not valid
+
+    def record_retry(self, stage, sections):
+        with self._lock:
+            self._counts(stage)["retried_sections"] += sections
+
+    def record_lost(self, stage, sections):
+        with self._lock:
+            self._counts(stage)["lost_sections"] += sections
+
+    def record_lost_document(self, stage):
+        with self._lock:
+            self._counts(stage)["lost_documents"] += 1
+
+    def summary(self):
+        with self._lock:
+            return {
+                stage: {
+                    **{field: counts[field] for field in ("responses", "invalid", "retried_sections", "lost_sections",
+                                                          "lost_documents")},
+                    "invalid_rate": counts["invalid"] / max(counts["responses"], 1),
+                }
+                for stage, counts in self.counts.items()
+            }
+
+    def print_summary(self):
+        for stage, counts in self.summary().items():
+            print(f"JSON {stage}: {counts['responses']} respostas, {counts['invalid']} inválidas "
+                  f"({counts['invalid_rate']:.0%}), {counts['retried_sections']} seções refeitas, "
+                  f"{counts['lost_sections']} perdidas, {counts['lost_documents']} documentos sem JSON")
+
+
+class PartialFile:
+    """
+    Arquivo escrito aos poucos em `<path>.part` (visível durante o streaming) e
+    renomeado atomicamente para `path` no `commit`: quem lê `path` nunca vê um
+    JSON pela metade.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.part = self.path.with_name(self.path.name + ".part")
+        self.part.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.part, "w", encoding="utf-8", buffering=1)
+
+    def write(self, text):
+        self._file.write(text)
+
+    def rewrite(self, obj):
+        """Troca o conteúdo já escrito pelo objeto `obj` (ex.: após consertar seções)."""
+        self._file.seek(0)
+        self._file.truncate()
+        json.dump(obj, self._file, ensure_ascii=False)
+
+    def commit(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.part, self.path)
+        return str(self.path)
+
+    def discard(self):
+        self._file.close()
+        self.part.unlink(missing_ok=True)
+
+
+@traced("write_json_atomic", "json")
+def write_json_atomic(obj, path):
+    """json.dump em `path` via arquivo temporário e rename atômico."""
+    partial = PartialFile(path)
+    try:
+        partial.rewrite(obj)
+    except Exception:
+        partial.discard()
+        raise
+    return partial.commit()
+
+
+class StreamStats:
+    """Tempo até o primeiro byte e vazão das respostas em streaming, por estágio."""
+
+    def __init__(self):
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, ttfb, seconds, chars, output_tokens=None):
+        with self._lock:
+            self.calls.setdefault(stage, []).append((ttfb, seconds, chars, output_tokens))
+
+    def summary(self):
+        with self._lock:
+            result = {}
+            for stage, calls in self.calls.items():
+                ttfbs = [ttfb for ttfb, _, _, _ in calls if ttfb is not None]
+                seconds = sum(s for _, s, _, _ in calls)
+                # vazão depois do primeiro byte: é o que cresce com o tamanho da saída
+                streaming = sum(s - (ttfb or 0) for ttfb, s, _, _ in calls)
+                chars = sum(c for _, _, c, _ in calls)
+                tokens = sum(t or 0 for _, _, _, t in calls)
+                result[stage] = {
+                    "responses": len(calls),
+                    "ttfb_mean": sum(ttfbs) / len(ttfbs) if ttfbs else None,
+                    "ttfb_max": max(ttfbs) if ttfbs else None,
+                    "seconds": seconds,
+                    "chars": chars,
+                    "output_tokens": tokens,
+                    "chars_per_second": chars / streaming if streaming > 0 else 0.0,
+                    "tokens_per_second": tokens / streaming if streaming > 0 else 0.0,
+                }
+            return result
+
+    def print_summary(self):
+        for stage, stats in self.summary().items():
+            ttfb = f"{stats['ttfb_mean']:.1f}s (máx {stats['ttfb_max']:.1f}s)" if stats["ttfb_mean"] is not None else "-"
+            print(f"Streaming {stage}: {stats['responses']} respostas, primeiro byte em {ttfb}, "
+                  f"{stats['chars'] / 1024:.0f} KB em {stats['seconds']:.0f}s — "
+                  f"{stats['chars_per_second']:.0f} caracteres/s, {stats['tokens_per_second']:.0f} tokens/s")
@@ -0,0 +1,6 @@
+# conftest.py
+import sys
+from pathlib import Path
+
+# os módulos do projeto ficam na raiz, como nos benchmarks
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,33 @@
+# test_artifacts.py
+import json
+
+from artifacts import ArtifactWriter
+
+
+def test_on_written_runs_only_after_a_successful_write(tmp_path):
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("", encoding="utf-8")
+    written = []
+
+    writer = ArtifactWriter()
+    writer.append(tmp_path / "raw" / "raw.jsonl", {"filename": "a.pdf"}, on_written=lambda: written.append("raw"))
+    writer.write(tmp_path / "pproc.json", {"ok": True}, on_written=lambda: written.append("pproc"))
+    # o "diretório" pai é um arquivo: a gravação falha
+    writer.append(blocker / "raw.jsonl", {"filename": "b.pdf"}, on_written=lambda: written.append("broken"))
+    writer.close()
+
+    assert written == ["raw", "pproc"]
+    assert [path for path, _ in writer.errors] == [blocker / "raw.jsonl"]
+    assert json.loads((tmp_path / "raw" / "raw.jsonl").read_text(encoding="utf-8")) == {"filename": "a.pdf"}
+
+
+def test_failing_callback_is_reported(tmp_path):
+    def record():
+        raise OSError("manifesto somente leitura")
+
+    writer = ArtifactWriter()
+    writer.write(tmp_path / "pproc.json", {"ok": True}, on_written=record)
+    writer.close()
+
+    assert len(writer.errors) == 1
+    assert isinstance(writer.errors[0][1], OSError)
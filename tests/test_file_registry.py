@@ -0,0 +1,117 @@
+# test_file_registry.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from file_registry import FileRegistry, LocalFileStore
+
+
+class SlowStore(LocalFileStore):
+    """LocalFileStore com envio lento, contando envios e quantos estiveram em voo ao mesmo tempo."""
+
+    def __init__(self, root, delay=0.2):
+        super().__init__(root)
+        self.delay = delay
+        self.creates = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def create(self, file, purpose):
+        with self._lock:
+            self.creates += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            return super().create(file, purpose)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def make_pdf(path, content):
+    path.write_bytes(b"%PDF-1.4\n" + content)
+    return str(path)
+
+
+def test_same_pdf_is_uploaded_once(tmp_path):
+    store = LocalFileStore(tmp_path / "store")
+    registry = FileRegistry(store, path=tmp_path / "registry.json")
+    pdf = make_pdf(tmp_path / "secao.pdf", b"a")
+
+    first = registry.get_or_upload(pdf)
+    assert registry.get_or_upload(pdf) == first
+    assert (registry.uploads, registry.reuses) == (1, 1)
+
+    # outra execução (registro relido do disco) também reaproveita o envio
+    again = FileRegistry(store, path=tmp_path / "registry.json")
+    assert again.get_or_upload(pdf) == first
+    assert again.uploads == 0
+    assert len(store.list()) == 1
+
+
+def test_concurrent_calls_for_the_same_pdf_share_one_upload(tmp_path):
+    store = SlowStore(tmp_path / "store")
+    registry = FileRegistry(store, path=tmp_path / "registry.json")
+    pdf = make_pdf(tmp_path / "secao.pdf", b"a")
+
+    with ThreadPoolExecutor(8) as pool:
+        file_ids = list(pool.map(lambda _: registry.get_or_upload(pdf), range(8)))
+
+    assert len(set(file_ids)) == 1
+    assert store.creates == 1
+    assert (registry.uploads, registry.reuses) == (1, 7)
+
+
+def test_different_pdfs_upload_in_parallel(tmp_path):
+    store = SlowStore(tmp_path / "store", delay=0.3)
+    registry = FileRegistry(store, path=tmp_path / "registry.json")
+    pdfs = [make_pdf(tmp_path / f"janela_{i}.pdf", bytes([i])) for i in range(4)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(4) as pool:
+        file_ids = list(pool.map(registry.get_or_upload, pdfs))
+
+    assert len(set(file_ids)) == 4
+    assert store.max_in_flight == 4
+    assert time.perf_counter() - start < 4 * 0.3
+
+
+def test_expired_file_is_deleted_and_uploaded_again(tmp_path):
+    store = LocalFileStore(tmp_path / "store")
+    registry = FileRegistry(store, path=tmp_path / "registry.json", ttl_hours=1)
+    pdf = make_pdf(tmp_path / "secao.pdf", b"a")
+
+    old_id = registry.get_or_upload(pdf)
+    for entry in registry.entries.values():
+        entry["uploaded_at"] -= 2 * 3600
+
+    new_id = registry.get_or_upload(pdf)
+    assert new_id != old_id
+    assert registry.uploads == 2
+    assert [f.id for f in store.list()] == [new_id]
+
+
+def test_file_missing_on_server_is_uploaded_again(tmp_path):
+    store = LocalFileStore(tmp_path / "store")
+    pdf = make_pdf(tmp_path / "secao.pdf", b"a")
+    old_id = FileRegistry(store, path=tmp_path / "registry.json").get_or_upload(pdf)
+    store.delete(old_id)
+
+    registry = FileRegistry(store, path=tmp_path / "registry.json")
+    new_id = registry.get_or_upload(pdf)
+    assert new_id != old_id
+    assert registry.uploads == 1
+
+
+def test_cleanup_removes_stale_files(tmp_path):
+    store = LocalFileStore(tmp_path / "store")
+    registry = FileRegistry(store, path=tmp_path / "registry.json", ttl_hours=1)
+    stale = registry.get_or_upload(make_pdf(tmp_path / "a.pdf", b"a"))
+    fresh = registry.get_or_upload(make_pdf(tmp_path / "b.pdf", b"b"))
+    registry.entries[next(sha for sha, e in registry.entries.items() if e["file_id"] == stale)]["uploaded_at"] -= 7200
+
+    assert registry.cleanup() == 1
+    assert [f.id for f in store.list()] == [fresh]
+    assert [e["file_id"] for e in FileRegistry(store, path=tmp_path / "registry.json").entries.values()] == [fresh]
@@ -0,0 +1,33 @@
+# test_image_encoder.py
+import io
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from image_encoder import DEFAULT_PRESET, encode_image, image_size, snap_to_tiles, vision_tokens
+
+
+def page(width, height):
+    img = Image.new("RGB", (width, height), "white")
+    img.paste((0, 0, 0), (100, 100, width - 100, height - 100))
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_snap_drops_a_row_of_tiles_only_when_it_is_close():
+    assert vision_tokens(*snap_to_tiles(768, 1100)) < vision_tokens(768, 1100)
+    assert snap_to_tiles(768, 1100)[1] <= 1024
+    # 994 px já cabe em 2 tiles; 1300 px precisaria de uma redução de mais de 15%
+    assert snap_to_tiles(768, 994) == (768, 994)
+    assert snap_to_tiles(768, 1300) == (768, 1300)
+
+
+def test_default_preset_saves_tokens_and_original_opts_out():
+    assert DEFAULT_PRESET == "png"
+    rendered = page(1700, 2400)
+    data, mime = encode_image(rendered)
+    assert mime == "image/png"
+    assert vision_tokens(*image_size(data)) < vision_tokens(1700, 2400)
+    assert encode_image(rendered, "original") == (rendered, "image/png")
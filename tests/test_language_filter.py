@@ -0,0 +1,48 @@
+# test_language_filter.py
+import pytest
+
+pytest.importorskip("fitz")
+
+from language_filter import detect_language, non_english_pages
+
+PARTS_TABLE = """
+Item Part No. Qty Description
+1 A-1234 2 Hex bolt M8 x 25
+2 B-5678 4 Flat washer 8 mm
+3 C-9012 1 Drive belt
+4 D-3456 1 Tensioner pulley
+5 E-7890 2 Bearing 6204 2RS
+6 F-1122 1 Cover gasket
+Spec Value Unit
+Torque 25 Nm
+Belt tension 350 N
+Oil capacity 1.2 l
+Note: Part No. E-7890 replaces No. E-7800.
+"""
+
+PORTUGUESE = """
+Antes de abrir a tampa, desligue a máquina e espere que o motor pare. Retire os quatro parafusos
+da tampa e verifique a tensão da correia. Se a correia estiver gasta, ela deve ser substituída
+por uma nova do mesmo tipo. Depois de montar a tampa, confira que não há ferramentas dentro da
+máquina e que os parafusos estão apertados com o torque indicado na tabela.
+"""
+
+GERMAN = """
+Vor dem Öffnen der Abdeckung muss die Maschine ausgeschaltet werden. Die vier Schrauben der
+Abdeckung lösen und die Spannung des Riemens prüfen. Wenn der Riemen verschlissen ist, wird er
+durch einen neuen ersetzt. Nach der Montage ist zu prüfen, dass sich kein Werkzeug in der
+Maschine befindet und die Schrauben mit dem Drehmoment aus der Tabelle angezogen sind.
+"""
+
+
+def test_english_parts_table_is_not_dropped():
+    lang, confidence, _ = detect_language(PARTS_TABLE)
+    assert lang in ("en", "unknown")
+    assert non_english_pages([PARTS_TABLE]) == {}
+
+
+@pytest.mark.parametrize("text, expected", [(PORTUGUESE, "pt"), (GERMAN, "de")])
+def test_foreign_prose_is_detected(text, expected):
+    lang, confidence, _ = detect_language(text)
+    assert lang == expected
+    assert list(non_english_pages(["Remove the cover and check the belt. " * 5, text])) == [1]
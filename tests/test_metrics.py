@@ -0,0 +1,29 @@
+# test_metrics.py
+from metrics import ApiMetrics
+
+
+def test_retries_are_summed_per_call():
+    metrics = ApiMetrics()
+    # primeira resposta sem JSON e dois reparos: uma chamada original e dois retries
+    metrics.record("pproc", "gpt-4.1", latency=1.0, retries=0, document="doc")
+    metrics.record("pproc", "gpt-4.1", latency=1.0, retries=1, document="doc")
+    metrics.record("pproc", "gpt-4.1", latency=1.0, retries=1, document="doc")
+
+    assert metrics.summary()["stages"]["pproc"]["retries"] == 2
+    assert 'pipeline_api_retries_total{document="doc",model="gpt-4.1",stage="pproc"} 2' in metrics.prometheus()
+
+
+def test_latency_is_a_summary_family():
+    metrics = ApiMetrics()
+    metrics.record("vision", "gpt-4.1-mini", latency=1.5, document="doc")
+    metrics.record("vision", "gpt-4.1-mini", latency=0.5, document="doc")
+    lines = metrics.prometheus().splitlines()
+
+    assert "# TYPE pipeline_api_latency_seconds summary" in lines
+    assert sum(line.startswith("# TYPE pipeline_api_latency_seconds") for line in lines) == 1
+    labels = '{document="doc",model="gpt-4.1-mini",stage="vision"}'
+    assert f"pipeline_api_latency_seconds_sum{labels} 2.0" in lines
+    assert f"pipeline_api_latency_seconds_count{labels} 2" in lines
+    # cada série vem logo depois do TYPE da sua família
+    type_line = lines.index("# TYPE pipeline_api_latency_seconds summary")
+    assert lines[type_line + 1].startswith("pipeline_api_latency_seconds_sum")
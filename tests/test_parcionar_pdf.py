@@ -0,0 +1,37 @@
+# test_parcionar_pdf.py
+import json
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from parcionar_pdf import parcionar_lote, sections_from_manifest, sections_from_toc
+
+
+@pytest.fixture
+def manual(tmp_path):
+    path = tmp_path / "manual.pdf"
+    with fitz.open() as doc:
+        for i in range(6):
+            doc.new_page().insert_text((72, 72), f"page {i + 1}")
+        doc.set_toc([[1, "Maintenance", 1], [1, "Maintenance", 3], [1, "maintenance", 5]])
+        doc.save(path)
+    return path
+
+
+def test_repeated_titles_do_not_overwrite_each_other(manual, tmp_path):
+    sections = sections_from_toc(manual)
+    assert [name for name, _ in sections] == ["Maintenance", "Maintenance (2)", "maintenance (3)"]
+
+    outputs = parcionar_lote(sections, manual, tmp_path / "out", workers=1)
+    assert len(set(outputs)) == 3
+    for output, (_, (first, last)) in zip(outputs, sections):
+        with fitz.open(output) as doc:
+            assert doc.page_count == last - first + 1
+            assert doc[0].get_text().strip() == f"page {first}"
+
+
+def test_manifest_names_that_collide_as_filenames(tmp_path):
+    path = tmp_path / "secoes.json"
+    path.write_text(json.dumps({"A/B": [1, 2], "A B": [3, 4], "A B (2)": [5, 6]}), encoding="utf-8")
+    assert [name for name, _ in sections_from_manifest(path)] == ["A B", "A B (2)", "A B (2) (2)"]
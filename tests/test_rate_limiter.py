@@ -0,0 +1,130 @@
+# test_rate_limiter.py
+#
+# A análise de páginas contra o servidor falso (benchmarks/fake_openai.py), que aplica
+# limites de RPM/TPM em janelas de `WINDOW` segundos e devolve 429 com retry-after.
+import concurrent.futures
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+from openai import AsyncOpenAI
+
+import pipeline_extracao as pe
+from analysis_engine import AnalysisEngine
+from fake_openai import FakeOpenAIServer
+from rate_limiter import AdaptiveRateLimiter
+
+WINDOW = 2.0
+PAGE_TEXT = "Remove the four screws and lift the cover. Check the belt tension. " * 20
+PAGE_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010802000000907753de"
+    "0000000c4944415408d763f8ffff3f0005fe02fea7d5a0b30000000049454e44ae426082"
+)
+
+
+def analyze(server, pages, concurrency, limiter=None, sdk_retries=0):
+    """Analisa `pages` páginas pelo motor assíncrono e devolve quantas falharam."""
+    aclient = AsyncOpenAI(base_url=server.base_url, api_key="fake", max_retries=sdk_retries)
+    with AnalysisEngine(concurrency, client=aclient, limiter=limiter) as engine:
+        futures = [pe.submit_doc_image(engine, PAGE_PNG, f"{i} {PAGE_TEXT}") for i in range(pages)]
+        concurrent.futures.wait(futures)
+    return sum(future.exception() is not None for future in futures)
+
+
+def peak_window_usage(log, window):
+    """Maior número de requisições e de tokens tentados (aceitos ou não) em qualquer janela."""
+    peak_requests = peak_tokens = 0
+    for i, (start, *_) in enumerate(log):
+        inside = [entry for entry in log[i:] if entry[0] - start < window]
+        peak_requests = max(peak_requests, len(inside))
+        peak_tokens = max(peak_tokens, sum(tokens for _, tokens, _, _ in inside))
+    return peak_requests, peak_tokens
+
+
+@pytest.mark.parametrize("rpm, tpm", [(600, 50_000_000), (100_000, 1_200_000)], ids=["rpm", "tpm"])
+def test_adaptive_stays_under_limits_with_far_fewer_429s(rpm, tpm):
+    pages, concurrency = 40, 16
+
+    with FakeOpenAIServer(rpm, tpm, latency=0.05, window=WINDOW) as server:
+        baseline_failed = analyze(server, pages, concurrency, sdk_retries=10)
+        baseline = server.stats()
+
+    with FakeOpenAIServer(rpm, tpm, latency=0.05, window=WINDOW) as server:
+        limiter = AdaptiveRateLimiter(rpm, tpm, max_concurrency=concurrency)
+        assert analyze(server, pages, concurrency, limiter=limiter) == 0
+        adaptive = server.stats()
+        peak_requests, peak_tokens = peak_window_usage(server.log, WINDOW)
+
+    assert baseline_failed == 0
+    # sem limitador, a concorrência fixa estoura a janela e vive de retries
+    assert baseline["rate_limited"] >= 10
+    assert adaptive["rate_limited"] * 5 <= baseline["rate_limited"]
+    # o que o limitador envia cabe no limite da janela; só as poucas requisições que voltaram 429 passam dele
+    scale = WINDOW / 60
+    overshoot = adaptive["rate_limited"] + 1
+    assert peak_requests <= rpm * scale + overshoot
+    assert peak_tokens <= tpm * scale + overshoot * max(tokens for _, tokens, _, _ in server.log)
+
+
+def test_retry_after_is_honoured():
+    # o limitador acha que pode 6000 RPM; o servidor só aceita 2 requisições a cada janela
+    with FakeOpenAIServer(rpm=60, tpm=50_000_000, latency=0.01, window=WINDOW) as server:
+        limiter = AdaptiveRateLimiter(6000, 50_000_000, max_concurrency=1)
+        assert analyze(server, 6, 1, limiter=limiter) == 0
+        log = list(server.log)
+
+    rejected = [i for i, (_, _, accepted, _) in enumerate(log) if not accepted]
+    assert rejected, "o servidor deveria ter devolvido 429"
+    for i in rejected:
+        rejected_at, _, _, retry_after = log[i]
+        # uma requisição por vez: a próxima só sai depois do retry-after informado
+        assert log[i + 1][0] - rejected_at >= retry_after - 0.02
+    assert limiter.rate_limited == len(rejected)
+
+
+def test_retry_after_pauses_every_caller():
+    limiter = AdaptiveRateLimiter(6000, 1_000_000, max_concurrency=4)
+    assert limiter.try_acquire(100) == 0
+
+    assert limiter.record_rate_limited({"retry-after-ms": "1500"}) == pytest.approx(1.5)
+    assert limiter.try_acquire(100) == pytest.approx(1.5, abs=0.05)
+
+    assert limiter.record_rate_limited({"retry-after": "3"}) == 3
+    assert limiter.try_acquire(100) == pytest.approx(3, abs=0.05)
+
+
+def test_pproc_429s_reach_the_limiter(monkeypatch, tmp_path):
+    # o client síncrono de verdade (openai_client), apontado para o servidor falso
+    fitz = pytest.importorskip("fitz")
+    pdf_path = tmp_path / "secao.pdf"
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), "Remove the cover.")
+        doc.save(pdf_path)
+
+    with FakeOpenAIServer(rpm=60, tpm=50_000_000, latency=0.01, window=WINDOW) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("FILE_REGISTRY_PATH", str(tmp_path / "openai_files.json"))
+        monkeypatch.setattr(pe, "client", None)
+        pe.file_registry.cache_clear()
+        limiter = AdaptiveRateLimiter(6000, 50_000_000, max_concurrency=1)
+        blocked = 0  # rejeições das requisições do "outro processo", que não passam pelo client
+        monkeypatch.setattr(pe, "model_limiter", lambda model, max_concurrency=1: limiter)
+        try:
+            assert pe.openai_client().max_retries == 0
+            for _ in range(3):
+                # outro processo da mesma conta esgota a janela: a chamada seguinte volta com 429
+                blocked += sum(not server.admit(0)[0] for _ in range(2))
+                assert not pe.invalid_json(pe.safe_pproc("pproc", str(pdf_path), "[]"))
+        finally:
+            pe.file_registry.cache_clear()
+        log = list(server.log)
+
+    rejected = sum(not accepted for _, _, accepted, _ in log) - blocked
+    # sem retries do SDK, cada 429 passou pelo limitador
+    assert rejected > 0
+    assert limiter.rate_limited == rejected
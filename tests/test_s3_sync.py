@@ -0,0 +1,72 @@
+# test_s3_sync.py
+#
+# sincronizar_pasta contra um S3 simulado pelo moto: objetos iguais não são reenviados.
+import json
+
+import pytest
+
+moto = pytest.importorskip("moto")
+
+import s3_upload
+
+BUCKET = "test-pipeline-extracao"
+PREFIX = "SN123/MANUAL"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_S3_BUCKET", BUCKET)
+    monkeypatch.delenv("AWS_ENDPOINT_URL", raising=False)
+    s3_upload.s3_client.cache_clear()
+    with moto.mock_aws():
+        client = s3_upload.s3_client()
+        client.create_bucket(Bucket=BUCKET)
+        puts = []
+        for operation in ("PutObject", "CreateMultipartUpload"):
+            client.meta.events.register(f"provide-client-params.s3.{operation}",
+                                        lambda params, **kwargs: puts.append(params["Key"]))
+        yield puts
+    s3_upload.s3_client.cache_clear()
+
+
+def write_silver(folder, name, steps):
+    data = {"general_information": {"machine_serial_number": "SN123"}, "maintenance": {"steps": steps}}
+    (folder / name).write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+
+@pytest.mark.parametrize("use_gzip", [False, True], ids=["plain", "gzip"])
+def test_second_sync_skips_unchanged_and_reuploads_changed(s3, tmp_path, use_gzip):
+    for i in range(4):
+        write_silver(tmp_path, f"silver_{i}.json", [{"step": 1, "text": f"check belt {i}"}])
+    keys = [f"{PREFIX}/silver_{i}.json" for i in range(4)]
+
+    first = s3_upload.sincronizar_pasta(tmp_path, PREFIX, use_gzip=use_gzip)
+    assert sorted(first["uploaded"]) == keys
+    assert sorted(s3) == keys
+
+    s3.clear()
+    second = s3_upload.sincronizar_pasta(tmp_path, PREFIX, use_gzip=use_gzip)
+    assert s3 == []
+    assert second["uploaded"] == [] and sorted(second["skipped"]) == keys
+    assert second["bytes"] == 0
+
+    write_silver(tmp_path, "silver_2.json", [{"step": 1, "text": "replace belt"}])
+    third = s3_upload.sincronizar_pasta(tmp_path, PREFIX, use_gzip=use_gzip)
+    assert s3 == [f"{PREFIX}/silver_2.json"]
+    assert third["uploaded"] == [f"{PREFIX}/silver_2.json"]
+    assert sorted(third["skipped"]) == [key for key in keys if not key.endswith("silver_2.json")]
+
+
+def test_object_without_source_md5_is_skipped_by_etag(s3, tmp_path):
+    # objeto enviado por outra ferramenta (sem o metadado source-md5), mesmo conteúdo
+    write_silver(tmp_path, "silver_0.json", [{"step": 1, "text": "check belt"}])
+    s3_upload.s3_client().put_object(Bucket=BUCKET, Key=f"{PREFIX}/silver_0.json",
+                                     Body=(tmp_path / "silver_0.json").read_bytes())
+    s3.clear()
+
+    result = s3_upload.sincronizar_pasta(tmp_path, PREFIX)
+    assert s3 == []
+    assert result["skipped"] == [f"{PREFIX}/silver_0.json"]
@@ -0,0 +1,46 @@
+# test_structured_output.py
+import pipeline_extracao as pe
+from structured_output import SectionParser
+
+
+def parsed(text):
+    parser = SectionParser()
+    parser.feed(text)
+    return parser.close()
+
+
+def fake_stream(monkeypatch, responses):
+    calls = []
+
+    def stream(stage, input_items, schema_name, estimated_tokens, sink=None, tags=None, retry=False):
+        calls.append(input_items)
+        return parsed(responses.pop(0))
+
+    monkeypatch.setattr(pe, "_stream_sections", stream)
+    return calls
+
+
+def test_broken_section_is_repaired_by_name(monkeypatch):
+    calls = fake_stream(monkeypatch, [
+        '{"general_information": {"customer": "ACME"}, "maintenance": {"steps": [1, }}',
+        '{"maintenance": {"steps": [1, 2]}}',
+    ])
+    result = pe.structured_response("pproc", [{"role": "user", "content": []}], "doc", 100)
+
+    assert result == {"general_information": {"customer": "ACME"}, "maintenance": {"steps": [1, 2]}}
+    assert "`maintenance`" in calls[1][-1]["content"][0]["text"]
+
+
+def test_broken_section_without_key_regenerates_the_document(monkeypatch):
+    first = '{"general_information": {"customer": "ACME"}, "mainten\\q": {"steps": [1]}}'
+    assert parsed(first).unnamed == {"#1"}
+    calls = fake_stream(monkeypatch, [
+        first,
+        '{"general_information": {"customer": "ACME"}, "maintenance": {"steps": [1]}}',
+    ])
+    input_items = [{"role": "user", "content": []}]
+    result = pe.structured_response("pproc", input_items, "doc", 100)
+
+    assert result == {"general_information": {"customer": "ACME"}, "maintenance": {"steps": [1]}}
+    # sem instrução de reparo citando "#1": a mesma entrada do documento inteiro
+    assert calls[1] == input_items
@@ -0,0 +1,165 @@
+# tracing.py
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# Desligado, `span` devolve sempre o mesmo contexto vazio: o custo é um teste de booleano
+_enabled = False
+_events = []
+_thread_names = {}
+_lock = threading.Lock()
+_origin = time.perf_counter()
+_NULL = contextlib.nullcontext()
+
+
+def tracing_enabled(value=None):
+    """Rastreamento ligado? Padrão pela variável PIPELINE_TRACE (0)."""
+    if value is not None:
+        return value
+    return os.getenv("PIPELINE_TRACE", "0").lower() in ("1", "true", "yes")
+
+
+def enable(value=True):
+    """Liga/desliga a coleta e descarta os spans de uma execução anterior."""
+    global _enabled, _origin
+    with _lock:
+        _events.clear()
+        _thread_names.clear()
+        _origin = time.perf_counter()
+        _enabled = value
+
+
+def enabled():
+    return _enabled
+
+
+def _track():
+    """
+    Trilha do span no trace: a thread atual ou, dentro do event loop, a task asyncio.
+    Chamadas concorrentes no mesmo loop se sobrepõem e precisam de trilhas separadas.
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return id(task), f"{threading.current_thread().name} / {task.get_name()}"
+    thread = threading.current_thread()
+    return thread.ident, thread.name
+
+
+class _Span:
+    __slots__ = ("name", "category", "args", "start")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        tid, track_name = _track()
+        event = {
+            "name": self.name,
+            "cat": self.category,
+            "ph": "X",
+            "ts": (self.start - _origin) * 1e6,
+            "dur": (end - self.start) * 1e6,
+            "pid": os.getpid(),
+            "tid": tid,
+        }
+        if exc_type is not None:
+            self.args = {**(self.args or {}), "error": exc_type.__name__}
+        if self.args:
+            event["args"] = self.args
+        with _lock:
+            _events.append(event)
+            _thread_names.setdefault(tid, track_name)
+        return False
+
+
+def span(name, category="pipeline", **args):
+    """Contexto que mede um trecho do caminho quente: `with span("render", page=3): ...`."""
+    if not _enabled:
+        return _NULL
+    return _Span(name, category, args)
+
+
+def traced(name=None, category="pipeline"):
+    """Decorador que envolve a função (síncrona ou async) em um span."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await fn(*args, **kwargs)
+                with _Span(span_name, category, None):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(span_name, category, None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary():
+    """Por span: chamadas, tempo total, médio, p95 e máximo (segundos), do maior total para o menor."""
+    with _lock:
+        events = list(_events)
+    durations = {}
+    for event in events:
+        durations.setdefault((event["cat"], event["name"]), []).append(event["dur"] / 1e6)
+    rows = []
+    for (category, name), values in durations.items():
+        values.sort()
+        rows.append({
+            "category": category,
+            "name": name,
+            "calls": len(values),
+            "total": sum(values),
+            "mean": sum(values) / len(values),
+            "p95": values[min(int(len(values) * 0.95), len(values) - 1)],
+            "max": values[-1],
+        })
+    return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+
+def print_summary():
+    rows = summary()
+    if not rows:
+        return
+    print(f"\n{'span':<28}{'chamadas':>9}{'total s':>10}{'média ms':>10}{'p95 ms':>10}{'máx ms':>10}")
+    for row in rows:
+        print(f"{row['category'] + '/' + row['name']:<28}{row['calls']:>9}{row['total']:>10.2f}"
+              f"{row['mean'] * 1000:>10.1f}{row['p95'] * 1000:>10.1f}{row['max'] * 1000:>10.1f}")
+
+
+def write_chrome_trace(path):
+    """Grava os spans no formato Trace Event (chrome://tracing, ui.perfetto.dev)."""
+    with _lock:
+        events = list(_events)
+        names = dict(_thread_names)
+    pid = os.getpid()
+    metadata = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "pipeline_extracao"}}]
+    metadata += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                 for tid, name in names.items()]
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+    return path
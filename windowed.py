@@ -0,0 +1,128 @@
+# windowed.py
+import concurrent.futures
+import json
+import os
+from pathlib import Path
+
+# PyMuPDF e parcionar_pdf só nas funções que abrem o PDF: structured_output usa merge_json
+# e não deve carregá-los
+
+# Páginas por janela do pproc/silver (0 = seção inteira em uma chamada)
+WINDOW_PAGES = 0
+# Janelas processadas ao mesmo tempo
+WINDOW_CONCURRENCY = 4
+
+# Valores que o modelo devolve quando não achou o campo naquela janela
+EMPTY_VALUES = ("", "[detect from content]", "n/a", "unknown", "not specified")
+
+
+def window_settings(pages=None, concurrency=None):
+    """(páginas por janela, janelas em paralelo); padrão pelas variáveis PPROC_WINDOW_PAGES e PPROC_WINDOW_CONCURRENCY."""
+    if pages is None:
+        pages = int(os.getenv("PPROC_WINDOW_PAGES", WINDOW_PAGES))
+    if concurrency is None:
+        concurrency = int(os.getenv("PPROC_WINDOW_CONCURRENCY", WINDOW_CONCURRENCY))
+    return pages, max(concurrency, 1)
+
+
+def plan_windows(pdf_path, window_pages):
+    """
+    Intervalos [primeira, ultima] (base 1) das janelas do PDF, ou None quando
+    o modo por janelas está desligado ou o PDF cabe em uma janela só.
+    """
+    import fitz  # PyMuPDF
+    from parcionar_pdf import page_range, split_range
+
+    if window_pages <= 0:
+        return None
+    with fitz.open(pdf_path) as doc:
+        total_pages = doc.page_count
+    if total_pages <= window_pages:
+        return None
+    return split_range(page_range([1, total_pages], total_pages), window_pages)
+
+
+def write_windows(pdf_path, windows, output_dir):
+    """Salva um PDF por janela em `output_dir` e devolve os caminhos, na ordem das janelas."""
+    import fitz  # PyMuPDF
+    from parcionar_pdf import write_page_range
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    with fitz.open(pdf_path) as doc:
+        for first_page, last_page in windows:
+            output_file = output_dir / f"p{first_page:04d}-{last_page:04d}.pdf"
+            # bytes estáveis entre execuções: o registro de uploads reaproveita o envio
+            write_page_range(doc, first_page, last_page, output_file, garbage=3, deflate=True, no_new_id=True)
+            paths.append(str(output_file))
+    return paths
+
+
+def window_json(filename, window, descriptions):
+    """JSON parcial (mesmo formato do raw) com as descrições das páginas da janela."""
+    return json.dumps(
+        [{"filename": filename, "pages": window, "pages_description": descriptions}],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def run_windows(fn, items, concurrency=WINDOW_CONCURRENCY):
+    """Aplica `fn` a cada janela em paralelo; devolve os resultados na ordem das janelas."""
+    if len(items) <= 1 or concurrency <= 1:
+        return [fn(item) for item in items]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as executor:
+        return list(executor.map(fn, items))
+
+
+def _is_empty(value):
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value.strip().lower() in EMPTY_VALUES
+    return isinstance(value, (list, dict)) and not value
+
+
+def _as_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def merge_json(left, right):
+    """
+    Junta o JSON estruturado de duas janelas consecutivas, preservando a ordem:
+
+    - dicts: chaves em comum são juntadas recursivamente (a seção continua na janela seguinte)
+    - listas: concatenadas (mesmo que iguais)
+    - valores iguais ou vazios de um dos lados: fica o preenchido
+    - valores diferentes: viram uma lista com os dois
+    """
+    if isinstance(left, dict) and isinstance(right, dict):
+        merged = dict(left)
+        for key, value in right.items():
+            merged[key] = merge_json(merged[key], value) if key in merged else value
+        return merged
+    if isinstance(left, list) and isinstance(right, list):
+        # passos e linhas de tabela iguais em janelas diferentes são conteúdo distinto
+        return left + right
+    if _is_empty(right) or left == right:
+        return left
+    if _is_empty(left):
+        return right
+    return _as_list(left) + _as_list(right)
+
+
+def merge_tree(parts):
+    """
+    Merge hierárquico: junta as janelas vizinhas duas a duas, nível a nível, até
+    sobrar um JSON. Cada nível junta partes de tamanho parecido, então o custo
+    fica em O(n log n) em vez de crescer com a soma acumulada da seção.
+    """
+    if not parts:
+        return {}
+    while len(parts) > 1:
+        merged = [merge_json(parts[i], parts[i + 1]) for i in range(0, len(parts) - 1, 2)]
+        if len(parts) % 2:
+            merged.append(parts[-1])
+        parts = merged
+    return parts[0]